@@ -21,7 +21,7 @@ import asyncio
 import asyncpg
 import redis
 import json
-from functools import wraps
+from functools import wraps, lru_cache
 import hashlib
 import uuid
 
@@ -32,6 +32,19 @@ sys.path.append('/home/ubuntu/viral_content_scraper')
 from ai_agents.src.base_agent import BaseAgent
 from ai_agents.src.memory.evolutionary_memory import EvolutionaryMemory
 from scrapers.src.index import ScrapingCoordinator
+from api.utils.pagination import CONTENT_SORT_COLUMNS, CursorError, encode_cursor, decode_cursor
+from api.utils.query_builder import CanonicalQuery, eq_guard, statement_cache
+from api.utils.forecasting import platform_forecaster
+from api.utils.pattern_index import pattern_index
+from api.utils.analysis_memo import analysis_memo
+from api.utils.batch_jobs import batch_job_runner
+from api.utils.analysis_writer import analysis_writer
+from api.utils.registry import get_registry_stats
+from api.utils.micro_batcher import sentiment_batcher
+from api.utils.analysis_scheduler import analysis_scheduler
+from api.utils.exporter import export_jobs
+from api.utils.profile_batch import profile_batch_runner
+from api.utils.profile_cache import profile_cache
 
 # Configuração da aplicação
 app = Flask(__name__)
@@ -316,6 +329,18 @@ def system_stats():
                 }
         
         stats = asyncio.run(get_stats())
+        stats['statement_cache'] = statement_cache.get_stats()
+        stats['forecasting'] = platform_forecaster.get_stats()
+        stats['pattern_index'] = pattern_index.get_stats()
+        stats['analysis_memo'] = analysis_memo.get_stats()
+        stats['batch_jobs'] = batch_job_runner.get_stats()
+        stats['analysis_writer'] = analysis_writer.get_stats()
+        stats['registries'] = get_registry_stats()
+        stats['sentiment_batcher'] = sentiment_batcher.get_stats()
+        stats['analysis_scheduler'] = analysis_scheduler.get_stats()
+        stats['exports'] = export_jobs.get_stats()
+        stats['profile_batches'] = profile_batch_runner.get_stats()
+        stats['profile_cache'] = profile_cache.get_stats()
         
         return jsonify({
             'success': True,
@@ -394,6 +419,120 @@ def get_current_user():
 # ENDPOINTS DE CONTEÚDO
 # =====================================================
 
+@lru_cache(maxsize=None)
+def build_content_queries(sort_by, sort_order, paginate_by_cursor, with_cursor_key,
+                          with_author, with_hashtag, with_date_from, with_date_to, with_search):
+    """
+    Montar as queries canônicas de listagem e contagem de conteúdo
+
+    Filtros de igualdade em colunas de baixa cardinalidade usam guardas
+    IS NULL OR e não alteram o texto SQL. Filtros seletivos que dependem de
+    índices específicos (trigramas, full-text, GIN de hashtags, intervalo de
+    datas) geram variantes próprias, para que o plano genérico continue usando
+    esses índices. O conjunto de formas possíveis é finito, então o cache é
+    limitado.
+    """
+    where_conditions = [
+        "sc.is_active = true",
+        eq_guard('sc.platform', 'platform'),
+        eq_guard('sc.content_type', 'content_type'),
+        eq_guard('sc.language', 'language')
+    ]
+    
+    if with_author:
+        # Coberto pelo índice GIN de trigramas (migration V1.2.0)
+        where_conditions.append("sc.author_username ILIKE :author")
+    
+    if with_hashtag:
+        where_conditions.append("sc.hashtags @> ARRAY[:hashtag::text]")
+    
+    if with_date_from:
+        where_conditions.append("sc.scraped_at >= :date_from::timestamptz")
+    
+    if with_date_to:
+        where_conditions.append("sc.scraped_at <= :date_to::timestamptz")
+    
+    rank_expression = "NULL::real"
+    if with_search:
+        # Busca full-text sobre sc.search_vector (índice GIN, migration V1.2.0)
+        tsquery = "websearch_to_tsquery('portuguese', :q::text)"
+        where_conditions.append(f"sc.search_vector @@ {tsquery}")
+        rank_expression = f"ts_rank_cd(sc.search_vector, {tsquery})"
+    
+    if sort_by == 'relevance':
+        order_expression = rank_expression
+    else:
+        order_expression = CONTENT_SORT_COLUMNS[sort_by]['expression']
+    
+    filter_clause = " AND ".join(where_conditions)
+    
+    # Condição keyset: (chave, id) estritamente após a última linha
+    if with_cursor_key:
+        comparison = '<' if sort_order == 'desc' else '>'
+        sort_type = CONTENT_SORT_COLUMNS[sort_by]['type']
+        where_conditions.append(
+            f"({order_expression}, sc.id) {comparison} (:cursor_value::{sort_type}, :cursor_id::uuid)"
+        )
+    
+    where_clause = " AND ".join(where_conditions)
+    
+    if paginate_by_cursor:
+        pagination_clause = "LIMIT :limit"
+    else:
+        pagination_clause = "LIMIT :limit OFFSET :offset"
+    
+    list_query = CanonicalQuery('content_list', f"""
+        SELECT 
+            {order_expression} AS sort_key,
+            {rank_expression} AS search_rank,
+            sc.id,
+            sc.platform,
+            sc.platform_content_id,
+            sc.content_type,
+            sc.url,
+            sc.title,
+            sc.description,
+            sc.author_username,
+            sc.author_display_name,
+            sc.author_followers_count,
+            sc.hashtags,
+            sc.mentions,
+            sc.language,
+            sc.scraped_at,
+            sc.published_at,
+            cm.likes_count,
+            cm.comments_count,
+            cm.shares_count,
+            cm.views_count,
+            cm.engagement_rate,
+            ca.overall_score,
+            ca.viral_potential_score,
+            ca.sentiment_polarity
+        FROM scraped_content sc
+        LEFT JOIN LATERAL (
+            SELECT * FROM content_metrics 
+            WHERE content_id = sc.id 
+            ORDER BY collected_at DESC 
+            LIMIT 1
+        ) cm ON true
+        LEFT JOIN LATERAL (
+            SELECT * FROM content_analyses 
+            WHERE content_id = sc.id AND analysis_type = 'comprehensive'
+            ORDER BY analyzed_at DESC 
+            LIMIT 1
+        ) ca ON true
+        WHERE {where_clause}
+        ORDER BY {order_expression} {sort_order.upper()}, sc.id {sort_order.upper()}
+        {pagination_clause}
+    """)
+    
+    count_query = CanonicalQuery(
+        'content_count',
+        f"SELECT COUNT(*) FROM scraped_content sc WHERE {filter_clause}"
+    )
+    
+    return list_query, count_query
+
 @app.route('/api/v1/content', methods=['GET'])
 @jwt_required()
 @cache_response(timeout=300)
@@ -408,112 +547,109 @@ def get_content():
         language = request.args.get('language')
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
+        search_query = (request.args.get('q') or '').strip() or None
         limit = min(int(request.args.get('limit', 50)), 1000)
         offset = int(request.args.get('offset', 0))
-        sort_by = request.args.get('sort_by', 'scraped_at')
-        sort_order = request.args.get('sort_order', 'desc')
+        sort_by = request.args.get('sort_by', 'relevance' if search_query else 'scraped_at')
+        sort_order = request.args.get('sort_order', 'desc').lower()
+        cursor = request.args.get('cursor')
+        
+        if sort_by == 'relevance':
+            if not search_query:
+                return jsonify({'error': 'sort_by=relevance requer o parâmetro q'}), 400
+        elif sort_by not in CONTENT_SORT_COLUMNS:
+            return jsonify({
+                'error': f'sort_by inválido. Use: {", ".join(CONTENT_SORT_COLUMNS)}, relevance'
+            }), 400
+        
+        if sort_order not in ('asc', 'desc'):
+            return jsonify({'error': 'sort_order inválido. Use: asc, desc'}), 400
+        
+        # Modo cursor (keyset): ativado com cursor=<token> ou cursor= vazio
+        # para a primeira página. Sem o parâmetro, mantém-se o modo offset.
+        use_cursor = cursor is not None
+        cursor_key = None
+        
+        if use_cursor and sort_by == 'relevance':
+            return jsonify({
+                'error': 'Paginação por cursor não suporta sort_by=relevance; use offset ou outra ordenação'
+            }), 400
+        
+        if use_cursor and cursor:
+            try:
+                cursor_key = decode_cursor(cursor, sort_by, sort_order)
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        try:
+            date_from_value = datetime.fromisoformat(date_from) if date_from else None
+            date_to_value = datetime.fromisoformat(date_to) if date_to else None
+        except ValueError:
+            return jsonify({'error': 'date_from/date_to devem estar no formato ISO 8601'}), 400
+        
+        list_query, count_query = build_content_queries(
+            sort_by=sort_by,
+            sort_order=sort_order,
+            paginate_by_cursor=use_cursor,
+            with_cursor_key=cursor_key is not None,
+            with_author=bool(author),
+            with_hashtag=bool(hashtag),
+            with_date_from=bool(date_from),
+            with_date_to=bool(date_to),
+            with_search=bool(search_query)
+        )
+        
+        # Parâmetros comuns às duas queries; filtros ausentes valem NULL
+        filter_params = {
+            'platform': platform,
+            'content_type': content_type,
+            'language': language
+        }
+        if author:
+            escaped_author = author.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            filter_params['author'] = f"%{escaped_author}%"
+        if hashtag:
+            filter_params['hashtag'] = hashtag
+        if date_from_value:
+            filter_params['date_from'] = date_from_value
+        if date_to_value:
+            filter_params['date_to'] = date_to_value
+        if search_query:
+            filter_params['q'] = search_query
+        
+        list_params = dict(filter_params)
+        if cursor_key is not None:
+            list_params['cursor_value'] = cursor_key[0]
+            list_params['cursor_id'] = cursor_key[1]
+        if use_cursor:
+            # Uma linha extra indica se existe próxima página sem COUNT(*)
+            list_params['limit'] = limit + 1
+        else:
+            list_params['limit'] = limit
+            list_params['offset'] = offset
         
         async def fetch_content():
             async with db_pool.acquire() as conn:
-                # Construir query dinamicamente
-                where_conditions = ["sc.is_active = true"]
-                params = []
-                param_count = 0
-                
-                if platform:
-                    param_count += 1
-                    where_conditions.append(f"sc.platform = ${param_count}")
-                    params.append(platform)
-                
-                if content_type:
-                    param_count += 1
-                    where_conditions.append(f"sc.content_type = ${param_count}")
-                    params.append(content_type)
-                
-                if author:
-                    param_count += 1
-                    where_conditions.append(f"sc.author_username ILIKE ${param_count}")
-                    params.append(f"%{author}%")
-                
-                if hashtag:
-                    param_count += 1
-                    where_conditions.append(f"${param_count} = ANY(sc.hashtags)")
-                    params.append(hashtag)
-                
-                if language:
-                    param_count += 1
-                    where_conditions.append(f"sc.language = ${param_count}")
-                    params.append(language)
+                rows = await statement_cache.fetch(conn, list_query, **list_params)
                 
-                if date_from:
-                    param_count += 1
-                    where_conditions.append(f"sc.scraped_at >= ${param_count}")
-                    params.append(date_from)
+                if use_cursor:
+                    # Custo constante por página: o total não é recalculado
+                    return rows, None
                 
-                if date_to:
-                    param_count += 1
-                    where_conditions.append(f"sc.scraped_at <= ${param_count}")
-                    params.append(date_to)
-                
-                where_clause = " AND ".join(where_conditions)
-                
-                # Query principal
-                query = f"""
-                    SELECT 
-                        sc.id,
-                        sc.platform,
-                        sc.platform_content_id,
-                        sc.content_type,
-                        sc.url,
-                        sc.title,
-                        sc.description,
-                        sc.author_username,
-                        sc.author_display_name,
-                        sc.author_followers_count,
-                        sc.hashtags,
-                        sc.mentions,
-                        sc.language,
-                        sc.scraped_at,
-                        sc.published_at,
-                        cm.likes_count,
-                        cm.comments_count,
-                        cm.shares_count,
-                        cm.views_count,
-                        cm.engagement_rate,
-                        ca.overall_score,
-                        ca.viral_potential_score,
-                        ca.sentiment_polarity
-                    FROM scraped_content sc
-                    LEFT JOIN LATERAL (
-                        SELECT * FROM content_metrics 
-                        WHERE content_id = sc.id 
-                        ORDER BY collected_at DESC 
-                        LIMIT 1
-                    ) cm ON true
-                    LEFT JOIN LATERAL (
-                        SELECT * FROM content_analyses 
-                        WHERE content_id = sc.id AND analysis_type = 'comprehensive'
-                        ORDER BY analyzed_at DESC 
-                        LIMIT 1
-                    ) ca ON true
-                    WHERE {where_clause}
-                    ORDER BY sc.{sort_by} {sort_order.upper()}
-                    LIMIT ${param_count + 1} OFFSET ${param_count + 2}
-                """
-                
-                params.extend([limit, offset])
-                
-                # Executar query
-                rows = await conn.fetch(query, *params)
-                
-                # Contar total de registros
-                count_query = f"SELECT COUNT(*) FROM scraped_content sc WHERE {where_clause}"
-                total_count = await conn.fetchval(count_query, *params[:-2])  # Remover limit e offset
+                total_count = await statement_cache.fetchval(conn, count_query, **filter_params)
                 
                 return rows, total_count
         
         content_rows, total_count = asyncio.run(fetch_content())
         
+        next_cursor = None
+        if use_cursor:
+            has_next = len(content_rows) > limit
+            content_rows = content_rows[:limit]
+            if has_next:
+                last_row = content_rows[-1]
+                next_cursor = encode_cursor(sort_by, sort_order, last_row['sort_key'], last_row['id'])
+        
         # Converter para formato JSON
         content_list = []
         for row in content_rows:
@@ -546,19 +682,34 @@ def get_content():
                     'overall_score': float(row['overall_score']) if row['overall_score'] else None,
                     'viral_potential_score': float(row['viral_potential_score']) if row['viral_potential_score'] else None,
                     'sentiment_polarity': row['sentiment_polarity']
-                }
+                },
+                'search_rank': float(row['search_rank']) if row['search_rank'] is not None else None
             })
         
-        return jsonify({
-            'success': True,
-            'data': content_list,
-            'pagination': {
+        if use_cursor:
+            pagination = {
+                'mode': 'cursor',
+                'limit': limit,
+                'sort_by': sort_by,
+                'sort_order': sort_order,
+                'has_next': next_cursor is not None,
+                'next_cursor': next_cursor
+            }
+        else:
+            pagination = {
+                'mode': 'offset',
                 'total': total_count,
                 'limit': limit,
                 'offset': offset,
                 'has_next': offset + limit < total_count,
                 'has_prev': offset > 0
-            },
+            }
+        
+        return jsonify({
+            'success': True,
+            'data': content_list,
+            'pagination': pagination,
+            'next_cursor': next_cursor,
             'filters_applied': {
                 'platform': platform,
                 'content_type': content_type,
@@ -566,7 +717,8 @@ def get_content():
                 'hashtag': hashtag,
                 'language': language,
                 'date_from': date_from,
-                'date_to': date_to
+                'date_to': date_to,
+                'q': search_query
             }
         })
         
@@ -6,81 +6,361 @@ Autor: Manus AI
 Data: 27 de Janeiro de 2025
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import asyncio
 import asyncpg
 import json
 import uuid
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 import logging
 
-# Importar analisadores
+import numpy as np
+
+# Analisadores são importados e construídos sob demanda (ver registro abaixo)
 import sys
 sys.path.append('/home/ubuntu/viral_content_scraper')
 
-from ai_agents.src.agents.visual_content_analyzer import VisualContentAnalyzer
-from ai_agents.src.agents.content_copy_analyzer import ContentCopyAnalyzer
-from ai_agents.src.agents.engagement_pattern_analyzer import EngagementPatternAnalyzer
-from ai_agents.src.analysis.sentiment.sentiment_analyzer import SentimentAnalyzer
-from ai_agents.src.analysis.metrics.metrics_analyzer import MetricsAnalyzer
+from ..utils.analysis_memo import analysis_memo
+from ..utils.analysis_writer import analysis_writer, insert_analysis
+from ..utils.content_loader import ContentLoader, fetch_content_rows
+from ..utils.comparison import (
+    to_matrix, summarize_columns, rank_correlations, group_means, to_python, PERCENTILES
+)
+from ..utils.trend_aggregates import fetch_trend_states, build_trend_report, period_start_for
+from ..utils.registry import LazyRegistry, prewarm_keys_from_env
+from ..utils.micro_batcher import sentiment_batcher
+from ..utils.analysis_scheduler import analysis_scheduler, ANALYSIS_SCHEDULER_ENABLED
+from ..utils.batch_jobs import (
+    batch_job_runner, job_snapshot, JobNotFoundError,
+    BATCH_JOB_MAX_ITEMS, JOB_COLUMNS, TERMINAL_STATUSES
+)
 
 analysis_bp = Blueprint('analysis', __name__, url_prefix='/api/v1/analysis')
 logger = logging.getLogger(__name__)
 
-# Instâncias dos analisadores
-visual_analyzer = None
-copy_analyzer = None
-engagement_analyzer = None
-sentiment_analyzer = None
-metrics_analyzer = None
+def _create_visual_analyzer():
+    from ai_agents.src.agents.visual_content_analyzer import VisualContentAnalyzer
+    return VisualContentAnalyzer({
+        'enable_face_detection': True,
+        'enable_color_analysis': True,
+        'enable_composition_analysis': True
+    })
+
+def _create_copy_analyzer():
+    from ai_agents.src.agents.content_copy_analyzer import ContentCopyAnalyzer
+    return ContentCopyAnalyzer({
+        'enable_sentiment_analysis': True,
+        'enable_persuasion_analysis': True,
+        'enable_psychological_analysis': True
+    })
+
+def _create_engagement_analyzer():
+    from ai_agents.src.agents.engagement_pattern_analyzer import EngagementPatternAnalyzer
+    return EngagementPatternAnalyzer({
+        'enable_trend_analysis': True,
+        'enable_pattern_recognition': True,
+        'enable_prediction': True
+    })
+
+def _create_sentiment_analyzer():
+    from ai_agents.src.analysis.sentiment.sentiment_analyzer import SentimentAnalyzer
+    return SentimentAnalyzer({
+        'language': 'pt',
+        'enableEmotionDetection': True,
+        'enableToneAnalysis': True,
+        'enablePsychologicalAnalysis': True,
+        'enablePersuasionAnalysis': True
+    })
+
+def _create_metrics_analyzer():
+    from ai_agents.src.analysis.metrics.metrics_analyzer import MetricsAnalyzer
+    return MetricsAnalyzer({
+        'enableTrendAnalysis': True,
+        'enablePerformanceTracking': True,
+        'enableComparativeAnalysis': True,
+        'enablePredictiveAnalysis': True
+    })
+
+# Registro dos analisadores: cada um é construído no primeiro uso em cada
+# worker. ANALYZER_PREWARM=all (ou lista separada por vírgulas) constrói os
+# analisadores em segundo plano a partir da primeira requisição de cada
+# worker (nunca no processo mestre do gunicorn --preload), fora do caminho
+# das requisições.
+analyzers = LazyRegistry('analyzers')
+analyzers.register('visual', _create_visual_analyzer)
+analyzers.register('copy', _create_copy_analyzer)
+analyzers.register('engagement', _create_engagement_analyzer)
+analyzers.register('sentiment', _create_sentiment_analyzer)
+analyzers.register('metrics', _create_metrics_analyzer)
+
+_prewarm_keys = prewarm_keys_from_env('ANALYZER_PREWARM')
+
+# Timeout por analisador (segundos); analisadores que excedem o limite são
+# descartados e a análise segue com os resultados parciais dos demais
+ANALYZER_TIMEOUTS = {
+    'sentiment': 15,
+    'visual': 30,
+    'metrics': 10,
+    'engagement': 15
+}
+
+ANALYSIS_TYPES = tuple(ANALYZER_TIMEOUTS.keys())
+
+# Máximo de textos no modo bulk de /sentiment
+SENTIMENT_BULK_MAX_TEXTS = 100
+
+# Comparação de coortes: limite de conteúdos e métricas numéricas comparáveis
+MAX_COMPARE_CONTENTS = 500
+
+COMPARISON_METRICS = (
+    'overall_score', 'confidence_score', 'viral_potential_score', 'sentiment_score',
+    'emotional_intensity', 'visual_quality_score', 'likes_count', 'comments_count',
+    'shares_count', 'views_count', 'engagement_rate'
+)
+
+COUNT_METRICS = ('likes_count', 'comments_count', 'shares_count', 'views_count')
+
+def resolve_analysis_types(analysis_types):
+    """Expandir 'comprehensive' e remover tipos repetidos ou desconhecidos"""
+    if 'comprehensive' in analysis_types:
+        return list(ANALYSIS_TYPES)
+    return [t for t in ANALYSIS_TYPES if t in analysis_types]
 
-def init_analyzers():
-    """Inicializa os analisadores"""
-    global visual_analyzer, copy_analyzer, engagement_analyzer, sentiment_analyzer, metrics_analyzer
+def build_content_data(content):
+    """Montar payload dos analisadores a partir da linha de scraped_content + métricas"""
+    return {
+        'id': str(content['id']),
+        'platform': content['platform'],
+        'content_type': content['content_type'],
+        'title': content['title'],
+        'description': content['description'],
+        'content_text': content['content_text'],
+        'author': {
+            'username': content['author_username'],
+            'display_name': content['author_display_name'],
+            'followers': content['author_followers_count']
+        },
+        'hashtags': content['hashtags'] or [],
+        'mentions': content['mentions'] or [],
+        'media_urls': content['media_urls'] or [],
+        'language': content['language'],
+        'published_at': content['published_at'].isoformat() if content['published_at'] else None,
+        'metrics': {
+            'likes_count': content['likes_count'] or 0,
+            'comments_count': content['comments_count'] or 0,
+            'shares_count': content['shares_count'] or 0,
+            'views_count': content['views_count'] or 0,
+            'engagement_rate': float(content['engagement_rate']) if content['engagement_rate'] else 0
+        }
+    }
+
+def build_analysis_text(content_data):
+    """Texto analisado pelo analisador de sentimento"""
+    if not (content_data['content_text'] or content_data['title']):
+        return ''
+    return f"{content_data['title'] or ''} {content_data['description'] or ''} {content_data['content_text'] or ''}".strip()
+
+def analyzer_version(analyzer):
+    """Versão do analisador usada nas chaves de memoização"""
+    return str(getattr(analyzer, 'version', None) or '1.0.0')
+
+def build_visual_input(content_data):
+    """Entrada do analisador visual: primeira imagem/vídeo disponível"""
+    return {
+        'url': content_data['media_urls'][0],
+        'type': 'image',  # Detectar automaticamente
+        'platform': content_data['platform']
+    }
+
+def build_memo_keys(content_data, analyzer_names):
+    """
+    Chaves de memoização dos analisadores que dependem apenas das entradas do conteúdo
+    
+    Sentimento depende só do texto e visual só da mídia; métricas e engajamento
+    dependem dos números do próprio conteúdo e não são memoizados.
+    """
+    memo_keys = {}
+    
+    if 'sentiment' in analyzer_names:
+        memo_keys['sentiment'] = analysis_memo.text_key(
+            'sentiment', analyzer_version(analyzers.get('sentiment')), build_analysis_text(content_data)
+        )
+    
+    if 'visual' in analyzer_names:
+        visual_input = build_visual_input(content_data)
+        memo_keys['visual'] = analysis_memo.media_key(
+            'visual', analyzer_version(analyzers.get('visual')), [visual_input.pop('url')], visual_input
+        )
+    
+    return memo_keys
+
+def build_analyzer_calls(content_data, analysis_types):
+    """Criar as chamadas independentes de cada analisador aplicável ao conteúdo"""
+    calls = {}
+    
+    if 'sentiment' in analysis_types:
+        text_to_analyze = build_analysis_text(content_data)
+        if text_to_analyze:
+            calls['sentiment'] = lambda: analyzers.get('sentiment').analyzeSentiment(text_to_analyze)
+    
+    if 'visual' in analysis_types and content_data['media_urls']:
+        visual_input = build_visual_input(content_data)
+        calls['visual'] = lambda: analyzers.get('visual').analyze_visual_content(visual_input)
+    
+    if 'metrics' in analysis_types:
+        calls['metrics'] = lambda: analyzers.get('metrics').analyzeMetrics(content_data)
+    
+    if 'engagement' in analysis_types:
+        calls['engagement'] = lambda: analyzers.get('engagement').analyze_engagement_patterns(content_data)
     
+    return calls
+
+async def _run_analyzer(name, call):
+    """Executar um analisador com timeout, retornando (resultado, erro, duração em ms)"""
+    start_time = time.perf_counter()
     try:
-        visual_analyzer = VisualContentAnalyzer({
-            'enable_face_detection': True,
-            'enable_color_analysis': True,
-            'enable_composition_analysis': True
-        })
-        
-        copy_analyzer = ContentCopyAnalyzer({
-            'enable_sentiment_analysis': True,
-            'enable_persuasion_analysis': True,
-            'enable_psychological_analysis': True
-        })
-        
-        engagement_analyzer = EngagementPatternAnalyzer({
-            'enable_trend_analysis': True,
-            'enable_pattern_recognition': True,
-            'enable_prediction': True
-        })
-        
-        sentiment_analyzer = SentimentAnalyzer({
-            'language': 'pt',
-            'enableEmotionDetection': True,
-            'enableToneAnalysis': True,
-            'enablePsychologicalAnalysis': True,
-            'enablePersuasionAnalysis': True
-        })
-        
-        metrics_analyzer = MetricsAnalyzer({
-            'enableTrendAnalysis': True,
-            'enablePerformanceTracking': True,
-            'enableComparativeAnalysis': True,
-            'enablePredictiveAnalysis': True
-        })
-        
-        logger.info("Analisadores inicializados com sucesso")
-        
+        result = await asyncio.wait_for(call(), timeout=ANALYZER_TIMEOUTS[name])
+        return result, None, (time.perf_counter() - start_time) * 1000
+    except asyncio.TimeoutError:
+        logger.warning(f"Analisador {name} excedeu o timeout de {ANALYZER_TIMEOUTS[name]}s")
+        return None, 'timeout', (time.perf_counter() - start_time) * 1000
     except Exception as e:
-        logger.error(f"Erro ao inicializar analisadores: {e}")
-        raise
+        logger.error(f"Erro no analisador {name}: {e}")
+        return None, str(e), (time.perf_counter() - start_time) * 1000
+
+async def run_analyzers(content_data, analysis_types, use_memo=True):
+    """
+    Executar os analisadores solicitados concorrentemente
+    
+    Retorna os resultados dos analisadores que concluíram, os erros dos que
+    falharam ou excederam o timeout e o tempo de cada um. O tempo total é o de
+    relógio da execução concorrente, não a soma dos tempos individuais.
+    Resultados memoizados para as mesmas entradas são reutilizados sem chamar
+    o analisador.
+    """
+    start_time = time.perf_counter()
+    calls = build_analyzer_calls(content_data, resolve_analysis_types(analysis_types))
+    memo_keys = build_memo_keys(content_data, calls.keys()) if use_memo else {}
+    
+    analysis_results = {}
+    analyzer_errors = {}
+    analyzer_timings = {}
+    memo_hits = []
+    
+    for name, memo_key in memo_keys.items():
+        cached_result = analysis_memo.get(memo_key)
+        if cached_result is not None:
+            analysis_results[name] = cached_result
+            analyzer_timings[name] = 0
+            memo_hits.append(name)
+            del calls[name]
+    
+    outcomes = await asyncio.gather(*(_run_analyzer(name, call) for name, call in calls.items()))
+    wall_clock_ms = (time.perf_counter() - start_time) * 1000
+    
+    for name, (result, error, duration_ms) in zip(calls.keys(), outcomes):
+        analyzer_timings[name] = round(duration_ms, 2)
+        if error is None:
+            analysis_results[name] = result
+            if name in memo_keys:
+                analysis_memo.set(memo_keys[name], result)
+        else:
+            analyzer_errors[name] = error
+    
+    return {
+        'results': analysis_results,
+        'errors': analyzer_errors,
+        'timings_ms': analyzer_timings,
+        'memo_hits': memo_hits,
+        'wall_clock_ms': round(wall_clock_ms, 2)
+    }
+
+async def load_content(conn, content_id):
+    """Buscar conteúdo ativo com as métricas mais recentes"""
+    rows = await fetch_content_rows(conn, [content_id])
+    return rows[0] if rows else None
 
-# Inicializar analisadores
-init_analyzers()
+def calculate_overall_scores(analysis_results):
+    """Score geral e confiança média dos analisadores bem-sucedidos"""
+    overall_scores = {}
+    confidence_scores = {}
+    
+    for analysis_type, result in analysis_results.items():
+        if result.get('success'):
+            overall_scores[analysis_type] = result.get('overallScore', {}).get('score', 0.5)
+            confidence_scores[analysis_type] = result.get('confidence', 0.5)
+    
+    # Calcular score geral ponderado
+    if overall_scores:
+        weighted_score = sum(overall_scores.values()) / len(overall_scores)
+        avg_confidence = sum(confidence_scores.values()) / len(confidence_scores)
+    else:
+        weighted_score = 0.5
+        avg_confidence = 0.5
+    
+    return weighted_score, avg_confidence
+
+def build_analysis_record(content_id, run, weighted_score, avg_confidence):
+    """Montar registro de content_analyses a partir do resultado dos analisadores"""
+    analysis_results = run['results']
+    return {
+        'content_id': content_id,
+        'analysis_type': 'comprehensive',
+        'analyzer_name': 'MultiAnalyzer',
+        'analyzer_version': '1.0.0',
+        'processing_time_ms': int(run['wall_clock_ms']),
+        'success': True,
+        'confidence_score': avg_confidence,
+        'overall_score': weighted_score,
+        'sentiment_score': analysis_results.get('sentiment', {}).get('sentiment', {}).get('score', 0),
+        'sentiment_polarity': analysis_results.get('sentiment', {}).get('sentiment', {}).get('polarity', 'neutral'),
+        'dominant_emotion': analysis_results.get('sentiment', {}).get('emotions', {}).get('dominantEmotion', {}).get('emotion'),
+        'emotional_intensity': analysis_results.get('sentiment', {}).get('emotions', {}).get('emotionalIntensity', 0),
+        'viral_potential_score': analysis_results.get('metrics', {}).get('viralPotential', {}).get('potential', 0),
+        'engagement_prediction': analysis_results.get('engagement', {}).get('prediction', {}).get('score', 0),
+        'trend_direction': analysis_results.get('metrics', {}).get('trends', {}).get('direction', 'unknown'),
+        'trend_strength': analysis_results.get('metrics', {}).get('trends', {}).get('strength', 0),
+        # Documentos JSONB são compactados na gravação: sub-documentos vazios
+        # viram NULL em vez de placeholders
+        'sentiment_analysis': analysis_results.get('sentiment'),
+        'visual_analysis': analysis_results.get('visual'),
+        'metrics_analysis': analysis_results.get('metrics'),
+        'predictions': {
+            'engagement': analysis_results.get('engagement'),
+            'combined_predictions': {}
+        },
+        'recommendations': {
+            'combined_recommendations': [],
+            'priority_actions': []
+        },
+        'analysis_metadata': {
+            'wall_clock_ms': run['wall_clock_ms'],
+            'analyzer_timings_ms': run['timings_ms'],
+            'memo_hits': run['memo_hits']
+        },
+        'error_details': {'analyzer_errors': run['errors']}
+    }
+
+async def save_analysis(conn, content_id, run, weighted_score, avg_confidence):
+    """Persistir análise completa em content_analyses"""
+    record = build_analysis_record(content_id, run, weighted_score, avg_confidence)
+    return await insert_analysis(conn, record)
+
+def build_analysis_summary(run, weighted_score, avg_confidence):
+    """Resumo da análise retornado pela API e armazenado nos itens de jobs"""
+    return {
+        'overall_score': weighted_score,
+        'confidence_score': avg_confidence,
+        'analysis_count': len(run['results']),
+        'processing_time_total': run['wall_clock_ms'],
+        'analyzer_timings_ms': run['timings_ms'],
+        'memo_hits': run['memo_hits'],
+        'partial': bool(run['errors']),
+        'analyzer_errors': run['errors']
+    }
 
 @analysis_bp.route('/content/<content_id>', methods=['POST'])
 @jwt_required()
@@ -91,19 +371,11 @@ async def analyze_content(content_id):
         data = request.get_json() or {}
         analysis_types = data.get('analysis_types', ['comprehensive'])
         force_reanalysis = data.get('force_reanalysis', False)
+        use_memo = not data.get('bypass_memo', False)
         
         # Buscar conteúdo no banco
         async with current_app.db_pool.acquire() as conn:
-            content = await conn.fetchrow("""
-                SELECT sc.*, cm.* FROM scraped_content sc
-                LEFT JOIN LATERAL (
-                    SELECT * FROM content_metrics 
-                    WHERE content_id = sc.id 
-                    ORDER BY collected_at DESC 
-                    LIMIT 1
-                ) cm ON true
-                WHERE sc.id = $1 AND sc.is_active = true
-            """, uuid.UUID(content_id))
+            content = await load_content(conn, uuid.UUID(content_id))
             
             if not content:
                 return jsonify({'error': 'Conteúdo não encontrado'}), 404
@@ -125,120 +397,24 @@ async def analyze_content(content_id):
                     }), 409
         
         # Preparar dados para análise
-        content_data = {
-            'id': str(content['id']),
-            'platform': content['platform'],
-            'content_type': content['content_type'],
-            'title': content['title'],
-            'description': content['description'],
-            'content_text': content['content_text'],
-            'author': {
-                'username': content['author_username'],
-                'display_name': content['author_display_name'],
-                'followers': content['author_followers_count']
-            },
-            'hashtags': content['hashtags'] or [],
-            'mentions': content['mentions'] or [],
-            'media_urls': content['media_urls'] or [],
-            'language': content['language'],
-            'published_at': content['published_at'].isoformat() if content['published_at'] else None,
-            'metrics': {
-                'likes_count': content['likes_count'] or 0,
-                'comments_count': content['comments_count'] or 0,
-                'shares_count': content['shares_count'] or 0,
-                'views_count': content['views_count'] or 0,
-                'engagement_rate': float(content['engagement_rate']) if content['engagement_rate'] else 0
-            }
-        }
+        content_data = build_content_data(content)
         
-        analysis_results = {}
+        # Executar análises solicitadas concorrentemente
+        run = await run_analyzers(content_data, analysis_types, use_memo=use_memo)
+        analysis_results = run['results']
         
-        # Executar análises solicitadas
-        for analysis_type in analysis_types:
-            if analysis_type == 'sentiment' or analysis_type == 'comprehensive':
-                if content_data['content_text'] or content_data['title']:
-                    text_to_analyze = f"{content_data['title'] or ''} {content_data['description'] or ''} {content_data['content_text'] or ''}".strip()
-                    if text_to_analyze:
-                        sentiment_result = await sentiment_analyzer.analyzeSentiment(text_to_analyze)
-                        analysis_results['sentiment'] = sentiment_result
-            
-            if analysis_type == 'visual' or analysis_type == 'comprehensive':
-                if content_data['media_urls']:
-                    # Analisar primeira imagem/vídeo disponível
-                    media_url = content_data['media_urls'][0]
-                    visual_result = await visual_analyzer.analyze_visual_content({
-                        'url': media_url,
-                        'type': 'image',  # Detectar automaticamente
-                        'platform': content_data['platform']
-                    })
-                    analysis_results['visual'] = visual_result
-            
-            if analysis_type == 'metrics' or analysis_type == 'comprehensive':
-                metrics_result = await metrics_analyzer.analyzeMetrics(content_data)
-                analysis_results['metrics'] = metrics_result
-            
-            if analysis_type == 'engagement' or analysis_type == 'comprehensive':
-                engagement_result = await engagement_analyzer.analyze_engagement_patterns(content_data)
-                analysis_results['engagement'] = engagement_result
+        if run['errors'] and not analysis_results:
+            return jsonify({
+                'error': 'Todos os analisadores falharam',
+                'analyzer_errors': run['errors']
+            }), 502
         
         # Calcular scores gerais
-        overall_scores = {}
-        confidence_scores = {}
-        
-        for analysis_type, result in analysis_results.items():
-            if result.get('success'):
-                overall_scores[analysis_type] = result.get('overallScore', {}).get('score', 0.5)
-                confidence_scores[analysis_type] = result.get('confidence', 0.5)
-        
-        # Calcular score geral ponderado
-        if overall_scores:
-            weighted_score = sum(overall_scores.values()) / len(overall_scores)
-            avg_confidence = sum(confidence_scores.values()) / len(confidence_scores)
-        else:
-            weighted_score = 0.5
-            avg_confidence = 0.5
+        weighted_score, avg_confidence = calculate_overall_scores(analysis_results)
         
         # Salvar análise no banco
         async with current_app.db_pool.acquire() as conn:
-            analysis_id = await conn.fetchval("""
-                INSERT INTO content_analyses (
-                    content_id, analysis_type, analyzer_name, analyzer_version,
-                    processing_time_ms, success, confidence_score, overall_score,
-                    sentiment_score, sentiment_polarity, dominant_emotion, emotional_intensity,
-                    viral_potential_score, engagement_prediction, trend_direction, trend_strength,
-                    sentiment_analysis, visual_analysis, metrics_analysis, predictions, recommendations
-                ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21
-                ) RETURNING id
-            """, 
-                uuid.UUID(content_id),
-                'comprehensive',
-                'MultiAnalyzer',
-                '1.0.0',
-                sum(result.get('processingTime', 0) for result in analysis_results.values()),
-                True,
-                avg_confidence,
-                weighted_score,
-                analysis_results.get('sentiment', {}).get('sentiment', {}).get('score', 0),
-                analysis_results.get('sentiment', {}).get('sentiment', {}).get('polarity', 'neutral'),
-                analysis_results.get('sentiment', {}).get('emotions', {}).get('dominantEmotion', {}).get('emotion'),
-                analysis_results.get('sentiment', {}).get('emotions', {}).get('emotionalIntensity', 0),
-                analysis_results.get('metrics', {}).get('viralPotential', {}).get('potential', 0),
-                analysis_results.get('engagement', {}).get('prediction', {}).get('score', 0),
-                analysis_results.get('metrics', {}).get('trends', {}).get('direction', 'unknown'),
-                analysis_results.get('metrics', {}).get('trends', {}).get('strength', 0),
-                json.dumps(analysis_results.get('sentiment', {})),
-                json.dumps(analysis_results.get('visual', {})),
-                json.dumps(analysis_results.get('metrics', {})),
-                json.dumps({
-                    'engagement': analysis_results.get('engagement', {}),
-                    'combined_predictions': {}
-                }),
-                json.dumps({
-                    'combined_recommendations': [],
-                    'priority_actions': []
-                })
-            )
+            analysis_id = await save_analysis(conn, uuid.UUID(content_id), run, weighted_score, avg_confidence)
         
         return jsonify({
             'success': True,
@@ -246,12 +422,7 @@ async def analyze_content(content_id):
             'content_id': content_id,
             'analysis_types': analysis_types,
             'results': analysis_results,
-            'summary': {
-                'overall_score': weighted_score,
-                'confidence_score': avg_confidence,
-                'analysis_count': len(analysis_results),
-                'processing_time_total': sum(result.get('processingTime', 0) for result in analysis_results.values())
-            },
+            'summary': build_analysis_summary(run, weighted_score, avg_confidence),
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -261,139 +432,363 @@ async def analyze_content(content_id):
         logger.error(f"Erro na análise de conteúdo: {e}")
         return jsonify({'error': 'Erro interno na análise'}), 500
 
+async def preload_job_page(pool, content_ids):
+    """Carregar todos os conteúdos de uma página do job em uma única consulta"""
+    loader = ContentLoader(pool)
+    await loader.load_many(content_ids)
+    return loader
+
+async def analyze_single_content_async(pool, content_id, analysis_types, loader=None):
+    """Analisar um conteúdo e persistir o resultado (usado pelos jobs em lote)"""
+    loader = loader or ContentLoader(pool)
+    content = await loader.load(content_id)
+    
+    if not content:
+        raise LookupError('Conteúdo não encontrado ou inativo')
+    
+    # Conexão não fica presa enquanto os analisadores executam
+    run = await run_analyzers(build_content_data(content), analysis_types)
+    
+    if run['errors'] and not run['results']:
+        raise RuntimeError(f"Todos os analisadores falharam: {run['errors']}")
+    
+    weighted_score, avg_confidence = calculate_overall_scores(run['results'])
+    
+    # Gravação em lote; o runner força o flush antes de marcar os itens como concluídos
+    analysis_id = await analysis_writer.add(
+        pool, build_analysis_record(content_id, run, weighted_score, avg_confidence)
+    )
+    
+    return {
+        'analysis_id': str(analysis_id),
+        'summary': build_analysis_summary(run, weighted_score, avg_confidence)
+    }
+
+batch_job_runner.set_handler(
+    analyze_single_content_async,
+    before_flush=analysis_writer.persist,
+    page_context=preload_job_page
+)
+
+@analysis_bp.record_once
+def attach_analysis_scheduler(state):
+    """Registrar o scheduler como tarefa periódica do runner (sem iniciá-lo)"""
+    if ANALYSIS_SCHEDULER_ENABLED:
+        # Conteúdos com engajamento crescendo rápido são analisados primeiro,
+        # dividindo o semáforo de analisadores com os jobs em lote
+        analysis_scheduler.attach(batch_job_runner, resolve_analysis_types(['comprehensive']))
+
+@analysis_bp.before_app_request
+def start_batch_job_runner():
+    """
+    Iniciar o runner no worker que atende a requisição
+
+    O início fica fora do import e do registro do blueprint para que, com
+    gunicorn --preload, o processo mestre não execute jobs: cada worker
+    inicia o próprio runner (e retoma jobs interrompidos) na primeira
+    requisição. Depois disso a chamada é apenas uma verificação.
+    """
+    batch_job_runner.start(wait=False)
+
+@analysis_bp.before_app_request
+def prewarm_analyzers():
+    """Pre-warm dos analisadores no worker, uma vez por processo (ANALYZER_PREWARM)"""
+    if _prewarm_keys != []:
+        analyzers.prewarm_once(_prewarm_keys)
+
+@analysis_bp.route('/scheduler', methods=['GET'])
+@jwt_required()
+def get_scheduler_status():
+    """Estado do scheduler de análises e itens de maior prioridade na fila"""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'stats': analysis_scheduler.get_stats(),
+                'top_queued': analysis_scheduler.queue.peek(limit)
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'Parâmetro limit inválido'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao obter estado do scheduler: {e}")
+        return jsonify({'error': 'Erro interno ao obter estado do scheduler'}), 500
+
 @analysis_bp.route('/batch', methods=['POST'])
 @jwt_required()
 async def analyze_batch():
-    """Executar análise em lote para múltiplos conteúdos"""
+    """Criar job de análise em lote para múltiplos conteúdos"""
     try:
         data = request.get_json()
         if not data or 'content_ids' not in data:
             return jsonify({'error': 'Lista de content_ids é obrigatória'}), 400
         
         content_ids = data['content_ids']
-        analysis_types = data.get('analysis_types', ['comprehensive'])
-        max_batch_size = 50
+        analysis_types = resolve_analysis_types(data.get('analysis_types', ['comprehensive']))
         
-        if len(content_ids) > max_batch_size:
+        if not isinstance(content_ids, list) or not content_ids:
+            return jsonify({'error': 'content_ids deve ser uma lista não vazia'}), 400
+        
+        if not analysis_types:
+            return jsonify({'error': f"Tipos de análise válidos: comprehensive, {', '.join(ANALYSIS_TYPES)}"}), 400
+        
+        if len(content_ids) > BATCH_JOB_MAX_ITEMS:
             return jsonify({
-                'error': f'Batch muito grande. Máximo permitido: {max_batch_size}'
+                'error': f'Batch muito grande. Máximo permitido: {BATCH_JOB_MAX_ITEMS}'
             }), 400
         
-        # Validar UUIDs
+        # Validar UUIDs (ignorando repetidos)
         try:
-            validated_ids = [uuid.UUID(cid) for cid in content_ids]
+            validated_ids = list(dict.fromkeys(uuid.UUID(str(cid)) for cid in content_ids))
         except ValueError:
             return jsonify({'error': 'Um ou mais IDs de conteúdo são inválidos'}), 400
         
-        # Buscar conteúdos válidos
         async with current_app.db_pool.acquire() as conn:
+            # Buscar conteúdos válidos
             valid_content = await conn.fetch("""
                 SELECT id FROM scraped_content 
                 WHERE id = ANY($1) AND is_active = true
             """, validated_ids)
             
-            valid_ids = [str(row['id']) for row in valid_content]
-        
-        if not valid_ids:
-            return jsonify({'error': 'Nenhum conteúdo válido encontrado'}), 404
-        
-        # Executar análises em paralelo (limitado)
-        batch_results = []
-        failed_analyses = []
-        
-        # Processar em chunks menores para evitar sobrecarga
-        chunk_size = 10
-        for i in range(0, len(valid_ids), chunk_size):
-            chunk_ids = valid_ids[i:i + chunk_size]
-            
-            # Criar tasks para análise paralela
-            tasks = []
-            for content_id in chunk_ids:
-                # Simular chamada para analyze_content
-                # Em implementação real, extrair lógica para função separada
-                tasks.append(analyze_single_content_async(content_id, analysis_types))
+            valid_ids = [row['id'] for row in valid_content]
             
-            # Executar chunk
-            chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
+            if not valid_ids:
+                return jsonify({'error': 'Nenhum conteúdo válido encontrado'}), 404
             
-            for content_id, result in zip(chunk_ids, chunk_results):
-                if isinstance(result, Exception):
-                    failed_analyses.append({
-                        'content_id': content_id,
-                        'error': str(result)
-                    })
-                else:
-                    batch_results.append({
-                        'content_id': content_id,
-                        'analysis_id': result.get('analysis_id'),
-                        'success': result.get('success', False),
-                        'summary': result.get('summary', {})
-                    })
+            job_id = await batch_job_runner.create_job(
+                conn, valid_ids, analysis_types, created_by=str(get_jwt_identity())
+            )
+        
+        try:
+            batch_job_runner.enqueue(job_id)
+        except RuntimeError as e:
+            # Job já persistido como 'queued': é retomado no próximo bootstrap do runner
+            logger.warning(f"Job {job_id} aguardando o runner: {e}")
         
         return jsonify({
             'success': True,
-            'batch_id': str(uuid.uuid4()),
+            'job_id': str(job_id),
+            'status': 'queued',
             'total_requested': len(content_ids),
             'valid_content': len(valid_ids),
-            'successful_analyses': len(batch_results),
-            'failed_analyses': len(failed_analyses),
-            'results': batch_results,
-            'failures': failed_analyses,
+            'analysis_types': analysis_types,
+            'status_url': f"{analysis_bp.url_prefix}/jobs/{job_id}",
+            'events_url': f"{analysis_bp.url_prefix}/jobs/{job_id}/events",
+            'results_url': f"{analysis_bp.url_prefix}/jobs/{job_id}/results",
             'timestamp': datetime.utcnow().isoformat()
-        })
+        }), 202
         
     except Exception as e:
         logger.error(f"Erro na análise em lote: {e}")
         return jsonify({'error': 'Erro interno na análise em lote'}), 500
 
-async def analyze_single_content_async(content_id, analysis_types):
-    """Função auxiliar para análise assíncrona de conteúdo único"""
-    # Implementação simplificada - em produção, extrair lógica completa
+@analysis_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+async def get_batch_job(job_id):
+    """Obter status e progresso de um job de análise em lote"""
+    try:
+        async with current_app.db_pool.acquire() as conn:
+            job = await conn.fetchrow(f"SELECT {JOB_COLUMNS} FROM analysis_jobs WHERE id = $1", uuid.UUID(job_id))
+        
+        if not job:
+            return jsonify({'error': 'Job não encontrado'}), 404
+        
+        return jsonify({
+            'success': True,
+            'data': job_snapshot(job),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'ID de job inválido'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao obter job {job_id}: {e}")
+        return jsonify({'error': 'Erro interno ao obter job'}), 500
+
+@analysis_bp.route('/jobs/<job_id>', methods=['DELETE'])
+@jwt_required()
+async def cancel_batch_job(job_id):
+    """Cancelar job de análise em lote"""
     try:
-        # Simular análise
-        await asyncio.sleep(0.1)  # Simular processamento
+        snapshot = batch_job_runner.cancel(uuid.UUID(job_id))
         
-        return {
+        return jsonify({
             'success': True,
-            'analysis_id': str(uuid.uuid4()),
-            'summary': {
-                'overall_score': 0.75,
-                'confidence_score': 0.8,
-                'processing_time': 100
-            }
-        }
+            'data': snapshot,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'ID de job inválido'}), 400
+    except JobNotFoundError:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    except Exception as e:
+        logger.error(f"Erro ao cancelar job {job_id}: {e}")
+        return jsonify({'error': 'Erro interno ao cancelar job'}), 500
+
+@analysis_bp.route('/jobs/<job_id>/results', methods=['GET'])
+@jwt_required()
+async def get_batch_job_results(job_id):
+    """Listar resultados dos itens de um job (paginação por content_id)"""
+    try:
+        status = request.args.get('status')
+        after = request.args.get('after')
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        
+        if status and status not in ('pending', 'succeeded', 'failed'):
+            return jsonify({'error': 'Status inválido. Use: pending, succeeded, failed'}), 400
+        
+        async with current_app.db_pool.acquire() as conn:
+            items = await conn.fetch("""
+                SELECT content_id, status, analysis_id, summary, error, processed_at
+                FROM analysis_job_items
+                WHERE job_id = $1
+                AND ($2::text IS NULL OR status = $2)
+                AND ($3::uuid IS NULL OR content_id > $3)
+                ORDER BY content_id
+                LIMIT $4
+            """, uuid.UUID(job_id), status, uuid.UUID(after) if after else None, limit + 1)
+        
+        has_more = len(items) > limit
+        items = items[:limit]
+        
+        return jsonify({
+            'success': True,
+            'data': [
+                {
+                    'content_id': str(item['content_id']),
+                    'status': item['status'],
+                    'analysis_id': str(item['analysis_id']) if item['analysis_id'] else None,
+                    'summary': json.loads(item['summary']) if item['summary'] else None,
+                    'error': item['error'],
+                    'processed_at': item['processed_at'].isoformat() if item['processed_at'] else None
+                }
+                for item in items
+            ],
+            'next_after': str(items[-1]['content_id']) if has_more else None,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
     except Exception as e:
-        raise e
+        logger.error(f"Erro ao listar resultados do job {job_id}: {e}")
+        return jsonify({'error': 'Erro interno ao listar resultados'}), 500
+
+@analysis_bp.route('/jobs/<job_id>/events', methods=['GET'])
+@jwt_required()
+def stream_batch_job_events(job_id):
+    """Progresso do job via Server-Sent Events"""
+    try:
+        job_uuid = uuid.UUID(job_id)
+        batch_job_runner.get_snapshot(job_uuid)
+    except ValueError:
+        return jsonify({'error': 'ID de job inválido'}), 400
+    except JobNotFoundError:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    
+    def generate():
+        version = -1
+        while True:
+            snapshot = batch_job_runner.wait_for_update(job_uuid, version)
+            if snapshot is None:
+                # Comentário SSE mantém a conexão viva através de proxies
+                yield ': keep-alive\n\n'
+                continue
+            
+            version = snapshot['version']
+            yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            
+            if snapshot['status'] in TERMINAL_STATUSES:
+                yield f"event: done\ndata: {json.dumps(snapshot)}\n\n"
+                return
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+async def analyze_sentiment_batch(items):
+    """
+    Handler do micro-batcher de sentimento
+
+    items são tuplas (text, options). Textos repetidos no lote são analisados
+    uma única vez; falhas são devolvidas apenas aos itens afetados.
+    """
+    analyzer = analyzers.get('sentiment')
+    
+    unique = {}
+    for text, options in items:
+        key = (text, json.dumps(options, sort_keys=True, default=str))
+        unique.setdefault(key, (text, options))
+    
+    keys = list(unique.keys())
+    outcomes = await asyncio.gather(
+        *(analyzer.analyzeSentiment(text, options) for text, options in unique.values()),
+        return_exceptions=True
+    )
+    results_by_key = dict(zip(keys, outcomes))
+    
+    return [
+        results_by_key[(text, json.dumps(options, sort_keys=True, default=str))]
+        for text, options in items
+    ]
+
+sentiment_batcher.set_handler(analyze_sentiment_batch)
+
+def validate_sentiment_text(text):
+    """Validar texto para análise de sentimento; retorna mensagem de erro ou None"""
+    if not isinstance(text, str):
+        return 'Texto deve ser uma string'
+    if len(text.strip()) < 10:
+        return 'Texto muito curto para análise'
+    if len(text) > 50000:
+        return 'Texto muito longo (máximo 50.000 caracteres)'
+    return None
+
+def build_sentiment_text_stats(text, result):
+    return {
+        'character_count': len(text),
+        'word_count': len(text.split()),
+        'language_detected': result.get('text', {}).get('language', 'unknown')
+    }
 
 @analysis_bp.route('/sentiment', methods=['POST'])
 @jwt_required()
 async def analyze_sentiment():
-    """Análise de sentimento para texto fornecido"""
+    """
+    Análise de sentimento para texto fornecido
+
+    Aceita "text" (um texto) ou "texts" (lista, modo bulk). As chamadas de
+    todas as requisições são agrupadas pelo micro-batcher de sentimento.
+    """
     try:
         data = request.get_json()
-        if not data or 'text' not in data:
-            return jsonify({'error': 'Campo "text" é obrigatório'}), 400
+        if not data or ('text' not in data and 'texts' not in data):
+            return jsonify({'error': 'Campo "text" ou "texts" é obrigatório'}), 400
         
-        text = data['text']
         options = data.get('options', {})
         
-        if len(text.strip()) < 10:
-            return jsonify({'error': 'Texto muito curto para análise'}), 400
+        if 'texts' in data:
+            return await analyze_sentiment_bulk(data['texts'], options)
+        
+        text = data['text']
         
-        if len(text) > 50000:
-            return jsonify({'error': 'Texto muito longo (máximo 50.000 caracteres)'}), 400
+        error = validate_sentiment_text(text)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Executar análise de sentimento
-        result = await sentiment_analyzer.analyzeSentiment(text, options)
+        # Executar análise de sentimento no próximo lote
+        result = await sentiment_batcher.run((text, options))
         
         return jsonify({
             'success': True,
             'data': result,
-            'text_stats': {
-                'character_count': len(text),
-                'word_count': len(text.split()),
-                'language_detected': result.get('text', {}).get('language', 'unknown')
-            },
+            'text_stats': build_sentiment_text_stats(text, result),
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -401,6 +796,52 @@ async def analyze_sentiment():
         logger.error(f"Erro na análise de sentimento: {e}")
         return jsonify({'error': 'Erro interno na análise de sentimento'}), 500
 
+async def analyze_sentiment_bulk(texts, options):
+    """Modo bulk: valida cada texto e envia os válidos ao batcher de uma vez"""
+    if not isinstance(texts, list) or not texts:
+        return jsonify({'error': 'Campo "texts" deve ser uma lista não vazia'}), 400
+    
+    if len(texts) > SENTIMENT_BULK_MAX_TEXTS:
+        return jsonify({
+            'error': f'Muitos textos. Máximo permitido: {SENTIMENT_BULK_MAX_TEXTS}'
+        }), 400
+    
+    results = [None] * len(texts)
+    valid_indexes = []
+    for index, text in enumerate(texts):
+        error = validate_sentiment_text(text)
+        if error:
+            results[index] = {'index': index, 'success': False, 'error': error}
+        else:
+            valid_indexes.append(index)
+    
+    outcomes = await sentiment_batcher.run_many([(texts[i], options) for i in valid_indexes])
+    
+    for index, outcome in zip(valid_indexes, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Erro na análise de sentimento (texto {index}): {outcome}")
+            results[index] = {'index': index, 'success': False, 'error': 'Erro interno na análise de sentimento'}
+        else:
+            results[index] = {
+                'index': index,
+                'success': True,
+                'data': outcome,
+                'text_stats': build_sentiment_text_stats(texts[index], outcome)
+            }
+    
+    succeeded = sum(1 for result in results if result['success'])
+    
+    return jsonify({
+        'success': True,
+        'data': results,
+        'summary': {
+            'total': len(texts),
+            'succeeded': succeeded,
+            'failed': len(texts) - succeeded
+        },
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
 @analysis_bp.route('/trends', methods=['GET'])
 @jwt_required()
 async def get_analysis_trends():
@@ -412,133 +853,23 @@ async def get_analysis_trends():
         period = request.args.get('period', '7d')  # 1d, 7d, 30d, 90d
         niche = request.args.get('niche')
         
-        # Converter período para intervalo SQL
+        # Converter período para intervalo
         period_mapping = {
-            '1d': '1 day',
-            '7d': '7 days',
-            '30d': '30 days',
-            '90d': '90 days'
+            '1d': timedelta(days=1),
+            '7d': timedelta(days=7),
+            '30d': timedelta(days=30),
+            '90d': timedelta(days=90)
         }
         
         if period not in period_mapping:
             return jsonify({'error': 'Período inválido. Use: 1d, 7d, 30d, 90d'}), 400
         
-        sql_interval = period_mapping[period]
-        
+        # Estado agregado por (dia, plataforma, analysis_type), mantido pelo
+        # trigger de content_analyses: ~1 linha por dia e plataforma
         async with current_app.db_pool.acquire() as conn:
-            # Query base para tendências
-            where_conditions = [
-                "ca.analyzed_at >= NOW() - INTERVAL $1",
-                "ca.success = true",
-                f"ca.analysis_type = $2"
-            ]
-            params = [sql_interval, analysis_type]
-            param_count = 2
-            
-            if platform:
-                param_count += 1
-                where_conditions.append(f"sc.platform = ${param_count}")
-                params.append(platform)
-            
-            where_clause = " AND ".join(where_conditions)
-            
-            # Tendências de sentimento
-            sentiment_trends = await conn.fetch(f"""
-                SELECT 
-                    DATE_TRUNC('day', ca.analyzed_at) as date,
-                    ca.sentiment_polarity,
-                    COUNT(*) as count,
-                    AVG(ca.sentiment_score) as avg_sentiment_score,
-                    AVG(ca.emotional_intensity) as avg_emotional_intensity
-                FROM content_analyses ca
-                JOIN scraped_content sc ON ca.content_id = sc.id
-                WHERE {where_clause}
-                AND ca.sentiment_polarity IS NOT NULL
-                GROUP BY DATE_TRUNC('day', ca.analyzed_at), ca.sentiment_polarity
-                ORDER BY date DESC, count DESC
-            """, *params)
-            
-            # Tendências de potencial viral
-            viral_trends = await conn.fetch(f"""
-                SELECT 
-                    DATE_TRUNC('day', ca.analyzed_at) as date,
-                    COUNT(*) as total_content,
-                    COUNT(*) FILTER (WHERE ca.viral_potential_score > 0.8) as high_viral_potential,
-                    COUNT(*) FILTER (WHERE ca.viral_potential_score > 0.6) as medium_viral_potential,
-                    AVG(ca.viral_potential_score) as avg_viral_potential,
-                    AVG(ca.overall_score) as avg_overall_score
-                FROM content_analyses ca
-                JOIN scraped_content sc ON ca.content_id = sc.id
-                WHERE {where_clause}
-                AND ca.viral_potential_score IS NOT NULL
-                GROUP BY DATE_TRUNC('day', ca.analyzed_at)
-                ORDER BY date DESC
-            """, *params)
-            
-            # Top emoções por período
-            top_emotions = await conn.fetch(f"""
-                SELECT 
-                    ca.dominant_emotion,
-                    COUNT(*) as count,
-                    AVG(ca.emotional_intensity) as avg_intensity,
-                    AVG(ca.overall_score) as avg_performance
-                FROM content_analyses ca
-                JOIN scraped_content sc ON ca.content_id = sc.id
-                WHERE {where_clause}
-                AND ca.dominant_emotion IS NOT NULL
-                GROUP BY ca.dominant_emotion
-                ORDER BY count DESC
-                LIMIT 10
-            """, *params)
-            
-            # Estatísticas gerais
-            general_stats = await conn.fetchrow(f"""
-                SELECT 
-                    COUNT(*) as total_analyses,
-                    AVG(ca.overall_score) as avg_overall_score,
-                    AVG(ca.confidence_score) as avg_confidence,
-                    AVG(ca.processing_time_ms) as avg_processing_time,
-                    COUNT(*) FILTER (WHERE ca.viral_potential_score > 0.7) as high_potential_count
-                FROM content_analyses ca
-                JOIN scraped_content sc ON ca.content_id = sc.id
-                WHERE {where_clause}
-            """, *params)
-        
-        # Formatar dados de tendências de sentimento
-        sentiment_by_date = {}
-        for row in sentiment_trends:
-            date_str = row['date'].strftime('%Y-%m-%d')
-            if date_str not in sentiment_by_date:
-                sentiment_by_date[date_str] = {}
-            
-            sentiment_by_date[date_str][row['sentiment_polarity']] = {
-                'count': row['count'],
-                'avg_sentiment_score': float(row['avg_sentiment_score']) if row['avg_sentiment_score'] else 0,
-                'avg_emotional_intensity': float(row['avg_emotional_intensity']) if row['avg_emotional_intensity'] else 0
-            }
-        
-        # Formatar dados de tendências virais
-        viral_by_date = {}
-        for row in viral_trends:
-            date_str = row['date'].strftime('%Y-%m-%d')
-            viral_by_date[date_str] = {
-                'total_content': row['total_content'],
-                'high_viral_potential': row['high_viral_potential'],
-                'medium_viral_potential': row['medium_viral_potential'],
-                'avg_viral_potential': float(row['avg_viral_potential']) if row['avg_viral_potential'] else 0,
-                'avg_overall_score': float(row['avg_overall_score']) if row['avg_overall_score'] else 0,
-                'viral_rate': row['high_viral_potential'] / row['total_content'] if row['total_content'] > 0 else 0
-            }
-        
-        # Formatar top emoções
-        emotions_data = []
-        for row in top_emotions:
-            emotions_data.append({
-                'emotion': row['dominant_emotion'],
-                'count': row['count'],
-                'avg_intensity': float(row['avg_intensity']) if row['avg_intensity'] else 0,
-                'avg_performance': float(row['avg_performance']) if row['avg_performance'] else 0
-            })
+            by_day, total = await fetch_trend_states(
+                conn, analysis_type, period_start_for(period_mapping[period]), platform
+            )
         
         return jsonify({
             'success': True,
@@ -548,18 +879,7 @@ async def get_analysis_trends():
                 'analysis_type': analysis_type,
                 'niche': niche
             },
-            'data': {
-                'sentiment_trends': sentiment_by_date,
-                'viral_trends': viral_by_date,
-                'top_emotions': emotions_data,
-                'general_stats': {
-                    'total_analyses': general_stats['total_analyses'],
-                    'avg_overall_score': float(general_stats['avg_overall_score']) if general_stats['avg_overall_score'] else 0,
-                    'avg_confidence': float(general_stats['avg_confidence']) if general_stats['avg_confidence'] else 0,
-                    'avg_processing_time_ms': general_stats['avg_processing_time'],
-                    'high_potential_rate': general_stats['high_potential_count'] / general_stats['total_analyses'] if general_stats['total_analyses'] > 0 else 0
-                }
-            },
+            'data': build_trend_report(by_day, total),
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -582,8 +902,14 @@ async def compare_content():
         if len(content_ids) < 2:
             return jsonify({'error': 'Pelo menos 2 conteúdos são necessários para comparação'}), 400
         
-        if len(content_ids) > 10:
-            return jsonify({'error': 'Máximo de 10 conteúdos por comparação'}), 400
+        if len(content_ids) > MAX_COMPARE_CONTENTS:
+            return jsonify({'error': f'Máximo de {MAX_COMPARE_CONTENTS} conteúdos por comparação'}), 400
+        
+        invalid_metrics = [metric for metric in comparison_metrics if metric not in COMPARISON_METRICS]
+        if invalid_metrics:
+            return jsonify({
+                'error': f"Métricas inválidas: {', '.join(invalid_metrics)}. Use: {', '.join(COMPARISON_METRICS)}"
+            }), 400
         
         # Validar UUIDs
         try:
@@ -636,12 +962,20 @@ async def compare_content():
             if not comparison_data:
                 return jsonify({'error': 'Nenhuma análise encontrada para os conteúdos fornecidos'}), 404
         
-        # Processar dados de comparação
-        content_comparisons = []
-        metric_summaries = {}
+        # Representação colunar: todas as estatísticas em uma passada vetorizada
+        matrix = to_matrix(comparison_data, COMPARISON_METRICS)
+        # Contagens ausentes são tratadas como zero, como na resposta por conteúdo
+        count_columns = [COMPARISON_METRICS.index(metric) for metric in COUNT_METRICS]
+        matrix[:, count_columns] = np.nan_to_num(matrix[:, count_columns])
+        
+        selected_columns = [COMPARISON_METRICS.index(metric) for metric in comparison_metrics]
+        selected = matrix[:, selected_columns]
+        stats = summarize_columns(selected)
+        correlations = rank_correlations(selected)
         
-        for row in comparison_data:
-            content_info = {
+        content_comparisons = []
+        for i, row in enumerate(comparison_data):
+            content_comparisons.append({
                 'id': str(row['id']),
                 'platform': row['platform'],
                 'content_type': row['content_type'],
@@ -650,99 +984,72 @@ async def compare_content():
                 'published_at': row['published_at'].isoformat() if row['published_at'] else None,
                 'analyzed_at': row['analyzed_at'].isoformat() if row['analyzed_at'] else None,
                 'metrics': {
-                    'overall_score': float(row['overall_score']) if row['overall_score'] else None,
-                    'confidence_score': float(row['confidence_score']) if row['confidence_score'] else None,
-                    'viral_potential_score': float(row['viral_potential_score']) if row['viral_potential_score'] else None,
-                    'sentiment_score': float(row['sentiment_score']) if row['sentiment_score'] else None,
+                    **{
+                        metric: int(matrix[i, j]) if metric in COUNT_METRICS else to_python(matrix[i, j])
+                        for j, metric in enumerate(COMPARISON_METRICS)
+                    },
                     'sentiment_polarity': row['sentiment_polarity'],
-                    'dominant_emotion': row['dominant_emotion'],
-                    'emotional_intensity': float(row['emotional_intensity']) if row['emotional_intensity'] else None,
-                    'visual_quality_score': float(row['visual_quality_score']) if row['visual_quality_score'] else None,
-                    'likes_count': row['likes_count'] or 0,
-                    'comments_count': row['comments_count'] or 0,
-                    'shares_count': row['shares_count'] or 0,
-                    'views_count': row['views_count'] or 0,
-                    'engagement_rate': float(row['engagement_rate']) if row['engagement_rate'] else 0
+                    'dominant_emotion': row['dominant_emotion']
+                },
+                'z_scores': {
+                    metric: to_python(stats['z_scores'][i, j]) for j, metric in enumerate(comparison_metrics)
+                },
+                'ranks': {
+                    metric: to_python(stats['ranks'][i, j]) for j, metric in enumerate(comparison_metrics)
                 }
+            })
+        
+        metric_summaries = {}
+        for j, metric in enumerate(comparison_metrics):
+            summary = {
+                'count': int(stats['count'][j]),
+                'min': to_python(stats['min'][j]),
+                'max': to_python(stats['max'][j]),
+                'avg': to_python(stats['mean'][j]),
+                'std': to_python(stats['std'][j]),
+                'percentiles': {
+                    f'p{p}': to_python(stats['percentiles'][k, j]) for k, p in enumerate(PERCENTILES)
+                },
+                'best_content': None,
+                'worst_content': None
             }
             
-            content_comparisons.append(content_info)
-            
-            # Calcular estatísticas por métrica
-            for metric in comparison_metrics:
-                if metric not in metric_summaries:
-                    metric_summaries[metric] = {
-                        'values': [],
-                        'min': None,
-                        'max': None,
-                        'avg': None,
-                        'best_content': None,
-                        'worst_content': None
+            if stats['has_values'][j]:
+                for key, index in (('best_content', stats['best_index'][j]), ('worst_content', stats['worst_index'][j])):
+                    summary[key] = {
+                        'id': content_comparisons[index]['id'],
+                        'title': content_comparisons[index]['title'],
+                        'value': to_python(selected[index, j])
                     }
-                
-                value = content_info['metrics'].get(metric)
-                if value is not None:
-                    metric_summaries[metric]['values'].append({
-                        'content_id': content_info['id'],
-                        'value': value,
-                        'title': content_info['title']
-                    })
-        
-        # Calcular estatísticas finais
-        for metric, summary in metric_summaries.items():
-            if summary['values']:
-                values = [item['value'] for item in summary['values']]
-                summary['min'] = min(values)
-                summary['max'] = max(values)
-                summary['avg'] = sum(values) / len(values)
-                
-                # Encontrar melhor e pior conteúdo
-                best_item = max(summary['values'], key=lambda x: x['value'])
-                worst_item = min(summary['values'], key=lambda x: x['value'])
-                
-                summary['best_content'] = {
-                    'id': best_item['content_id'],
-                    'title': best_item['title'],
-                    'value': best_item['value']
-                }
-                summary['worst_content'] = {
-                    'id': worst_item['content_id'],
-                    'title': worst_item['title'],
-                    'value': worst_item['value']
+            
+            metric_summaries[metric] = summary
+        
+        rank_correlation_matrix = None
+        if correlations is not None:
+            rank_correlation_matrix = {
+                metric_a: {
+                    metric_b: to_python(correlations[a, b])
+                    for b, metric_b in enumerate(comparison_metrics)
                 }
-                
-                # Remover valores brutos para limpar resposta
-                del summary['values']
+                for a, metric_a in enumerate(comparison_metrics)
+            }
         
         # Identificar padrões e insights
         insights = []
         
         # Insight sobre plataformas
-        platforms = [content['platform'] for content in content_comparisons]
+        platforms = [row['platform'] for row in comparison_data]
         if len(set(platforms)) > 1:
-            platform_performance = {}
-            for content in content_comparisons:
-                platform = content['platform']
-                overall_score = content['metrics']['overall_score']
-                if overall_score is not None:
-                    if platform not in platform_performance:
-                        platform_performance[platform] = []
-                    platform_performance[platform].append(overall_score)
-            
-            if len(platform_performance) > 1:
-                platform_avgs = {p: sum(scores)/len(scores) for p, scores in platform_performance.items()}
+            platform_avgs = group_means(platforms, matrix[:, COMPARISON_METRICS.index('overall_score')])
+            if len(platform_avgs) > 1:
                 best_platform = max(platform_avgs, key=platform_avgs.get)
                 insights.append(f"Plataforma com melhor performance: {best_platform} (score médio: {platform_avgs[best_platform]:.3f})")
         
         # Insight sobre sentimento
-        sentiments = [content['metrics']['sentiment_polarity'] for content in content_comparisons if content['metrics']['sentiment_polarity']]
-        if sentiments:
-            sentiment_counts = {}
-            for sentiment in sentiments:
-                sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
-            
-            dominant_sentiment = max(sentiment_counts, key=sentiment_counts.get)
-            insights.append(f"Sentimento dominante: {dominant_sentiment} ({sentiment_counts[dominant_sentiment]}/{len(sentiments)} conteúdos)")
+        sentiment_counts = Counter(row['sentiment_polarity'] for row in comparison_data if row['sentiment_polarity'])
+        if sentiment_counts:
+            dominant_sentiment, dominant_count = sentiment_counts.most_common(1)[0]
+            insights.append(f"Sentimento dominante: {dominant_sentiment} ({dominant_count}/{sum(sentiment_counts.values())} conteúdos)")
         
         return jsonify({
             'success': True,
@@ -751,6 +1058,7 @@ async def compare_content():
                 'metrics_analyzed': comparison_metrics,
                 'contents': content_comparisons,
                 'metric_summaries': metric_summaries,
+                'rank_correlations': rank_correlation_matrix,
                 'insights': insights
             },
             'timestamp': datetime.utcnow().isoformat()
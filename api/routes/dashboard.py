@@ -6,15 +6,227 @@ Autor: Manus AI
 Data: 27 de Janeiro de 2025
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from datetime import datetime, timedelta
 import random
 from ..utils.auth import require_auth
 from ..utils.cache import cache_result
 from ..utils.validators import validate_request
+from ..utils.exporter import export_jobs, available_formats, flatten_record
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+# Atividades incluídas na exportação (limite máximo do endpoint /activity)
+EXPORT_ACTIVITY_LIMIT = 100
+
+# ---------------------------------------------
+# Dados do dashboard (compartilhados com a exportação)
+# ---------------------------------------------
+
+def build_overview_data():
+    """Visão geral do dashboard"""
+    # Simular dados para desenvolvimento
+    # TODO: Implementar consultas reais ao banco de dados
+    
+    overview_data = {
+        'total_content': 15420,
+        'viral_content': 1240,
+        'active_scrapers': 8,
+        'ai_analyses': 3280,
+        'growth_rate': 12.5,
+        'engagement_rate': 4.2,
+        'platforms_active': ['instagram', 'tiktok', 'youtube', 'linkedin'],
+        'last_updated': datetime.utcnow().isoformat(),
+        'system_status': 'healthy',
+        'api_calls_today': 2847,
+        'storage_used_gb': 15.7,
+        'processing_queue': 23
+    }
+    
+    return overview_data
+
+def build_stats_data(period):
+    """Estatísticas detalhadas para o período ('7d', '30d', ...)"""
+    # Gerar dados baseados no período
+    days = int(period[:-1])
+    
+    # Dados por plataforma
+    content_by_platform = [
+        {'platform': 'Instagram', 'count': 8500, 'color': '#E4405F'},
+        {'platform': 'TikTok', 'count': 4200, 'color': '#000000'},
+        {'platform': 'YouTube', 'count': 2100, 'color': '#FF0000'},
+        {'platform': 'LinkedIn', 'count': 620, 'color': '#0077B5'}
+    ]
+    
+    # Distribuição de score viral
+    viral_score_distribution = [
+        {'range': '0-20', 'count': 2100},
+        {'range': '21-40', 'count': 4800},
+        {'range': '41-60', 'count': 5200},
+        {'range': '61-80', 'count': 2500},
+        {'range': '81-100', 'count': 820}
+    ]
+    
+    # Atividade diária (últimos 7 dias)
+    daily_activity = []
+    base_date = datetime.now() - timedelta(days=6)
+    
+    for i in range(7):
+        current_date = base_date + timedelta(days=i)
+        daily_activity.append({
+            'date': current_date.strftime('%Y-%m-%d'),
+            'scraped': random.randint(800, 1500),
+            'analyzed': random.randint(700, 1300),
+            'viral': random.randint(40, 100)
+        })
+    
+    # Tendências de engajamento por hora
+    engagement_trends = []
+    for hour in [0, 6, 12, 18, 21]:
+        engagement_trends.append({
+            'hour': f'{hour:02d}',
+            'likes': random.randint(1000, 7000),
+            'comments': random.randint(150, 1000),
+            'shares': random.randint(40, 250)
+        })
+    
+    # Hashtags trending
+    trending_hashtags = [
+        {'hashtag': '#fitness', 'count': 1250, 'growth': 15.2},
+        {'hashtag': '#receitas', 'count': 980, 'growth': 12.8},
+        {'hashtag': '#motivacao', 'count': 750, 'growth': 8.5},
+        {'hashtag': '#empreendedorismo', 'count': 620, 'growth': 22.1},
+        {'hashtag': '#lifestyle', 'count': 580, 'growth': 5.7}
+    ]
+    
+    # Top creators
+    top_creators = [
+        {
+            'username': '@fitness_guru',
+            'platform': 'instagram',
+            'followers': 125000,
+            'viral_posts': 8,
+            'avg_engagement': 4.2
+        },
+        {
+            'username': '@chef_receitas',
+            'platform': 'instagram',
+            'followers': 89000,
+            'viral_posts': 6,
+            'avg_engagement': 3.8
+        },
+        {
+            'username': '@motivacao_diaria',
+            'platform': 'tiktok',
+            'followers': 67000,
+            'viral_posts': 12,
+            'avg_engagement': 5.1
+        }
+    ]
+    
+    stats_data = {
+        'period': period,
+        'content_by_platform': content_by_platform,
+        'viral_score_distribution': viral_score_distribution,
+        'daily_activity': daily_activity,
+        'engagement_trends': engagement_trends,
+        'trending_hashtags': trending_hashtags,
+        'top_creators': top_creators,
+        'summary': {
+            'total_posts_period': sum(day['scraped'] for day in daily_activity),
+            'total_viral_period': sum(day['viral'] for day in daily_activity),
+            'avg_viral_rate': round(sum(day['viral'] for day in daily_activity) / sum(day['scraped'] for day in daily_activity) * 100, 2),
+            'most_active_platform': max(content_by_platform, key=lambda x: x['count'])['platform'],
+            'growth_trend': 'positive' if random.choice([True, False]) else 'negative'
+        }
+    }
+    
+    return stats_data
+
+def build_recent_activity(limit):
+    """Atividades recentes, mais recentes primeiro"""
+    # Simular atividades recentes
+    activities = []
+    activity_types = [
+        {
+            'type': 'viral_content',
+            'title': 'Conteúdo viral detectado',
+            'descriptions': [
+                'Post do @influencer com 85K likes',
+                'Reel com 120K visualizações em 2h',
+                'Carrossel com 95K likes e 2.5K comentários',
+                'Story com 150K visualizações'
+            ]
+        },
+        {
+            'type': 'scraping_completed',
+            'title': 'Scraping concluído',
+            'descriptions': [
+                'Hashtag #fitness - 150 posts coletados',
+                'Perfil @creator - 80 posts analisados',
+                'Trending TikTok - 200 vídeos processados',
+                'LinkedIn posts - 45 artigos coletados'
+            ]
+        },
+        {
+            'type': 'template_generated',
+            'title': 'Template extraído',
+            'descriptions': [
+                'Carrossel de receitas saudáveis',
+                'Template de motivação matinal',
+                'Layout de dicas de negócios',
+                'Estrutura de workout em casa'
+            ]
+        },
+        {
+            'type': 'profile_analyzed',
+            'title': 'Perfil analisado',
+            'descriptions': [
+                'Análise completa de @fitness_pro',
+                'Padrões identificados em @chef_master',
+                'Estratégia extraída de @business_tips',
+                'Tendências de @lifestyle_blog'
+            ]
+        },
+        {
+            'type': 'ai_analysis',
+            'title': 'Análise IA concluída',
+            'descriptions': [
+                'Sentimento positivo em 95% dos posts',
+                'Padrões visuais identificados',
+                'Gatilhos emocionais mapeados',
+                'Score viral calculado: 87/100'
+            ]
+        }
+    ]
+    
+    platforms = ['instagram', 'tiktok', 'youtube', 'linkedin']
+    
+    for i in range(limit):
+        activity_type = random.choice(activity_types)
+        
+        activity = {
+            'id': i + 1,
+            'type': activity_type['type'],
+            'title': activity_type['title'],
+            'description': random.choice(activity_type['descriptions']),
+            'timestamp': (datetime.utcnow() - timedelta(minutes=random.randint(1, 120))).isoformat(),
+            'platform': random.choice(platforms),
+            'user_id': f'user_{random.randint(1, 100)}',
+            'metadata': {
+                'processing_time': f'{random.randint(1, 30)}s',
+                'confidence': round(random.uniform(0.7, 0.99), 2),
+                'priority': random.choice(['low', 'medium', 'high'])
+            }
+        }
+        
+        activities.append(activity)
+    
+    # Ordenar por timestamp (mais recente primeiro)
+    activities.sort(key=lambda x: x['timestamp'], reverse=True)
+    
+    return activities
+
 @dashboard_bp.route('/overview', methods=['GET'])
 @require_auth
 @cache_result(ttl=300)  # Cache por 5 minutos
@@ -23,23 +235,7 @@ def get_dashboard_overview():
     Obter visão geral do dashboard
     """
     try:
-        # Simular dados para desenvolvimento
-        # TODO: Implementar consultas reais ao banco de dados
-        
-        overview_data = {
-            'total_content': 15420,
-            'viral_content': 1240,
-            'active_scrapers': 8,
-            'ai_analyses': 3280,
-            'growth_rate': 12.5,
-            'engagement_rate': 4.2,
-            'platforms_active': ['instagram', 'tiktok', 'youtube', 'linkedin'],
-            'last_updated': datetime.utcnow().isoformat(),
-            'system_status': 'healthy',
-            'api_calls_today': 2847,
-            'storage_used_gb': 15.7,
-            'processing_queue': 23
-        }
+        overview_data = build_overview_data()
         
         return jsonify({
             'success': True,
@@ -71,99 +267,7 @@ def get_dashboard_stats():
                 'error': 'Período inválido. Use: 1d, 7d, 30d, 90d'
             }), 400
         
-        # Gerar dados baseados no período
-        days = int(period[:-1])
-        
-        # Dados por plataforma
-        content_by_platform = [
-            {'platform': 'Instagram', 'count': 8500, 'color': '#E4405F'},
-            {'platform': 'TikTok', 'count': 4200, 'color': '#000000'},
-            {'platform': 'YouTube', 'count': 2100, 'color': '#FF0000'},
-            {'platform': 'LinkedIn', 'count': 620, 'color': '#0077B5'}
-        ]
-        
-        # Distribuição de score viral
-        viral_score_distribution = [
-            {'range': '0-20', 'count': 2100},
-            {'range': '21-40', 'count': 4800},
-            {'range': '41-60', 'count': 5200},
-            {'range': '61-80', 'count': 2500},
-            {'range': '81-100', 'count': 820}
-        ]
-        
-        # Atividade diária (últimos 7 dias)
-        daily_activity = []
-        base_date = datetime.now() - timedelta(days=6)
-        
-        for i in range(7):
-            current_date = base_date + timedelta(days=i)
-            daily_activity.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'scraped': random.randint(800, 1500),
-                'analyzed': random.randint(700, 1300),
-                'viral': random.randint(40, 100)
-            })
-        
-        # Tendências de engajamento por hora
-        engagement_trends = []
-        for hour in [0, 6, 12, 18, 21]:
-            engagement_trends.append({
-                'hour': f'{hour:02d}',
-                'likes': random.randint(1000, 7000),
-                'comments': random.randint(150, 1000),
-                'shares': random.randint(40, 250)
-            })
-        
-        # Hashtags trending
-        trending_hashtags = [
-            {'hashtag': '#fitness', 'count': 1250, 'growth': 15.2},
-            {'hashtag': '#receitas', 'count': 980, 'growth': 12.8},
-            {'hashtag': '#motivacao', 'count': 750, 'growth': 8.5},
-            {'hashtag': '#empreendedorismo', 'count': 620, 'growth': 22.1},
-            {'hashtag': '#lifestyle', 'count': 580, 'growth': 5.7}
-        ]
-        
-        # Top creators
-        top_creators = [
-            {
-                'username': '@fitness_guru',
-                'platform': 'instagram',
-                'followers': 125000,
-                'viral_posts': 8,
-                'avg_engagement': 4.2
-            },
-            {
-                'username': '@chef_receitas',
-                'platform': 'instagram',
-                'followers': 89000,
-                'viral_posts': 6,
-                'avg_engagement': 3.8
-            },
-            {
-                'username': '@motivacao_diaria',
-                'platform': 'tiktok',
-                'followers': 67000,
-                'viral_posts': 12,
-                'avg_engagement': 5.1
-            }
-        ]
-        
-        stats_data = {
-            'period': period,
-            'content_by_platform': content_by_platform,
-            'viral_score_distribution': viral_score_distribution,
-            'daily_activity': daily_activity,
-            'engagement_trends': engagement_trends,
-            'trending_hashtags': trending_hashtags,
-            'top_creators': top_creators,
-            'summary': {
-                'total_posts_period': sum(day['scraped'] for day in daily_activity),
-                'total_viral_period': sum(day['viral'] for day in daily_activity),
-                'avg_viral_rate': round(sum(day['viral'] for day in daily_activity) / sum(day['scraped'] for day in daily_activity) * 100, 2),
-                'most_active_platform': max(content_by_platform, key=lambda x: x['count'])['platform'],
-                'growth_trend': 'positive' if random.choice([True, False]) else 'negative'
-            }
-        }
+        stats_data = build_stats_data(period)
         
         return jsonify({
             'success': True,
@@ -194,85 +298,7 @@ def get_recent_activity():
                 'error': 'Limite deve estar entre 1 e 100'
             }), 400
         
-        # Simular atividades recentes
-        activities = []
-        activity_types = [
-            {
-                'type': 'viral_content',
-                'title': 'Conteúdo viral detectado',
-                'descriptions': [
-                    'Post do @influencer com 85K likes',
-                    'Reel com 120K visualizações em 2h',
-                    'Carrossel com 95K likes e 2.5K comentários',
-                    'Story com 150K visualizações'
-                ]
-            },
-            {
-                'type': 'scraping_completed',
-                'title': 'Scraping concluído',
-                'descriptions': [
-                    'Hashtag #fitness - 150 posts coletados',
-                    'Perfil @creator - 80 posts analisados',
-                    'Trending TikTok - 200 vídeos processados',
-                    'LinkedIn posts - 45 artigos coletados'
-                ]
-            },
-            {
-                'type': 'template_generated',
-                'title': 'Template extraído',
-                'descriptions': [
-                    'Carrossel de receitas saudáveis',
-                    'Template de motivação matinal',
-                    'Layout de dicas de negócios',
-                    'Estrutura de workout em casa'
-                ]
-            },
-            {
-                'type': 'profile_analyzed',
-                'title': 'Perfil analisado',
-                'descriptions': [
-                    'Análise completa de @fitness_pro',
-                    'Padrões identificados em @chef_master',
-                    'Estratégia extraída de @business_tips',
-                    'Tendências de @lifestyle_blog'
-                ]
-            },
-            {
-                'type': 'ai_analysis',
-                'title': 'Análise IA concluída',
-                'descriptions': [
-                    'Sentimento positivo em 95% dos posts',
-                    'Padrões visuais identificados',
-                    'Gatilhos emocionais mapeados',
-                    'Score viral calculado: 87/100'
-                ]
-            }
-        ]
-        
-        platforms = ['instagram', 'tiktok', 'youtube', 'linkedin']
-        
-        for i in range(limit):
-            activity_type = random.choice(activity_types)
-            
-            activity = {
-                'id': i + 1,
-                'type': activity_type['type'],
-                'title': activity_type['title'],
-                'description': random.choice(activity_type['descriptions']),
-                'timestamp': (datetime.utcnow() - timedelta(minutes=random.randint(1, 120))).isoformat(),
-                'platform': random.choice(platforms),
-                'user_id': f'user_{random.randint(1, 100)}',
-                'metadata': {
-                    'processing_time': f'{random.randint(1, 30)}s',
-                    'confidence': round(random.uniform(0.7, 0.99), 2),
-                    'priority': random.choice(['low', 'medium', 'high'])
-                }
-            }
-            
-            activities.append(activity)
-        
-        # Ordenar por timestamp (mais recente primeiro)
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
+        activities = build_recent_activity(limit)
         
         return jsonify({
             'success': True,
@@ -410,41 +436,97 @@ def get_system_alerts():
             'error': f'Erro ao obter alertas: {str(e)}'
         }), 500
 
+def dashboard_export_rows(data_type, period='7d'):
+    """Linhas planas (dicionários) exportáveis para cada tipo de dado"""
+    if data_type == 'overview':
+        return [flatten_record(build_overview_data())]
+    
+    if data_type == 'stats':
+        stats_data = build_stats_data(period)
+        rows = []
+        for section, items in stats_data.items():
+            if isinstance(items, list):
+                rows.extend(flatten_record({'section': section, **item}) for item in items)
+            elif isinstance(items, dict):
+                rows.append(flatten_record({'section': section, **items}))
+        return rows
+    
+    return [flatten_record(activity) for activity in build_recent_activity(EXPORT_ACTIVITY_LIMIT)]
+
+def export_columns(rows):
+    """União das colunas na ordem em que aparecem"""
+    return list(dict.fromkeys(column for row in rows for column in row))
+
+def export_job_response(job, message):
+    """Representação pública de um job de exportação"""
+    return {
+        'export_id': job['job_id'],
+        'status': job['status'],
+        'format': job['format'],
+        'compressed': job['compressed'],
+        'filename': job['filename'],
+        'rows': job['rows'],
+        'size_bytes': job['size_bytes'],
+        'metadata': job['metadata'],
+        'generated_at': job['completed_at'],
+        'status_url': f"/api/v1/dashboard/exports/{job['job_id']}",
+        'download_url': f"/api/v1/dashboard/downloads/{job['job_id']}",
+        'expires_at': job['expires_at'],
+        'error': job['error'],
+        'message': message
+    }
+
 @dashboard_bp.route('/export', methods=['POST'])
 @require_auth
 @validate_request({
-    'format': {'type': 'string', 'required': True, 'choices': ['json', 'csv', 'xlsx']},
+    'format': {'type': 'string', 'required': True, 'choices': ['json', 'ndjson', 'csv', 'xlsx', 'parquet']},
     'data_type': {'type': 'string', 'required': True, 'choices': ['overview', 'stats', 'activity']},
-    'period': {'type': 'string', 'required': False, 'default': '7d'}
+    'period': {'type': 'string', 'required': False, 'default': '7d'},
+    'compress': {'type': 'boolean', 'required': False, 'default': False}
 })
 def export_dashboard_data():
     """
     Exportar dados do dashboard
+    
+    A exportação roda como job em disco; o arquivo fica disponível em
+    download_url (com suporte a Range) até expires_at.
     """
     try:
         data = request.get_json()
         export_format = data['format']
         data_type = data['data_type']
         period = data.get('period', '7d')
+        compress = bool(data.get('compress', False))
         
-        # Simular exportação de dados
-        export_data = {
-            'export_id': f'export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}',
-            'format': export_format,
-            'data_type': data_type,
-            'period': period,
-            'generated_at': datetime.utcnow().isoformat(),
-            'file_size_mb': round(random.uniform(0.5, 10.0), 2),
-            'download_url': f'/api/v1/dashboard/downloads/export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.{export_format}',
-            'expires_at': (datetime.utcnow() + timedelta(hours=24)).isoformat()
-        }
+        if period not in ('1d', '7d', '30d', '90d'):
+            return jsonify({
+                'success': False,
+                'error': 'Período inválido. Use: 1d, 7d, 30d, 90d'
+            }), 400
+        
+        if export_format not in available_formats():
+            return jsonify({
+                'success': False,
+                'error': f'Formato de exportação indisponível: {export_format}',
+                'supported_formats': available_formats()
+            }), 400
+        
+        rows = dashboard_export_rows(data_type, period)
+        job = export_jobs.submit(
+            lambda: rows,
+            export_format,
+            columns=export_columns(rows),
+            compress=compress,
+            filename_prefix=f'dashboard_{data_type}',
+            metadata={'data_type': data_type, 'period': period}
+        )
         
         return jsonify({
             'success': True,
-            'data': export_data,
+            'data': export_job_response(job, 'Exportação agendada'),
             'message': f'Exportação {export_format.upper()} iniciada com sucesso',
             'timestamp': datetime.utcnow().isoformat()
-        })
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -452,3 +534,57 @@ def export_dashboard_data():
             'error': f'Erro ao exportar dados: {str(e)}'
         }), 500
 
+@dashboard_bp.route('/exports/<export_id>', methods=['GET'])
+@require_auth
+def get_export_status(export_id):
+    """
+    Obter status de um job de exportação
+    """
+    job = export_jobs.get(export_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Exportação não encontrada'
+        }), 404
+    
+    messages = {
+        'pending': 'Exportação na fila',
+        'running': 'Exportação em andamento',
+        'completed': 'Exportação concluída',
+        'failed': 'Exportação falhou'
+    }
+    return jsonify({
+        'success': True,
+        'data': export_job_response(job, messages.get(job['status'], '')),
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+@dashboard_bp.route('/downloads/<export_id>', methods=['GET'])
+@require_auth
+def download_export(export_id):
+    """
+    Baixar arquivo exportado
+    
+    Suporta requisições Range/If-Range (download retomável) e ETag.
+    """
+    job = export_jobs.get(export_id)
+    if job is None or job['expires_at'] <= datetime.utcnow().isoformat():
+        return jsonify({
+            'success': False,
+            'error': 'Exportação não encontrada ou expirada'
+        }), 404
+    
+    if job['status'] != 'completed':
+        return jsonify({
+            'success': False,
+            'error': 'Exportação ainda não concluída',
+            'status': job['status']
+        }), 409
+    
+    return send_file(
+        export_jobs.file_path(export_id),
+        mimetype=job['mimetype'],
+        as_attachment=True,
+        download_name=job['filename'],
+        conditional=True
+    )
@@ -8,12 +8,18 @@ Data: 27 de Janeiro de 2025
 
 from flask import Blueprint, request, jsonify
 from functools import wraps
+import asyncio
 import json
 import os
+import uuid
 from datetime import datetime, timedelta
 import logging
 import re
 
+from ..utils.profile_index import ProfileAnalysisIndex
+from ..utils.profile_batch import profile_batch_runner, PROFILE_BATCH_MAX_PROFILES
+from ..utils.profile_cache import profile_cache, profile_changed
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,6 +31,8 @@ class ProfileAnalysisManager:
     def __init__(self):
         self.analyses_dir = '/home/ubuntu/viral_content_scraper/storage/profile_analyses'
         self.ensure_analyses_dir()
+        # Username/plataforma -> arquivo mais recente e recência, sem listar o diretório
+        self.index = ProfileAnalysisIndex(self.analyses_dir)
         self.analysis_queue = []
         self.supported_platforms = ['instagram', 'tiktok', 'youtube', 'linkedin']
     
@@ -47,72 +55,145 @@ class ProfileAnalysisManager:
         
         return None, None
     
+    def load_analysis_file(self, filename):
+        filepath = os.path.join(self.analyses_dir, filename)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
     def get_analysis_by_username(self, username, platform='instagram'):
         """Buscar análise mais recente de um perfil"""
         try:
-            # Buscar arquivos de análise para o username
-            matching_files = []
-            for filename in os.listdir(self.analyses_dir):
-                if filename.startswith(f"{username}_analysis_") and filename.endswith('.json'):
-                    matching_files.append(filename)
-            
-            if not matching_files:
+            entry = self.index.latest(username, platform)
+            if entry is None:
                 return None
             
-            # Pegar o mais recente
-            latest_file = sorted(matching_files)[-1]
-            filepath = os.path.join(self.analyses_dir, latest_file)
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self.load_analysis_file(entry['filename'])
                 
         except Exception as e:
             logger.error(f"Erro ao buscar análise de {username}: {e}")
             return None
     
     def save_analysis(self, username, analysis_data):
-        """Salvar análise de perfil"""
+        """
+        Salvar análise de perfil
+        
+        Lotes salvam análises concorrentemente: o nome leva microssegundos,
+        plataforma e um sufixo aleatório para que duas análises concluídas no
+        mesmo segundo (mesmo username em plataformas diferentes, URL repetida)
+        não se sobrescrevam. O timestamp vem primeiro para que a ordem dos
+        nomes continue sendo a ordem cronológica.
+        """
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{username}_analysis_{timestamp}.json"
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            platform = analysis_data.get('profile_info', {}).get('platform') or 'unknown'
+            filename = f"{username}_analysis_{timestamp}_{platform}_{uuid.uuid4().hex[:8]}.json"
             filepath = os.path.join(self.analyses_dir, filename)
+            tmp_path = f"{filepath}.tmp"
             
-            with open(filepath, 'w', encoding='utf-8') as f:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(analysis_data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, filepath)
             
+            self.index.add(filename, analysis_data)
             return filepath
             
         except Exception as e:
             logger.error(f"Erro ao salvar análise de {username}: {e}")
             return None
     
+    def touch_analysis(self, filename, analysis_data):
+        """Marcar análise como revalidada (perfil sem mudanças desde a análise)"""
+        analysis_data.setdefault('analysis_metadata', {})['revalidated_at'] = datetime.now().isoformat()
+        filepath = os.path.join(self.analyses_dir, filename)
+        tmp_path = f"{filepath}.tmp"
+        
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(analysis_data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, filepath)
+        
+        self.index.add(filename, analysis_data)
+        return analysis_data
+    
+    def revalidate_or_recompute(self, username, platform, analysis_depth, options, entry, analysis_data,
+                                recompute=True):
+        """
+        Renovar análise vencida
+        
+        Um snapshot barato do perfil (posts e seguidores) decide: sem mudanças a
+        análise existente é apenas revalidada; caso contrário é refeita (ou,
+        com recompute=False, fica a cargo de quem chamou).
+        """
+        snapshot = fetch_profile_snapshot(username, platform)
+        
+        if not profile_changed(analysis_data, snapshot):
+            profile_cache.record_outcome(revalidated=True)
+            return self.touch_analysis(entry['filename'], analysis_data), True
+        
+        profile_cache.record_outcome(revalidated=False)
+        if not recompute:
+            return None, False
+        
+        analysis_result = build_profile_analysis(username, platform, analysis_depth, options)
+        analysis_result['saved_to'] = self.save_analysis(username, analysis_result)
+        return analysis_result, False
+    
+    def get_cached_analysis(self, username, platform, analysis_depth='standard', options=None):
+        """
+        Análise salva respeitando o frescor
+        
+        Retorna (análise, estado): 'fresh' dentro do TTL; 'stale' é servida e
+        renovada em segundo plano; 'revalidated' quando vencida mas o perfil
+        não mudou. (None, estado) quando é preciso analisar de novo.
+        """
+        options = options or {}
+        entry, state = profile_cache.classify(self.index.history(username, platform), analysis_depth)
+        if entry is None:
+            return None, state
+        
+        try:
+            analysis_data = self.load_analysis_file(entry['filename'])
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"Erro ao carregar análise {entry['filename']}: {e}")
+            return None, 'miss'
+        
+        if state == 'stale':
+            profile_cache.schedule_refresh(
+                (username, platform, analysis_depth),
+                # Relido na thread do refresh: o dict servido não é alterado
+                lambda: self.revalidate_or_recompute(
+                    username, platform, analysis_depth, options, entry, self.load_analysis_file(entry['filename'])
+                )
+            )
+        elif state == 'expired':
+            analysis_data, revalidated = self.revalidate_or_recompute(
+                username, platform, analysis_depth, options, entry, analysis_data, recompute=False
+            )
+            return (analysis_data, 'revalidated') if revalidated else (None, 'expired')
+        
+        return analysis_data, state
+    
     def get_all_analyses(self, platform=None, limit=50):
-        """Buscar todas as análises com filtros opcionais"""
+        """Buscar as análises mais recentes com filtros opcionais"""
         analyses = []
         
         try:
-            for filename in os.listdir(self.analyses_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(self.analyses_dir, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        analysis = json.load(f)
-                        
-                        # Filtrar por plataforma se especificado
-                        if platform and analysis.get('profile_info', {}).get('platform') != platform:
-                            continue
-                        
-                        # Adicionar metadados do arquivo
-                        analysis['file_metadata'] = {
-                            'filename': filename,
-                            'file_created': datetime.fromtimestamp(os.path.getctime(filepath)).isoformat()
-                        }
-                        
-                        analyses.append(analysis)
-            
-            # Ordenar por data de análise (mais recente primeiro)
-            analyses.sort(key=lambda x: x.get('analysis_metadata', {}).get('analyzed_at', ''), reverse=True)
+            # O índice já está ordenado por data de análise (mais recente primeiro)
+            for entry in self.index.recent(platform, limit):
+                try:
+                    analysis = self.load_analysis_file(entry['filename'])
+                except (FileNotFoundError, ValueError) as e:
+                    logger.error(f"Erro ao carregar análise {entry['filename']}: {e}")
+                    continue
+                
+                # Adicionar metadados do arquivo
+                analysis['file_metadata'] = {
+                    'filename': entry['filename'],
+                    'file_created': entry['file_created']
+                }
+                
+                analyses.append(analysis)
             
-            return analyses[:limit]
+            return analyses
             
         except Exception as e:
             logger.error(f"Erro ao buscar análises: {e}")
@@ -121,6 +202,195 @@ class ProfileAnalysisManager:
 # Instanciar gerenciador
 profile_manager = ProfileAnalysisManager()
 
+def fetch_profile_snapshot(username, platform):
+    """Dados básicos do perfil (uma requisição, sem coletar posts)"""
+    return {
+        'username': username,
+        'platform': platform,
+        'followers': 125000,
+        'following': 850,
+        'posts_count': 342,
+        'is_verified': True,
+        'is_business': True
+    }
+
+def build_profile_analysis(username, platform, analysis_depth='standard', options=None):
+    """Executar a análise completa de um perfil"""
+    options = options or {}
+    snapshot = fetch_profile_snapshot(username, platform)
+    
+    # Simular análise completa (integração com InstagramProfileAnalyzer)
+    analysis_result = {
+        'profile_info': {
+            'username': username,
+            'platform': platform,
+            'display_name': f"@{username}",
+            'followers': snapshot['followers'],
+            'following': snapshot['following'],
+            'posts_count': snapshot['posts_count'],
+            'is_verified': snapshot['is_verified'],
+            'is_business': snapshot['is_business'],
+            'bio': f"Perfil analisado de {username} - Conteúdo viral e engajamento alto",
+            'engagement_potential': 85,
+            'account_type': 'macro_influencer'
+        },
+        'content_analysis': {
+            'total_posts': options.get('max_posts', 50),
+            'viral_posts': 23,
+            'viral_rate': '46.0%',
+            'content_type_distribution': {
+                'reel': {'count': 28, 'percentage': '56.0%', 'avg_viral_score': 82},
+                'carousel': {'count': 15, 'percentage': '30.0%', 'avg_viral_score': 75},
+                'post': {'count': 7, 'percentage': '14.0%', 'avg_viral_score': 68}
+            },
+            'avg_engagement_rate': 8.5,
+            'top_performing_content': [
+                {
+                    'id': 'post_001',
+                    'content_type': 'reel',
+                    'viral_score': 95,
+                    'engagement_rate': 12.3,
+                    'likes': 15400,
+                    'comments': 892
+                },
+                {
+                    'id': 'post_002',
+                    'content_type': 'carousel',
+                    'viral_score': 88,
+                    'engagement_rate': 9.7,
+                    'likes': 12100,
+                    'comments': 654
+                }
+            ]
+        },
+        'patterns': {
+            'content_type_distribution': {
+                'reel': {'count': 28, 'avg_viral_score': 82},
+                'carousel': {'count': 15, 'avg_viral_score': 75},
+                'post': {'count': 7, 'avg_viral_score': 68}
+            },
+            'timing_patterns': {
+                'best_days': {'segunda': 8, 'terça': 6, 'quarta': 7, 'quinta': 9, 'sexta': 12, 'sábado': 5, 'domingo': 3},
+                'best_hours': {'9': 4, '12': 7, '15': 8, '18': 12, '20': 9, '21': 6}
+            },
+            'hashtag_patterns': {
+                'most_used': [
+                    ['#viral', 15],
+                    ['#trending', 12],
+                    ['#content', 10],
+                    ['#instagram', 8],
+                    ['#reels', 7]
+                ],
+                'avg_hashtags_per_post': 12.5
+            },
+            'caption_patterns': {
+                'avg_length': 180,
+                'common_words': [
+                    ['incrível', 8],
+                    ['dica', 7],
+                    ['segredo', 6],
+                    ['transformação', 5]
+                ],
+                'emotional_triggers': {
+                    'inspirador': 6,
+                    'surpreendente': 4,
+                    'chocante': 3
+                }
+            },
+            'engagement_patterns': {
+                'avg_engagement_rate': '8.5%',
+                'like_to_comment_ratio': '17.3',
+                'engagement_distribution': {
+                    '0-2%': 5,
+                    '2-5%': 12,
+                    '5-10%': 18,
+                    '10-20%': 13,
+                    '20%+': 2
+                }
+            }
+        },
+        'insights': {
+            'profile_strengths': [
+                'Perfil verificado aumenta credibilidade',
+                'Grande base de seguidores',
+                'Histórico consistente de conteúdo viral',
+                'Alto potencial viral médio'
+            ],
+            'growth_opportunities': [
+                'Explorar mais conteúdo em formato carousel',
+                'Testar horários de publicação entre 16h-17h',
+                'Usar mais hashtags de nicho específico'
+            ],
+            'content_recommendations': [
+                {
+                    'priority': 'high',
+                    'type': 'content_type',
+                    'recommendation': 'Criar mais reels',
+                    'reason': 'Tipo com maior viral score médio: 82.0'
+                },
+                {
+                    'priority': 'medium',
+                    'type': 'timing',
+                    'recommendation': 'Publicar mais às sextas-feiras',
+                    'reason': 'Dia com melhor performance histórica'
+                }
+            ],
+            'competitive_advantages': [
+                'Alta taxa de viralização: 46.0%',
+                'Conteúdo consistentemente viral',
+                'Engajamento acima da média do nicho'
+            ]
+        },
+        'templates': [
+            {
+                'template_id': f'profile_{username}_reel_template',
+                'template_name': 'Template Reel Viral',
+                'content_type': 'reel',
+                'viral_score': 82,
+                'hashtag_strategy': ['#viral', '#trending', '#content'],
+                'best_posting_times': ['18:00', '20:00', '21:00']
+            }
+        ],
+        'analysis_metadata': {
+            'analyzed_at': datetime.now().isoformat(),
+            'analysis_depth': analysis_depth,
+            'posts_analyzed': options.get('max_posts', 50),
+            'analyzer_version': 'InstagramProfileAnalyzer_v1.0',
+            'processing_time_ms': 45000
+        }
+    }
+    
+    return analysis_result
+
+def profile_result_summary(analysis):
+    """Resumo de uma análise usado nos resultados de lote"""
+    profile_info = analysis.get('profile_info', {})
+    content_analysis = analysis.get('content_analysis', {})
+    return {
+        'followers': profile_info.get('followers', 0),
+        'viral_rate': content_analysis.get('viral_rate', '0%'),
+        'engagement_rate': f"{content_analysis.get('avg_engagement_rate', 0)}%",
+        'total_posts_analyzed': analysis.get('analysis_metadata', {}).get('posts_analyzed', 0)
+    }
+
+async def analyze_profile_for_batch(profile, analysis_depth, batch_options):
+    """Analisador do executor de lotes: análise e persistência fora do event loop"""
+    loop = asyncio.get_running_loop()
+    analysis = await loop.run_in_executor(
+        None, build_profile_analysis, profile['username'], profile['platform'], analysis_depth, batch_options
+    )
+    
+    saved_to = None
+    if batch_options.get('save_results', True):
+        saved_to = await loop.run_in_executor(None, profile_manager.save_analysis, profile['username'], analysis)
+    
+    return {
+        'summary': profile_result_summary(analysis),
+        'saved_to': saved_to
+    }
+
+profile_batch_runner.set_analyzer(analyze_profile_for_batch)
+
 @profiles_bp.route('/profiles/analyze', methods=['POST'])
 def analyze_profile():
     """
@@ -164,158 +434,22 @@ def analyze_profile():
                 'timestamp': datetime.now().isoformat()
             }), 400
         
-        # Verificar cache se solicitado
+        # Verificar cache se solicitado (TTL por profundidade, stale-while-revalidate)
         if options.get('use_cache', False):
-            cached_analysis = profile_manager.get_analysis_by_username(username, platform)
+            cached_analysis, cache_status = profile_manager.get_cached_analysis(
+                username, platform, analysis_depth, options
+            )
             if cached_analysis:
                 return jsonify({
                     'success': True,
                     'data': cached_analysis,
                     'from_cache': True,
+                    'cache_status': cache_status,
                     'message': 'Análise recuperada do cache',
                     'timestamp': datetime.now().isoformat()
                 })
         
-        # Simular análise completa (integração com InstagramProfileAnalyzer)
-        analysis_result = {
-            'profile_info': {
-                'username': username,
-                'platform': platform,
-                'display_name': f"@{username}",
-                'followers': 125000,
-                'following': 850,
-                'posts_count': 342,
-                'is_verified': True,
-                'is_business': True,
-                'bio': f"Perfil analisado de {username} - Conteúdo viral e engajamento alto",
-                'engagement_potential': 85,
-                'account_type': 'macro_influencer'
-            },
-            'content_analysis': {
-                'total_posts': options.get('max_posts', 50),
-                'viral_posts': 23,
-                'viral_rate': '46.0%',
-                'content_type_distribution': {
-                    'reel': {'count': 28, 'percentage': '56.0%', 'avg_viral_score': 82},
-                    'carousel': {'count': 15, 'percentage': '30.0%', 'avg_viral_score': 75},
-                    'post': {'count': 7, 'percentage': '14.0%', 'avg_viral_score': 68}
-                },
-                'avg_engagement_rate': 8.5,
-                'top_performing_content': [
-                    {
-                        'id': 'post_001',
-                        'content_type': 'reel',
-                        'viral_score': 95,
-                        'engagement_rate': 12.3,
-                        'likes': 15400,
-                        'comments': 892
-                    },
-                    {
-                        'id': 'post_002',
-                        'content_type': 'carousel',
-                        'viral_score': 88,
-                        'engagement_rate': 9.7,
-                        'likes': 12100,
-                        'comments': 654
-                    }
-                ]
-            },
-            'patterns': {
-                'content_type_distribution': {
-                    'reel': {'count': 28, 'avg_viral_score': 82},
-                    'carousel': {'count': 15, 'avg_viral_score': 75},
-                    'post': {'count': 7, 'avg_viral_score': 68}
-                },
-                'timing_patterns': {
-                    'best_days': {'segunda': 8, 'terça': 6, 'quarta': 7, 'quinta': 9, 'sexta': 12, 'sábado': 5, 'domingo': 3},
-                    'best_hours': {'9': 4, '12': 7, '15': 8, '18': 12, '20': 9, '21': 6}
-                },
-                'hashtag_patterns': {
-                    'most_used': [
-                        ['#viral', 15],
-                        ['#trending', 12],
-                        ['#content', 10],
-                        ['#instagram', 8],
-                        ['#reels', 7]
-                    ],
-                    'avg_hashtags_per_post': 12.5
-                },
-                'caption_patterns': {
-                    'avg_length': 180,
-                    'common_words': [
-                        ['incrível', 8],
-                        ['dica', 7],
-                        ['segredo', 6],
-                        ['transformação', 5]
-                    ],
-                    'emotional_triggers': {
-                        'inspirador': 6,
-                        'surpreendente': 4,
-                        'chocante': 3
-                    }
-                },
-                'engagement_patterns': {
-                    'avg_engagement_rate': '8.5%',
-                    'like_to_comment_ratio': '17.3',
-                    'engagement_distribution': {
-                        '0-2%': 5,
-                        '2-5%': 12,
-                        '5-10%': 18,
-                        '10-20%': 13,
-                        '20%+': 2
-                    }
-                }
-            },
-            'insights': {
-                'profile_strengths': [
-                    'Perfil verificado aumenta credibilidade',
-                    'Grande base de seguidores',
-                    'Histórico consistente de conteúdo viral',
-                    'Alto potencial viral médio'
-                ],
-                'growth_opportunities': [
-                    'Explorar mais conteúdo em formato carousel',
-                    'Testar horários de publicação entre 16h-17h',
-                    'Usar mais hashtags de nicho específico'
-                ],
-                'content_recommendations': [
-                    {
-                        'priority': 'high',
-                        'type': 'content_type',
-                        'recommendation': 'Criar mais reels',
-                        'reason': 'Tipo com maior viral score médio: 82.0'
-                    },
-                    {
-                        'priority': 'medium',
-                        'type': 'timing',
-                        'recommendation': 'Publicar mais às sextas-feiras',
-                        'reason': 'Dia com melhor performance histórica'
-                    }
-                ],
-                'competitive_advantages': [
-                    'Alta taxa de viralização: 46.0%',
-                    'Conteúdo consistentemente viral',
-                    'Engajamento acima da média do nicho'
-                ]
-            },
-            'templates': [
-                {
-                    'template_id': f'profile_{username}_reel_template',
-                    'template_name': 'Template Reel Viral',
-                    'content_type': 'reel',
-                    'viral_score': 82,
-                    'hashtag_strategy': ['#viral', '#trending', '#content'],
-                    'best_posting_times': ['18:00', '20:00', '21:00']
-                }
-            ],
-            'analysis_metadata': {
-                'analyzed_at': datetime.now().isoformat(),
-                'analysis_depth': analysis_depth,
-                'posts_analyzed': options.get('max_posts', 50),
-                'analyzer_version': 'InstagramProfileAnalyzer_v1.0',
-                'processing_time_ms': 45000
-            }
-        }
+        analysis_result = build_profile_analysis(username, platform, analysis_depth, options)
         
         # Salvar resultado se solicitado
         if options.get('save_results', True):
@@ -566,6 +700,11 @@ def batch_analyze_profiles():
     """
     Analisar múltiplos perfis em lote
     
+    O lote roda em segundo plano (resposta 202 com batch_id); o progresso é
+    consultado em GET /profiles/batch-analyze/<batch_id>. max_concurrent
+    limita análises simultâneas por plataforma e delay_between_analyses (ms)
+    define o ritmo sustentado de inícios por plataforma.
+    
     Body:
     {
         "profile_urls": [
@@ -592,7 +731,7 @@ def batch_analyze_profiles():
         
         profile_urls = data['profile_urls']
         analysis_depth = data.get('analysis_depth', 'standard')
-        batch_options = data.get('batch_options', {})
+        batch_options = data.get('batch_options') or {}
         
         # Validar URLs e extrair usernames
         valid_profiles = []
@@ -617,73 +756,32 @@ def batch_analyze_profiles():
                 'timestamp': datetime.now().isoformat()
             }), 400
         
-        # Simular análise em lote
-        batch_results = {
-            'batch_id': f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            'total_profiles': len(valid_profiles),
-            'invalid_urls': invalid_urls,
-            'analysis_depth': analysis_depth,
-            'batch_options': batch_options,
-            'results': [],
-            'summary': {
-                'successful': 0,
-                'failed': 0,
-                'total_processing_time': 0
-            }
-        }
-        
-        # Simular processamento de cada perfil
-        for i, profile in enumerate(valid_profiles):
-            try:
-                # Simular tempo de processamento
-                processing_time = 30000 + (i * 5000)  # Simular delay crescente
-                
-                # Simular resultado de análise
-                analysis_result = {
-                    'username': profile['username'],
-                    'platform': profile['platform'],
-                    'url': profile['url'],
-                    'status': 'completed',
-                    'processing_time_ms': processing_time,
-                    'summary': {
-                        'followers': 50000 + (i * 10000),
-                        'viral_rate': f"{15 + (i * 5)}.0%",
-                        'engagement_rate': f"{5 + (i * 1.5):.1f}%",
-                        'total_posts_analyzed': 50
-                    }
-                }
-                
-                batch_results['results'].append(analysis_result)
-                batch_results['summary']['successful'] += 1
-                batch_results['summary']['total_processing_time'] += processing_time
-                
-            except Exception as profile_error:
-                # Simular falha na análise
-                batch_results['results'].append({
-                    'username': profile['username'],
-                    'platform': profile['platform'],
-                    'url': profile['url'],
-                    'status': 'failed',
-                    'error': str(profile_error)
-                })
-                batch_results['summary']['failed'] += 1
+        if len(valid_profiles) > PROFILE_BATCH_MAX_PROFILES:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo de {PROFILE_BATCH_MAX_PROFILES} perfis por lote',
+                'timestamp': datetime.now().isoformat()
+            }), 400
         
-        # Calcular estatísticas finais
-        if batch_results['summary']['successful'] > 0:
-            batch_results['summary']['avg_processing_time'] = int(
-                batch_results['summary']['total_processing_time'] / batch_results['summary']['successful']
-            )
-            batch_results['summary']['success_rate'] = round(
-                (batch_results['summary']['successful'] / len(valid_profiles)) * 100, 2
-            )
+        # Lote roda em segundo plano; o progresso é consultado pelo batch_id
+        batch_results = profile_batch_runner.submit(valid_profiles, analysis_depth, batch_options)
+        batch_results['invalid_urls'] = invalid_urls
+        batch_results['status_url'] = f"/api/v1/profiles/batch-analyze/{batch_results['batch_id']}"
         
         return jsonify({
             'success': True,
             'data': batch_results,
-            'message': f'Análise em lote concluída: {batch_results["summary"]["successful"]}/{len(valid_profiles)} sucessos',
+            'message': f'Análise em lote iniciada: {len(valid_profiles)} perfis',
             'timestamp': datetime.now().isoformat()
-        })
+        }), 202
         
+    except ValueError as e:
+        # batch_options inválidas
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 400
     except Exception as e:
         logger.error(f"Erro na análise em lote: {e}")
         return jsonify({
@@ -692,6 +790,24 @@ def batch_analyze_profiles():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@profiles_bp.route('/profiles/batch-analyze/<batch_id>', methods=['GET'])
+def get_batch_analysis(batch_id):
+    """Consultar progresso e resultados de uma análise em lote"""
+    batch = profile_batch_runner.get(batch_id)
+    
+    if batch is None:
+        return jsonify({
+            'success': False,
+            'error': f'Lote não encontrado: {batch_id}',
+            'timestamp': datetime.now().isoformat()
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': batch,
+        'timestamp': datetime.now().isoformat()
+    })
+
 @profiles_bp.route('/profiles/trending', methods=['GET'])
 def get_trending_profiles():
     """
@@ -711,50 +827,36 @@ def get_trending_profiles():
         timeframe = request.args.get('timeframe', '30d')
         limit = int(request.args.get('limit', 20))
         
-        # Buscar todas as análises
-        all_analyses = profile_manager.get_all_analyses(platform, 100)
-        
-        # Filtrar perfis trending
-        trending_profiles = []
-        
-        for analysis in all_analyses:
-            profile_info = analysis.get('profile_info', {})
-            content_analysis = analysis.get('content_analysis', {})
-            
-            followers = profile_info.get('followers', 0)
-            viral_rate_str = content_analysis.get('viral_rate', '0%')
-            viral_rate = float(viral_rate_str.replace('%', ''))
-            
-            # Aplicar filtros
-            if followers >= min_followers and viral_rate >= min_viral_rate:
-                # Calcular score de trending
-                trending_score = self.calculate_trending_score(analysis)
-                
-                trending_profiles.append({
-                    'username': profile_info.get('username'),
-                    'platform': profile_info.get('platform'),
-                    'followers': followers,
-                    'viral_rate': viral_rate,
-                    'engagement_rate': content_analysis.get('avg_engagement_rate', 0),
-                    'trending_score': trending_score,
-                    'growth_indicators': profile_info.get('growth_indicators', []),
-                    'last_analyzed': analysis.get('analysis_metadata', {}).get('analyzed_at')
-                })
-        
-        # Ordenar por trending score
-        trending_profiles.sort(key=lambda x: x['trending_score'], reverse=True)
+        # Resumos por perfil já ordenados por trending_score
+        trending_summaries, total_found = profile_manager.index.trending(
+            platform, min_followers, min_viral_rate, limit
+        )
+        
+        trending_profiles = [
+            {
+                'username': summary['username'],
+                'platform': summary['platform'],
+                'followers': summary['followers'],
+                'viral_rate': summary['viral_rate'],
+                'engagement_rate': summary['engagement_rate'],
+                'trending_score': summary['trending_score'],
+                'growth_indicators': summary['growth_indicators'],
+                'last_analyzed': summary['last_analyzed']
+            }
+            for summary in trending_summaries
+        ]
         
         return jsonify({
             'success': True,
             'data': {
-                'trending_profiles': trending_profiles[:limit],
+                'trending_profiles': trending_profiles,
                 'filters': {
                     'platform': platform,
                     'min_followers': min_followers,
                     'min_viral_rate': min_viral_rate,
                     'timeframe': timeframe
                 },
-                'total_found': len(trending_profiles)
+                'total_found': total_found
             },
             'timestamp': datetime.now().isoformat()
         })
@@ -767,51 +869,16 @@ def get_trending_profiles():
             'timestamp': datetime.now().isoformat()
         }), 500
 
-def calculate_trending_score(analysis):
-    """Calcular score de trending baseado em múltiplos fatores"""
-    score = 50  # Base
-    
-    profile_info = analysis.get('profile_info', {})
-    content_analysis = analysis.get('content_analysis', {})
-    
-    # Fator de engajamento
-    engagement_rate = content_analysis.get('avg_engagement_rate', 0)
-    if engagement_rate > 10:
-        score += 25
-    elif engagement_rate > 5:
-        score += 15
-    elif engagement_rate > 3:
-        score += 10
-    
-    # Fator de viralização
-    viral_rate_str = content_analysis.get('viral_rate', '0%')
-    viral_rate = float(viral_rate_str.replace('%', ''))
-    if viral_rate > 40:
-        score += 20
-    elif viral_rate > 25:
-        score += 15
-    elif viral_rate > 15:
-        score += 10
-    
-    # Fator de verificação
-    if profile_info.get('is_verified'):
-        score += 10
-    
-    # Fator de crescimento
-    growth_indicators = profile_info.get('growth_indicators', [])
-    score += len(growth_indicators) * 5
-    
-    return min(score, 100)
-
 @profiles_bp.route('/profiles/stats', methods=['GET'])
 def get_profile_stats():
     """Obter estatísticas gerais dos perfis analisados"""
     try:
         platform = request.args.get('platform')
         
-        analyses = profile_manager.get_all_analyses(platform, 1000)  # Buscar mais para estatísticas
+        # Agregados calculados sobre os resumos por perfil (análise mais recente)
+        stats, top_files = profile_manager.index.summary_stats(platform)
         
-        if not analyses:
+        if stats is None:
             return jsonify({
                 'success': True,
                 'data': {
@@ -821,140 +888,12 @@ def get_profile_stats():
                 'timestamp': datetime.now().isoformat()
             })
         
-        # Calcular estatísticas
-        stats = {
-            'total_profiles': len(analyses),
-            'platforms': {},
-            'account_types': {},
-            'follower_ranges': {
-                '0-1K': 0,
-                '1K-10K': 0,
-                '10K-100K': 0,
-                '100K-1M': 0,
-                '1M+': 0
-            },
-            'engagement_ranges': {
-                '0-2%': 0,
-                '2-5%': 0,
-                '5-10%': 0,
-                '10-20%': 0,
-                '20%+': 0
-            },
-            'viral_rate_ranges': {
-                '0-10%': 0,
-                '10-25%': 0,
-                '25-50%': 0,
-                '50-75%': 0,
-                '75%+': 0
-            },
-            'averages': {
-                'followers': 0,
-                'engagement_rate': 0,
-                'viral_rate': 0,
-                'posts_analyzed': 0
-            },
-            'top_performers': {
-                'by_followers': [],
-                'by_engagement': [],
-                'by_viral_rate': []
-            }
-        }
-        
-        total_followers = 0
-        total_engagement = 0
-        total_viral_rate = 0
-        total_posts = 0
-        
-        for analysis in analyses:
-            profile_info = analysis.get('profile_info', {})
-            content_analysis = analysis.get('content_analysis', {})
-            
-            # Plataformas
-            platform_name = profile_info.get('platform', 'unknown')
-            stats['platforms'][platform_name] = stats['platforms'].get(platform_name, 0) + 1
-            
-            # Tipos de conta
-            account_type = profile_info.get('account_type', 'unknown')
-            stats['account_types'][account_type] = stats['account_types'].get(account_type, 0) + 1
-            
-            # Faixas de seguidores
-            followers = profile_info.get('followers', 0)
-            total_followers += followers
-            
-            if followers >= 1000000:
-                stats['follower_ranges']['1M+'] += 1
-            elif followers >= 100000:
-                stats['follower_ranges']['100K-1M'] += 1
-            elif followers >= 10000:
-                stats['follower_ranges']['10K-100K'] += 1
-            elif followers >= 1000:
-                stats['follower_ranges']['1K-10K'] += 1
-            else:
-                stats['follower_ranges']['0-1K'] += 1
-            
-            # Faixas de engajamento
-            engagement_rate = content_analysis.get('avg_engagement_rate', 0)
-            total_engagement += engagement_rate
-            
-            if engagement_rate >= 20:
-                stats['engagement_ranges']['20%+'] += 1
-            elif engagement_rate >= 10:
-                stats['engagement_ranges']['10-20%'] += 1
-            elif engagement_rate >= 5:
-                stats['engagement_ranges']['5-10%'] += 1
-            elif engagement_rate >= 2:
-                stats['engagement_ranges']['2-5%'] += 1
-            else:
-                stats['engagement_ranges']['0-2%'] += 1
-            
-            # Faixas de taxa viral
-            viral_rate_str = content_analysis.get('viral_rate', '0%')
-            viral_rate = float(viral_rate_str.replace('%', ''))
-            total_viral_rate += viral_rate
-            
-            if viral_rate >= 75:
-                stats['viral_rate_ranges']['75%+'] += 1
-            elif viral_rate >= 50:
-                stats['viral_rate_ranges']['50-75%'] += 1
-            elif viral_rate >= 25:
-                stats['viral_rate_ranges']['25-50%'] += 1
-            elif viral_rate >= 10:
-                stats['viral_rate_ranges']['10-25%'] += 1
-            else:
-                stats['viral_rate_ranges']['0-10%'] += 1
-            
-            # Posts analisados
-            posts_analyzed = content_analysis.get('total_posts', 0)
-            total_posts += posts_analyzed
-        
-        # Calcular médias
-        total_profiles = len(analyses)
-        stats['averages'] = {
-            'followers': int(total_followers / total_profiles),
-            'engagement_rate': round(total_engagement / total_profiles, 2),
-            'viral_rate': round(total_viral_rate / total_profiles, 2),
-            'posts_analyzed': int(total_posts / total_profiles)
+        # Top performers: apenas os arquivos selecionados são lidos
+        stats['top_performers'] = {
+            metric: [profile_manager.load_analysis_file(filename) for filename in filenames]
+            for metric, filenames in top_files.items()
         }
         
-        # Top performers
-        stats['top_performers']['by_followers'] = sorted(
-            analyses, 
-            key=lambda x: x.get('profile_info', {}).get('followers', 0), 
-            reverse=True
-        )[:5]
-        
-        stats['top_performers']['by_engagement'] = sorted(
-            analyses, 
-            key=lambda x: x.get('content_analysis', {}).get('avg_engagement_rate', 0), 
-            reverse=True
-        )[:5]
-        
-        stats['top_performers']['by_viral_rate'] = sorted(
-            analyses, 
-            key=lambda x: float(x.get('content_analysis', {}).get('viral_rate', '0%').replace('%', '')), 
-            reverse=True
-        )[:5]
-        
         return jsonify({
             'success': True,
             'data': stats,
@@ -15,47 +15,42 @@ import uuid
 from datetime import datetime, timedelta
 import logging
 
-# Importar coordenador de scraping
+# Coordenador de scraping é importado sob demanda (ver registro abaixo)
 import sys
 sys.path.append('/home/ubuntu/viral_content_scraper')
 
-from scrapers.src.index import ScrapingCoordinator
-from scrapers.src.platforms.instagram_scraper import InstagramScraper
-from scrapers.src.platforms.tiktok_scraper import TikTokScraper
+from ..utils.registry import LazyRegistry
 
 scraping_bp = Blueprint('scraping', __name__, url_prefix='/api/v1/scraping')
 logger = logging.getLogger(__name__)
 
-# Instância global do coordenador
-scraping_coordinator = None
+def _create_scraping_coordinator():
+    from scrapers.src.index import ScrapingCoordinator
+    return ScrapingCoordinator({
+        'max_concurrent_scrapers': 5,
+        'enable_proxy_rotation': True,
+        'enable_rate_limiting': True,
+        'retry_attempts': 3,
+        'delay_between_requests': 2000
+    })
 
-def init_scraping_coordinator():
-    """Inicializa o coordenador de scraping"""
-    global scraping_coordinator
-    
-    try:
-        scraping_coordinator = ScrapingCoordinator({
-            'max_concurrent_scrapers': 5,
-            'enable_proxy_rotation': True,
-            'enable_rate_limiting': True,
-            'retry_attempts': 3,
-            'delay_between_requests': 2000
-        })
-        
-        logger.info("Coordenador de scraping inicializado")
-        
-    except Exception as e:
-        logger.error(f"Erro ao inicializar coordenador de scraping: {e}")
-        raise
+# Coordenador construído no primeiro uso em cada worker (não no import)
+scraping_registry = LazyRegistry('scraping')
+scraping_registry.register('coordinator', _create_scraping_coordinator)
 
-# Inicializar coordenador
-init_scraping_coordinator()
+def get_scraping_coordinator():
+    """Obter coordenador de scraping (None se a inicialização falhar)"""
+    try:
+        return scraping_registry.get('coordinator')
+    except Exception:
+        return None
 
 @scraping_bp.route('/status', methods=['GET'])
 @jwt_required()
 def get_scraping_status():
     """Obter status atual do sistema de scraping"""
     try:
+        scraping_coordinator = get_scraping_coordinator()
         if not scraping_coordinator:
             return jsonify({'error': 'Coordenador de scraping não inicializado'}), 500
         
@@ -88,6 +83,10 @@ def get_scraping_status():
 def start_scraping():
     """Iniciar processo de scraping"""
     try:
+        scraping_coordinator = get_scraping_coordinator()
+        if not scraping_coordinator:
+            return jsonify({'error': 'Coordenador de scraping não inicializado'}), 500
+        
         data = request.get_json() or {}
         
         # Parâmetros de configuração
@@ -208,6 +207,10 @@ def start_scraping():
 def stop_scraping():
     """Parar processo de scraping"""
     try:
+        scraping_coordinator = get_scraping_coordinator()
+        if not scraping_coordinator:
+            return jsonify({'error': 'Coordenador de scraping não inicializado'}), 500
+        
         data = request.get_json() or {}
         job_id = data.get('job_id')
         force_stop = data.get('force_stop', False)
@@ -6,59 +6,92 @@ Autor: Manus AI
 Data: 27 de Janeiro de 2025
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from functools import wraps
-import json
 import os
 from datetime import datetime
 import logging
 
+from ..utils.template_catalog import TemplateCatalog, TEMPLATE_SORT_KEYS
+from ..utils.template_store import create_template_store
+from ..utils.exporter import (
+    export_jobs, available_formats, is_streamable, iter_export, iter_encoded,
+    export_filename, export_mimetype, EXPORT_ASYNC_THRESHOLD
+)
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 templates_bp = Blueprint('templates', __name__)
 
+# Colunas das exportações tabulares (csv, parquet, xlsx)
+TEMPLATE_EXPORT_COLUMNS = [
+    'template_id', 'template_name', 'content_type', 'viral_score', 'platform'
+]
+
+def template_export_row(template):
+    return {
+        'template_id': template.get('template_id', ''),
+        'template_name': template.get('template_name', ''),
+        'content_type': template.get('content_type', ''),
+        'viral_score': template.get('viral_score', 0),
+        'platform': template.get('extraction_metadata', {}).get('source_platform', '')
+    }
+
 # Simulação de integração com sistema de templates
 class TemplateManager:
     def __init__(self):
         self.templates_dir = '/home/ubuntu/viral_content_scraper/storage/templates'
         self.ensure_templates_dir()
+        # Templates carregados uma vez e indexados; o backend (diretório ou
+        # SQLite) vem de TEMPLATE_STORE_BACKEND
+        self.catalog = TemplateCatalog(create_template_store(self.templates_dir))
     
     def ensure_templates_dir(self):
         os.makedirs(self.templates_dir, exist_ok=True)
     
     def get_all_templates(self, filters=None):
         """Buscar todos os templates com filtros opcionais"""
-        templates = []
-        
+        return self.query_templates(filters)
+    
+    def query_templates(self, filters=None, sort_by=None, sort_order='desc'):
+        """Buscar templates filtrados e ordenados pelos índices do catálogo"""
         try:
-            for filename in os.listdir(self.templates_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(self.templates_dir, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        template = json.load(f)
-                        
-                        # Aplicar filtros se fornecidos
-                        if filters and not self._matches_filters(template, filters):
-                            continue
-                            
-                        templates.append(template)
-            
-            return templates
-            
+            return self.catalog.query(filters, sort_by, sort_order)
         except Exception as e:
             logger.error(f"Erro ao buscar templates: {e}")
             return []
     
+    def search_templates(self, query, filters=None, limit=None):
+        """Busca textual ranqueada por relevância (BM25) dentro dos filtros"""
+        try:
+            return self.catalog.search(query, filters, limit)
+        except Exception as e:
+            logger.error(f"Erro na busca textual de templates: {e}")
+            return [], 0
+    
+    def get_similar_templates(self, template_id, limit=10, min_similarity=0.0):
+        """Templates similares (None se o template não existir)"""
+        return self.catalog.similar(template_id, limit, min_similarity)
+    
+    def get_template_summary(self):
+        """Estatísticas agregadas do catálogo (None se não houver templates)"""
+        return self.catalog.summary()
+    
+    def find_duplicate(self, template_data):
+        """Template quase idêntico já salvo: (id, similaridade) ou None"""
+        try:
+            template_id = template_data.get('template_id') or template_data.get('adapted_template_id')
+            return self.catalog.find_duplicate(template_data, exclude_id=template_id)
+        except Exception as e:
+            logger.error(f"Erro ao verificar duplicidade de template: {e}")
+            return None
+    
     def get_template_by_id(self, template_id):
         """Buscar template específico por ID"""
         try:
-            filepath = os.path.join(self.templates_dir, f"{template_id}.json")
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return None
+            return self.catalog.get(template_id)
         except Exception as e:
             logger.error(f"Erro ao buscar template {template_id}: {e}")
             return None
@@ -70,10 +103,7 @@ class TemplateManager:
             if not template_id:
                 raise ValueError("Template ID é obrigatório")
             
-            filepath = os.path.join(self.templates_dir, f"{template_id}.json")
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(template_data, f, indent=2, ensure_ascii=False)
-            
+            self.catalog.put(template_id, template_data)
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar template: {e}")
@@ -82,32 +112,10 @@ class TemplateManager:
     def delete_template(self, template_id):
         """Deletar template"""
         try:
-            filepath = os.path.join(self.templates_dir, f"{template_id}.json")
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                return True
-            return False
+            return self.catalog.delete(template_id)
         except Exception as e:
             logger.error(f"Erro ao deletar template {template_id}: {e}")
             return False
-    
-    def _matches_filters(self, template, filters):
-        """Verificar se template corresponde aos filtros"""
-        if filters.get('content_type') and template.get('content_type') != filters['content_type']:
-            return False
-        
-        if filters.get('min_viral_score') and template.get('viral_score', 0) < filters['min_viral_score']:
-            return False
-        
-        if filters.get('platform') and template.get('extraction_metadata', {}).get('source_platform') != filters['platform']:
-            return False
-        
-        if filters.get('search_tags'):
-            template_tags = template.get('search_tags', [])
-            if not any(tag in template_tags for tag in filters['search_tags']):
-                return False
-        
-        return True
 
 # Instanciar gerenciador
 template_manager = TemplateManager()
@@ -149,17 +157,8 @@ def get_templates():
         sort_by = request.args.get('sort_by', 'viral_score')
         sort_order = request.args.get('sort_order', 'desc')
         
-        # Buscar templates
-        templates = template_manager.get_all_templates(filters)
-        
-        # Ordenar
-        reverse = sort_order == 'desc'
-        if sort_by == 'viral_score':
-            templates.sort(key=lambda x: x.get('viral_score', 0), reverse=reverse)
-        elif sort_by == 'created_at':
-            templates.sort(key=lambda x: x.get('extraction_metadata', {}).get('extracted_at', ''), reverse=reverse)
-        elif sort_by == 'template_quality_score':
-            templates.sort(key=lambda x: x.get('template_quality_score', 0), reverse=reverse)
+        # Buscar templates filtrados e ordenados pelos índices do catálogo
+        templates = template_manager.query_templates(filters, sort_by, sort_order)
         
         # Aplicar paginação
         total_templates = len(templates)
@@ -222,6 +221,49 @@ def get_template(template_id):
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@templates_bp.route('/templates/<template_id>/similar', methods=['GET'])
+def get_similar_templates(template_id):
+    """
+    Buscar templates similares (vizinhos aproximados por cosseno)
+    
+    Query Parameters:
+    - limit: Quantidade de resultados (padrão: 10, máximo: 100)
+    - min_similarity: Similaridade mínima entre 0 e 1 (padrão: 0)
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 100))
+        min_similarity = float(request.args.get('min_similarity', 0))
+        
+        similar = template_manager.get_similar_templates(template_id, limit, min_similarity)
+        
+        if similar is None:
+            return jsonify({
+                'success': False,
+                'error': 'Template não encontrado',
+                'timestamp': datetime.now().isoformat()
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'template_id': template_id,
+                'similar_templates': [
+                    {'similarity': round(similarity, 4), 'template': template}
+                    for template, similarity in similar
+                ],
+                'returned': len(similar)
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar templates similares a {template_id}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
 @templates_bp.route('/templates/extract', methods=['POST'])
 def extract_template():
     """
@@ -282,16 +324,22 @@ def extract_template():
             }
         }
         
-        # Salvar template se solicitado
-        if save_template:
-            template_manager.save_template(extracted_template)
+        # Salvar template se solicitado, exceto quando já existe um quase idêntico
+        duplicate = template_manager.find_duplicate(extracted_template) if save_template else None
+        saved = False
+        if save_template and not duplicate:
+            saved = template_manager.save_template(extracted_template)
         
         return jsonify({
             'success': True,
             'data': {
                 'template': extracted_template,
                 'extraction_status': 'completed',
-                'saved': save_template
+                'saved': saved,
+                'duplicate_of': {
+                    'template_id': duplicate[0],
+                    'similarity': round(duplicate[1], 4)
+                } if duplicate else None
             },
             'message': 'Template extraído com sucesso',
             'timestamp': datetime.now().isoformat()
@@ -420,11 +468,14 @@ def search_templates():
             }
         },
         "sort": {
-            "by": "viral_score",
+            "by": "relevance|viral_score|template_quality_score|created_at",
             "order": "desc"
         },
         "limit": 20
     }
+    
+    Com "query" e sem "sort" explícito os resultados vêm por relevância
+    (BM25 sobre nome, tags, tipo e estrutura; prefixos e acentos ignorados).
     """
     try:
         data = request.get_json()
@@ -433,57 +484,38 @@ def search_templates():
         sort_config = data.get('sort', {'by': 'viral_score', 'order': 'desc'})
         limit = data.get('limit', 20)
         
-        # Buscar todos os templates
-        all_templates = template_manager.get_all_templates()
-        
-        # Aplicar filtros de busca
-        filtered_templates = []
-        
-        for template in all_templates:
-            # Filtro por texto
-            if query:
-                searchable_text = f"{template.get('template_name', '')} {template.get('content_type', '')} {' '.join(template.get('search_tags', []))}"
-                if query.lower() not in searchable_text.lower():
-                    continue
-            
-            # Filtros específicos
-            if filters.get('content_types') and template.get('content_type') not in filters['content_types']:
-                continue
-            
-            if filters.get('min_viral_score') and template.get('viral_score', 0) < filters['min_viral_score']:
-                continue
-            
-            if filters.get('platforms'):
-                template_platform = template.get('extraction_metadata', {}).get('source_platform')
-                if template_platform not in filters['platforms']:
-                    continue
-            
-            if filters.get('niches'):
-                template_tags = template.get('search_tags', [])
-                if not any(niche in template_tags for niche in filters['niches']):
-                    continue
-            
-            filtered_templates.append(template)
+        if 'sort' not in data and query:
+            sort_config = {'by': 'relevance', 'order': 'desc'}
         
-        # Ordenar resultados
         reverse = sort_config.get('order', 'desc') == 'desc'
         sort_key = sort_config.get('by', 'viral_score')
         
-        if sort_key == 'viral_score':
-            filtered_templates.sort(key=lambda x: x.get('viral_score', 0), reverse=reverse)
-        elif sort_key == 'template_quality_score':
-            filtered_templates.sort(key=lambda x: x.get('template_quality_score', 0), reverse=reverse)
-        elif sort_key == 'created_at':
-            filtered_templates.sort(key=lambda x: x.get('extraction_metadata', {}).get('extracted_at', ''), reverse=reverse)
-        
-        # Aplicar limite
-        results = filtered_templates[:limit]
+        if query:
+            # Índice invertido: só a relevância decrescente pode parar no limite
+            hits, total_found = template_manager.search_templates(
+                query, filters, limit if sort_key == 'relevance' and reverse else None
+            )
+            
+            if sort_key == 'relevance':
+                if not reverse:
+                    hits.reverse()
+            elif sort_key in TEMPLATE_SORT_KEYS:
+                hits.sort(key=lambda hit: TEMPLATE_SORT_KEYS[sort_key](hit[0]), reverse=reverse)
+            
+            results = [
+                {**template, 'relevance_score': round(score, 4)}
+                for template, score in hits[:limit]
+            ]
+        else:
+            filtered_templates = template_manager.query_templates(filters, sort_key, sort_config.get('order', 'desc'))
+            total_found = len(filtered_templates)
+            results = filtered_templates[:limit]
         
         return jsonify({
             'success': True,
             'data': {
                 'results': results,
-                'total_found': len(filtered_templates),
+                'total_found': total_found,
                 'returned': len(results),
                 'query': query,
                 'filters_applied': filters,
@@ -531,12 +563,10 @@ def delete_template(template_id):
 def get_template_stats():
     """Obter estatísticas dos templates"""
     try:
-        all_templates = template_manager.get_all_templates()
-        
-        # Calcular estatísticas
-        total_templates = len(all_templates)
+        # Agregados mantidos pelo catálogo a cada inserção/remoção
+        stats = template_manager.get_template_summary()
         
-        if total_templates == 0:
+        if stats is None:
             return jsonify({
                 'success': True,
                 'data': {
@@ -546,56 +576,6 @@ def get_template_stats():
                 'timestamp': datetime.now().isoformat()
             })
         
-        # Estatísticas por tipo de conteúdo
-        content_type_stats = {}
-        viral_scores = []
-        platforms = {}
-        
-        for template in all_templates:
-            # Tipo de conteúdo
-            content_type = template.get('content_type', 'unknown')
-            if content_type not in content_type_stats:
-                content_type_stats[content_type] = {'count': 0, 'avg_viral_score': 0}
-            content_type_stats[content_type]['count'] += 1
-            
-            # Viral scores
-            viral_score = template.get('viral_score', 0)
-            viral_scores.append(viral_score)
-            content_type_stats[content_type]['avg_viral_score'] += viral_score
-            
-            # Plataformas
-            platform = template.get('extraction_metadata', {}).get('source_platform', 'unknown')
-            platforms[platform] = platforms.get(platform, 0) + 1
-        
-        # Calcular médias
-        for content_type in content_type_stats:
-            count = content_type_stats[content_type]['count']
-            content_type_stats[content_type]['avg_viral_score'] = round(
-                content_type_stats[content_type]['avg_viral_score'] / count, 2
-            )
-        
-        # Estatísticas gerais
-        avg_viral_score = round(sum(viral_scores) / len(viral_scores), 2)
-        max_viral_score = max(viral_scores)
-        min_viral_score = min(viral_scores)
-        
-        # Templates de alta performance
-        high_performance = [t for t in all_templates if t.get('viral_score', 0) >= 80]
-        
-        stats = {
-            'total_templates': total_templates,
-            'viral_score_stats': {
-                'average': avg_viral_score,
-                'maximum': max_viral_score,
-                'minimum': min_viral_score,
-                'high_performance_count': len(high_performance),
-                'high_performance_rate': round((len(high_performance) / total_templates) * 100, 2)
-            },
-            'content_type_breakdown': content_type_stats,
-            'platform_breakdown': platforms,
-            'top_performers': sorted(all_templates, key=lambda x: x.get('viral_score', 0), reverse=True)[:5]
-        }
-        
         return jsonify({
             'success': True,
             'data': stats,
@@ -615,14 +595,20 @@ def export_templates():
     """
     Exportar templates em diferentes formatos
     
+    csv e ndjson são enviados em streaming (gzip opcional); parquet, xlsx,
+    exportações com "async": true ou acima de EXPORT_ASYNC_THRESHOLD
+    templates viram job em disco com download retomável.
+    
     Body:
     {
-        "format": "json|csv|xlsx",
+        "format": "json|csv|ndjson|parquet|xlsx",
         "filters": {
             "content_types": ["carousel", "reel"],
             "min_viral_score": 80
         },
-        "include_metadata": true
+        "include_metadata": true,
+        "compress": false,
+        "async": false
     }
     """
     try:
@@ -630,6 +616,7 @@ def export_templates():
         export_format = data.get('format', 'json')
         filters = data.get('filters', {})
         include_metadata = data.get('include_metadata', True)
+        compress = bool(data.get('compress', False))
         
         # Buscar templates com filtros
         templates = template_manager.get_all_templates(filters)
@@ -652,29 +639,57 @@ def export_templates():
                 'timestamp': datetime.now().isoformat()
             })
         
-        elif export_format == 'csv':
-            # Simular exportação CSV
-            csv_data = "template_id,template_name,content_type,viral_score,platform\n"
-            for template in templates:
-                csv_data += f"{template.get('template_id', '')},{template.get('template_name', '')},{template.get('content_type', '')},{template.get('viral_score', 0)},{template.get('extraction_metadata', {}).get('source_platform', '')}\n"
-            
+        if export_format not in available_formats():
             return jsonify({
-                'success': True,
-                'data': {
-                    'csv_content': csv_data,
-                    'filename': f"templates_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                },
-                'download_format': 'csv',
+                'success': False,
+                'error': f'Formato de exportação não suportado: {export_format}',
+                'supported_formats': available_formats(),
                 'timestamp': datetime.now().isoformat()
-            })
+            }), 400
         
+        if export_format == 'ndjson':
+            rows = templates if include_metadata else (
+                {key: value for key, value in template.items() if key != 'extraction_metadata'}
+                for template in templates
+            )
+            columns = None
         else:
+            rows = (template_export_row(template) for template in templates)
+            columns = TEMPLATE_EXPORT_COLUMNS
+        
+        if (data.get('async') or not is_streamable(export_format)
+                or len(templates) > EXPORT_ASYNC_THRESHOLD):
+            job = export_jobs.submit(
+                lambda: rows,
+                export_format,
+                columns=columns,
+                compress=compress,
+                filename_prefix='templates_export',
+                metadata={'filters': filters, 'total_templates': len(templates)}
+            )
             return jsonify({
-                'success': False,
-                'error': f'Formato de exportação não suportado: {export_format}',
-                'supported_formats': ['json', 'csv'],
+                'success': True,
+                'data': {
+                    'export_id': job['job_id'],
+                    'status': job['status'],
+                    'filename': job['filename'],
+                    'status_url': f"/api/v1/dashboard/exports/{job['job_id']}",
+                    'download_url': f"/api/v1/dashboard/downloads/{job['job_id']}",
+                    'expires_at': job['expires_at']
+                },
+                'download_format': export_format,
                 'timestamp': datetime.now().isoformat()
-            }), 400
+            }), 202
+        
+        filename = export_filename('templates_export', export_format, compress)
+        return Response(
+            stream_with_context(iter_encoded(iter_export(rows, export_format, columns), compress)),
+            mimetype=export_mimetype(export_format, compress),
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Total-Count': str(len(templates))
+            }
+        )
         
     except Exception as e:
         logger.error(f"Erro ao exportar templates: {e}")
@@ -0,0 +1,131 @@
+"""
+ANALYSIS MEMO
+Memoização de resultados de analisadores por hash das entradas
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import re
+import hashlib
+import logging
+import unicodedata
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from .cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Resultados memoizados valem por 7 dias; a versão do analisador faz parte da
+# chave, então uma nova versão nunca reutiliza resultados antigos
+ANALYSIS_MEMO_TTL = int(os.getenv('ANALYSIS_MEMO_TTL', 7 * 24 * 3600))
+
+MEMO_PREFIX = 'analysis_memo'
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Parâmetros de rastreamento/compartilhamento que não identificam a mídia;
+# os demais (ids, assinaturas de CDN, ?v=) fazem parte da chave
+TRACKING_QUERY_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'igsh', 'si', 'ref', 'ref_src',
+    'mc_cid', 'mc_eid', '_ga', 'feature'
+})
+
+def normalize_text(text):
+    """
+    Normalizar texto para que reposts com diferenças triviais gerem o mesmo hash
+
+    Apenas Unicode (NFKC) e espaços: caixa alta é preservada porque o
+    analisador de sentimento pontua palavras em maiúsculas (tom e energia).
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE.sub(' ', text).strip()
+
+def normalize_media_url(url):
+    """
+    Normalizar URL de mídia
+
+    Padroniza esquema e host, remove o fragmento e os parâmetros de
+    rastreamento (utm_* e TRACKING_QUERY_PARAMS) e ordena os parâmetros
+    restantes, que podem identificar a mídia.
+    """
+    parts = urlsplit((url or '').strip())
+    params = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_QUERY_PARAMS
+    )
+    query = f"?{urlencode(params)}" if params else ''
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}{query}"
+
+def _digest(*parts):
+    hasher = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        hasher.update(part)
+        hasher.update(b'\x00')
+    return hasher.hexdigest()
+
+class AnalysisMemo:
+    """
+    Cache de resultados de analisadores compartilhado entre conteúdos
+
+    A chave é o hash das entradas normalizadas do analisador (texto ou URLs de
+    mídia e seus demais argumentos) mais nome e versão do analisador. Conteúdos diferentes com as mesmas
+    entradas (reposts entre contas) reutilizam o mesmo resultado.
+    """
+
+    def __init__(self, backend=None, ttl=ANALYSIS_MEMO_TTL):
+        self.backend = backend if backend is not None else cache
+        self.ttl = ttl
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0
+        }
+
+    def text_key(self, analyzer_name, analyzer_version, text):
+        """Chave para analisadores cuja entrada é apenas o texto"""
+        return f"{MEMO_PREFIX}:{analyzer_name}:{analyzer_version}:{_digest(normalize_text(text))}"
+
+    def media_key(self, analyzer_name, analyzer_version, media_urls, options=None):
+        """
+        Chave para analisadores de mídia
+
+        URLs normalizadas mais os demais argumentos do analisador (options,
+        ex.: tipo de mídia e plataforma), que também alteram o resultado.
+        """
+        parts = [normalize_media_url(url) for url in media_urls]
+        parts += [f"{key}={value}" for key, value in sorted((options or {}).items())]
+        return f"{MEMO_PREFIX}:{analyzer_name}:{analyzer_version}:{_digest(*parts)}"
+
+    def get(self, key):
+        """Obter resultado memoizado (None quando ausente)"""
+        result = self.backend.get(key)
+        if result is None:
+            self.stats['misses'] += 1
+        else:
+            self.stats['hits'] += 1
+        return result
+
+    def set(self, key, result):
+        """Memoizar resultado; resultados marcados como falha não são armazenados"""
+        if not isinstance(result, dict) or result.get('success') is False:
+            return False
+        stored = self.backend.set(key, result, ttl=self.ttl)
+        if stored:
+            self.stats['stores'] += 1
+        return stored
+
+    def get_stats(self):
+        """Obter estatísticas da memoização"""
+        total = self.stats['hits'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] / total) * 100 if total > 0 else 0
+        return {
+            **self.stats,
+            'hit_rate': round(hit_rate, 2)
+        }
+
+# Instância global da memoização de análises
+analysis_memo = AnalysisMemo()
@@ -0,0 +1,321 @@
+"""
+ANALYSIS SCHEDULER
+Priorização de conteúdos pendentes de análise por velocidade de engajamento
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import math
+import time
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+# O scheduler consome orçamento dos analisadores; fica desligado por padrão
+ANALYSIS_SCHEDULER_ENABLED = os.getenv('ANALYSIS_SCHEDULER_ENABLED', 'false').lower() == 'true'
+
+# Intervalo entre ciclos e itens despachados por ciclo (orçamento)
+ANALYSIS_SCHEDULER_INTERVAL = float(os.getenv('ANALYSIS_SCHEDULER_INTERVAL', 30))
+ANALYSIS_SCHEDULER_BUDGET = int(os.getenv('ANALYSIS_SCHEDULER_BUDGET', 50))
+
+# Pontos de prioridade ganhos por hora de espera na fila (evita starvation)
+ANALYSIS_SCHEDULER_AGING_PER_HOUR = float(os.getenv('ANALYSIS_SCHEDULER_AGING_PER_HOUR', 1.0))
+
+# Candidatos: conteúdos com snapshot de métricas recente e sem análise posterior
+CANDIDATE_WINDOW = timedelta(hours=48)
+CANDIDATE_REFRESH_SECONDS = 120
+MAX_CANDIDATES = 5000
+
+# Conteúdo cuja análise falhou só volta à fila após o backoff
+FAILURE_BACKOFF_SECONDS = 900
+
+# Peso do tamanho da audiência do autor em relação à velocidade
+FOLLOWER_WEIGHT = 0.25
+
+# Intervalo mínimo entre snapshots, para que coletas muito próximas não
+# produzam velocidades artificiais
+MIN_VELOCITY_HOURS = 0.25
+
+ENGAGEMENT_SQL = "(likes_count + 2 * comments_count + 3 * shares_count + 2 * saves_count)"
+
+CANDIDATES_SQL = f"""
+    WITH recent AS (
+        SELECT content_id, collected_at, {ENGAGEMENT_SQL} AS engagement,
+               ROW_NUMBER() OVER (PARTITION BY content_id ORDER BY collected_at DESC) AS rn
+        FROM content_metrics
+        WHERE collected_at >= NOW() - $1::interval
+    ),
+    candidates AS (
+        SELECT sc.id AS content_id,
+               sc.author_followers_count,
+               cur.engagement AS current_engagement,
+               cur.collected_at AS current_at,
+               COALESCE(prev.engagement, 0) AS previous_engagement,
+               COALESCE(prev.collected_at, sc.published_at, sc.scraped_at) AS previous_at
+        FROM recent cur
+        JOIN scraped_content sc ON sc.id = cur.content_id AND sc.is_active = true
+        LEFT JOIN recent prev ON prev.content_id = cur.content_id AND prev.rn = 2
+        WHERE cur.rn = 1
+        AND NOT EXISTS (
+            SELECT 1 FROM content_analyses ca
+            WHERE ca.content_id = sc.id
+            AND ca.success = true
+            AND ca.analyzed_at >= cur.collected_at
+        )
+    )
+    SELECT * FROM candidates
+    -- Corte pelo crescimento por hora (o mesmo termo de velocity_score), não
+    -- pela recência da coleta
+    ORDER BY GREATEST(current_engagement - previous_engagement, 0)
+             / GREATEST(EXTRACT(EPOCH FROM (current_at - previous_at)) / 3600, $3::float8) DESC
+    LIMIT $2
+"""
+
+# Itens já na fila que deixaram de precisar de análise: analisados depois da
+# última coleta de métricas ou desativados
+RESOLVED_SQL = """
+    SELECT q.content_id
+    FROM unnest($1::uuid[]) AS q(content_id)
+    LEFT JOIN scraped_content sc ON sc.id = q.content_id
+    WHERE sc.id IS NULL
+    OR sc.is_active = false
+    OR EXISTS (
+        SELECT 1 FROM content_analyses ca
+        WHERE ca.content_id = q.content_id
+        AND ca.success = true
+        AND ca.analyzed_at >= (
+            SELECT MAX(cm.collected_at) FROM content_metrics cm
+            WHERE cm.content_id = q.content_id
+        )
+    )
+"""
+
+# Um único processo executa o ciclo do scheduler por vez
+SCHEDULER_LOCK_KEY = 'analysis_scheduler'
+
+def velocity_score(current_engagement, previous_engagement, current_at, previous_at, followers):
+    """
+    Prioridade de um conteúdo
+
+    Crescimento do engajamento ponderado por hora entre os dois snapshots mais
+    recentes (ou desde a publicação), em escala logarítmica, somado ao tamanho
+    da audiência do autor com peso menor.
+    """
+    hours = MIN_VELOCITY_HOURS
+    if current_at and previous_at:
+        hours = max((current_at - previous_at).total_seconds() / 3600, MIN_VELOCITY_HOURS)
+
+    growth_per_hour = max((current_engagement or 0) - (previous_engagement or 0), 0) / hours
+    return math.log1p(growth_per_hour) + FOLLOWER_WEIGHT * math.log1p(followers or 0)
+
+class AgingPriorityQueue:
+    """
+    Heap de prioridade máxima com envelhecimento linear
+
+    A prioridade efetiva é score + aging_rate * tempo_na_fila. Como o termo de
+    tempo cresce igualmente para todos os itens, a ordem depende apenas de
+    score - aging_rate * enqueued_at, que é fixo e pode ser a chave do heap.
+    Atualizar o score de um item preserva o instante original de entrada.
+    """
+
+    def __init__(self, aging_per_hour=ANALYSIS_SCHEDULER_AGING_PER_HOUR):
+        self.aging_rate = aging_per_hour / 3600
+        self._heap = []
+        self._entries = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def push(self, key, score, now=None):
+        """Inserir item ou atualizar seu score"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            enqueued_at = now
+            if entry is not None:
+                enqueued_at = entry[4]
+                # Remoção preguiçosa: a entrada antiga é ignorada no pop
+                entry[2] = None
+
+            self._counter += 1
+            entry = [-(score - self.aging_rate * enqueued_at), self._counter, key, score, enqueued_at]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+
+            # Compactar quando as entradas removidas dominam o heap
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [item for item in self._heap if item[2] is not None]
+                heapq.heapify(self._heap)
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                entry[2] = None
+
+    def pop_many(self, count, now=None):
+        """Retirar até count itens de maior prioridade efetiva: (key, score, espera em segundos)"""
+        now = time.monotonic() if now is None else now
+        items = []
+        with self._lock:
+            while self._heap and len(items) < count:
+                _, _, key, score, enqueued_at = heapq.heappop(self._heap)
+                if key is None:
+                    continue
+                del self._entries[key]
+                items.append((key, score, now - enqueued_at))
+        return items
+
+    def peek(self, count, now=None):
+        """Itens de maior prioridade efetiva, sem retirá-los da fila"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = heapq.nsmallest(count, (entry for entry in self._heap if entry[2] is not None))
+        return [
+            {
+                'content_id': str(key),
+                'score': round(score, 4),
+                'effective_priority': round(score + self.aging_rate * (now - enqueued_at), 4),
+                'waiting_seconds': round(now - enqueued_at, 1)
+            }
+            for _, _, key, score, enqueued_at in entries
+        ]
+
+class AnalysisScheduler:
+    """
+    Scheduler de análises por prioridade
+
+    Periodicamente consulta conteúdos com métricas novas ainda não analisadas,
+    pontua cada um por velocidade de engajamento e audiência e mantém uma fila
+    com envelhecimento. A cada ciclo despacha no máximo budget itens, os de
+    maior prioridade efetiva, pelo runner de jobs em lote (mesmo handler e
+    semáforo de analisadores).
+    """
+
+    def __init__(self, budget=ANALYSIS_SCHEDULER_BUDGET, interval=ANALYSIS_SCHEDULER_INTERVAL):
+        self.budget = budget
+        self.interval = interval
+        self.analysis_types = None
+        self._advisory_lock = None
+        self.queue = AgingPriorityQueue()
+        self._inflight = set()
+        self._retry_after = {}
+        self._last_refresh = 0.0
+        self.stats = {
+            'cycles': 0,
+            'refreshes': 0,
+            'dispatched': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'max_wait_seconds': 0.0,
+            'total_wait_seconds': 0.0
+        }
+
+    def attach(self, runner, analysis_types):
+        """Registrar o ciclo do scheduler como tarefa periódica do runner"""
+        self.analysis_types = list(analysis_types)
+        self._advisory_lock = runner.advisory_lock
+        runner.add_periodic_task(self.run_cycle, self.interval)
+
+    async def run_cycle(self, pool, run_items):
+        """Atualizar candidatos (se necessário) e despachar o orçamento do ciclo"""
+        # Lock em conexão dedicada: o pool fica livre para os analisadores
+        async with self._advisory_lock(SCHEDULER_LOCK_KEY) as locked:
+            if not locked:
+                return
+
+            self.stats['cycles'] += 1
+            if time.monotonic() - self._last_refresh >= CANDIDATE_REFRESH_SECONDS or not len(self.queue):
+                async with pool.acquire() as conn:
+                    await self.refresh(conn)
+            await self.dispatch(run_items)
+
+    async def refresh(self, conn):
+        """Recalcular prioridades a partir dos snapshots de métricas mais recentes"""
+        rows = await conn.fetch(CANDIDATES_SQL, CANDIDATE_WINDOW, MAX_CANDIDATES, MIN_VELOCITY_HOURS)
+        self._last_refresh = time.monotonic()
+        self.stats['refreshes'] += 1
+
+        now = time.monotonic()
+        self._retry_after = {
+            content_id: retry_at for content_id, retry_at in self._retry_after.items() if retry_at > now
+        }
+
+        # Itens fora do corte de MAX_CANDIDATES continuam na fila com o instante
+        # original de entrada; saem apenas os analisados por outro caminho
+        candidate_ids = {row['content_id'] for row in rows}
+        missing_ids = [content_id for content_id in self.queue.keys() if content_id not in candidate_ids]
+        if missing_ids:
+            for row in await conn.fetch(RESOLVED_SQL, missing_ids):
+                self.queue.remove(row['content_id'])
+
+        for row in rows:
+            content_id = row['content_id']
+            if content_id in self._inflight or content_id in self._retry_after:
+                continue
+            self.queue.push(content_id, velocity_score(
+                row['current_engagement'], row['previous_engagement'],
+                row['current_at'], row['previous_at'], row['author_followers_count']
+            ), now)
+
+        return len(rows)
+
+    async def dispatch(self, run_items):
+        """Despachar os itens de maior prioridade efetiva, até o orçamento"""
+        items = self.queue.pop_many(self.budget)
+        if not items:
+            return 0
+
+        content_ids = [content_id for content_id, _, _ in items]
+        self._inflight.update(content_ids)
+        for _, _, waited in items:
+            self.stats['total_wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+
+        try:
+            outcomes = await run_items(content_ids, self.analysis_types)
+        finally:
+            self._inflight.difference_update(content_ids)
+
+        retry_at = time.monotonic() + FAILURE_BACKOFF_SECONDS
+        for content_id, outcome in zip(content_ids, outcomes):
+            if isinstance(outcome, Exception):
+                self.stats['failed'] += 1
+                self._retry_after[content_id] = retry_at
+                logger.warning(f"Análise agendada de {content_id} falhou: {outcome}")
+            else:
+                self.stats['succeeded'] += 1
+
+        self.stats['dispatched'] += len(items)
+        return len(items)
+
+    def get_stats(self):
+        """Obter estatísticas do scheduler"""
+        dispatched = self.stats['dispatched']
+        return {
+            **{key: value for key, value in self.stats.items() if key != 'total_wait_seconds'},
+            'enabled': self.analysis_types is not None,
+            'queued': len(self.queue),
+            'inflight': len(self._inflight),
+            'backoff': len(self._retry_after),
+            'budget': self.budget,
+            'interval_seconds': self.interval,
+            'avg_wait_seconds': round(self.stats['total_wait_seconds'] / dispatched, 1) if dispatched else 0
+        }
+
+# Instância global do scheduler de análises
+analysis_scheduler = AnalysisScheduler()
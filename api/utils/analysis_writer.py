@@ -0,0 +1,235 @@
+"""
+ANALYSIS WRITER
+Gravação em lote de content_analyses com compactação dos documentos JSONB
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Limites de flush do buffer: o que ocorrer primeiro
+ANALYSIS_WRITER_FLUSH_SIZE = int(os.getenv('ANALYSIS_WRITER_FLUSH_SIZE', 200))
+ANALYSIS_WRITER_FLUSH_SECONDS = float(os.getenv('ANALYSIS_WRITER_FLUSH_SECONDS', 1.0))
+
+# Falhas de gravação aguardando consulta por persist(); as mais antigas são descartadas
+MAX_TRACKED_FAILURES = 10000
+
+# Colunas gravadas, na ordem usada pelo COPY e pelo INSERT
+ANALYSIS_COLUMNS = (
+    'id', 'content_id', 'analysis_type', 'analyzer_name', 'analyzer_version',
+    'analyzed_at', 'processing_time_ms', 'success', 'confidence_score', 'overall_score',
+    'sentiment_score', 'sentiment_polarity', 'dominant_emotion', 'emotional_intensity',
+    'viral_potential_score', 'engagement_prediction', 'trend_direction', 'trend_strength',
+    'sentiment_analysis', 'visual_analysis', 'metrics_analysis', 'predictions', 'recommendations',
+    'analysis_metadata', 'error_details'
+)
+
+JSONB_COLUMNS = (
+    'sentiment_analysis', 'visual_analysis', 'metrics_analysis', 'predictions',
+    'recommendations', 'analysis_metadata', 'error_details'
+)
+
+INSERT_ANALYSIS_SQL = f"""
+    INSERT INTO content_analyses ({', '.join(ANALYSIS_COLUMNS)})
+    VALUES ({', '.join(f'${i}' for i in range(1, len(ANALYSIS_COLUMNS) + 1))})
+"""
+
+def _is_empty(value):
+    return value is None or (isinstance(value, (dict, list)) and not value)
+
+def compact_document(value):
+    """
+    Remover recursivamente valores vazios (None, {} e []) de um documento
+
+    Retorna None quando nada resta, para que a coluna JSONB fique NULL em vez
+    de armazenar um objeto placeholder.
+    """
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            item = compact_document(item)
+            if not _is_empty(item):
+                compacted[key] = item
+        return compacted or None
+    if isinstance(value, list):
+        compacted = [compact_document(item) for item in value]
+        compacted = [item for item in compacted if not _is_empty(item)]
+        return compacted or None
+    return value
+
+def serialize_document(value):
+    """Compactar e serializar documento para coluna JSONB (None se vazio)"""
+    compacted = compact_document(value)
+    if compacted is None:
+        return None
+    return json.dumps(compacted, default=str, separators=(',', ':'))
+
+def prepare_analysis_record(record):
+    """
+    Completar registro de análise para gravação
+
+    Gera id e analyzed_at no cliente (o id é devolvido antes do flush e
+    analyzed_at define a partição) e serializa as colunas JSONB compactadas.
+    """
+    prepared = dict(record)
+    prepared.setdefault('id', uuid.uuid4())
+    prepared.setdefault('analyzed_at', datetime.now(timezone.utc))
+    for column in JSONB_COLUMNS:
+        prepared[column] = serialize_document(prepared.get(column))
+    return tuple(prepared.get(column) for column in ANALYSIS_COLUMNS)
+
+async def insert_analysis(conn, record):
+    """Gravar uma única análise (caminho síncrono das rotas)"""
+    values = prepare_analysis_record(record)
+    await conn.execute(INSERT_ANALYSIS_SQL, *values)
+    return values[0]
+
+class AnalysisWriter:
+    """
+    Buffer de análises gravado em lote
+
+    Registros são acumulados e gravados com COPY quando o buffer atinge
+    flush_size ou quando o registro mais antigo espera flush_seconds. Se o COPY
+    falhar (ex.: uma linha viola constraint), o lote é regravado linha a linha
+    para que apenas as linhas inválidas sejam perdidas. Os ids das análises
+    não gravadas ficam registrados até serem consultados por persist(), de
+    modo que quem recebeu o id em add() saiba que ele não existe no banco.
+    """
+
+    def __init__(self, flush_size=ANALYSIS_WRITER_FLUSH_SIZE, flush_seconds=ANALYSIS_WRITER_FLUSH_SECONDS):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._timer = None
+        self._failed = OrderedDict()
+        self._inflight = set()
+        self.stats = {
+            'records': 0,
+            'flushes': 0,
+            'copy_fallbacks': 0,
+            'failed_records': 0
+        }
+
+    async def add(self, pool, record):
+        """Adicionar análise ao buffer; retorna o id gerado para a análise"""
+        values = prepare_analysis_record(record)
+        self._buffer.append(values)
+        self.stats['records'] += 1
+
+        if len(self._buffer) >= self.flush_size:
+            await self.flush(pool)
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(
+                self.flush_seconds, lambda: loop.create_task(self._flush_logged(pool))
+            )
+
+        return values[0]
+
+    async def _flush_logged(self, pool):
+        try:
+            await self.flush(pool)
+        except Exception as e:
+            logger.error(f"Erro no flush periódico de análises: {e}")
+
+    async def flush(self, pool):
+        """Gravar todos os registros pendentes"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._buffer:
+            return 0
+
+        # Trocar o buffer sem await intermediário: o event loop é single-thread
+        records = self._buffer
+        self._buffer = []
+
+        # Registrado antes do primeiro await: persist() aguarda este flush
+        # mesmo quando quem o iniciou foi outra tarefa ou o timer
+        done = asyncio.get_running_loop().create_future()
+        self._inflight.add(done)
+        try:
+            return await self._write(pool, records)
+        finally:
+            self._inflight.discard(done)
+            done.set_result(None)
+
+    async def _write(self, pool, records):
+        try:
+            async with pool.acquire() as conn:
+                try:
+                    await conn.copy_records_to_table(
+                        'content_analyses', records=records, columns=list(ANALYSIS_COLUMNS)
+                    )
+                except Exception as e:
+                    logger.warning(f"COPY de {len(records)} análises falhou, gravando linha a linha: {e}")
+                    self.stats['copy_fallbacks'] += 1
+                    for values in records:
+                        try:
+                            await conn.execute(INSERT_ANALYSIS_SQL, *values)
+                        except Exception as row_error:
+                            self._record_failure(values[0], row_error)
+                            logger.error(f"Erro ao gravar análise {values[0]}: {row_error}")
+        except Exception as e:
+            # Sem conexão nenhuma linha do lote foi gravada
+            for values in records:
+                self._record_failure(values[0], e)
+            raise
+
+        self.stats['flushes'] += 1
+        return len(records)
+
+    def _record_failure(self, analysis_id, error):
+        self.stats['failed_records'] += 1
+        self._failed[str(analysis_id)] = str(error) or error.__class__.__name__
+        while len(self._failed) > MAX_TRACKED_FAILURES:
+            self._failed.popitem(last=False)
+
+    async def persist(self, pool, analysis_ids):
+        """
+        Gravar os registros pendentes e informar quais dos analysis_ids falharam
+
+        Retorna {analysis_id: erro} das análises que não foram gravadas, neste
+        flush ou em um flush anterior, inclusive os ainda em andamento, que
+        são aguardados. Erros do flush não são
+        propagados: as análises afetadas aparecem no retorno.
+        """
+        try:
+            await self.flush(pool)
+        except Exception as e:
+            logger.error(f"Erro no flush de análises: {e}")
+
+        # Flushes iniciados antes (outra tarefa, timer) podem ainda estar no
+        # COPY com registros destes analysis_ids
+        pending = list(self._inflight)
+        if pending:
+            await asyncio.wait(pending)
+
+        failures = {}
+        for analysis_id in analysis_ids:
+            error = self._failed.pop(str(analysis_id), None)
+            if error is not None:
+                failures[str(analysis_id)] = error
+        return failures
+
+    def get_stats(self):
+        """Obter estatísticas do writer"""
+        return {
+            **self.stats,
+            'buffered': len(self._buffer),
+            'flushes_in_flight': len(self._inflight),
+            'tracked_failures': len(self._failed)
+        }
+
+# Instância global do writer de análises
+analysis_writer = AnalysisWriter()
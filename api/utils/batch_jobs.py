@@ -0,0 +1,601 @@
+"""
+BATCH JOBS
+Execução de análises em lote em background com progresso persistido
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Limite de itens processados simultaneamente pelo runner (todos os jobs)
+BATCH_JOB_CONCURRENCY = int(os.getenv('BATCH_JOB_CONCURRENCY', 8))
+
+# Jobs executados ao mesmo tempo pelo runner; os demais aguardam na fila
+# com status 'queued'
+BATCH_JOB_MAX_RUNNING = int(os.getenv('BATCH_JOB_MAX_RUNNING', 2))
+
+# Tempo máximo de espera pelo bootstrap do runner (pool de conexões) e
+# intervalo mínimo entre novas tentativas disparadas sem espera (requisições)
+BOOTSTRAP_TIMEOUT_SECONDS = 30
+BOOTSTRAP_RETRY_SECONDS = 10
+
+# Tamanho máximo de um job
+BATCH_JOB_MAX_ITEMS = int(os.getenv('BATCH_JOB_MAX_ITEMS', 50000))
+
+# Itens pendentes lidos do banco por página
+JOB_PAGE_SIZE = 500
+
+# O progresso é persistido a cada N itens concluídos ou a cada intervalo
+PROGRESS_FLUSH_SIZE = 50
+PROGRESS_FLUSH_SECONDS = 2.0
+
+# Tempo que o snapshot de um job finalizado permanece em memória
+PROGRESS_RETENTION_SECONDS = 3600
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+JOB_COLUMNS = """
+    id, status, analysis_types, total_items, processed_items, succeeded_items,
+    failed_items, concurrency, created_by, error, created_at, started_at,
+    finished_at, updated_at
+"""
+
+class JobNotFoundError(LookupError):
+    """Job inexistente"""
+    pass
+
+def job_snapshot(row):
+    """Converter linha de analysis_jobs em dicionário serializável"""
+    return {
+        'job_id': str(row['id']),
+        'status': row['status'],
+        'analysis_types': list(row['analysis_types']),
+        'total_items': row['total_items'],
+        'processed_items': row['processed_items'],
+        'succeeded_items': row['succeeded_items'],
+        'failed_items': row['failed_items'],
+        'progress': round(row['processed_items'] / row['total_items'] * 100, 2) if row['total_items'] else 100.0,
+        'concurrency': row['concurrency'],
+        'error': row['error'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+        'started_at': row['started_at'].isoformat() if row['started_at'] else None,
+        'finished_at': row['finished_at'].isoformat() if row['finished_at'] else None,
+        # updated_at é atualizado a cada flush e serve como versão do progresso
+        'version': row['updated_at'].timestamp() if row['updated_at'] else 0
+    }
+
+class BatchJobRunner:
+    """
+    Runner de jobs de análise em lote
+
+    Os jobs são executados em uma thread dedicada com event loop e pool de
+    conexões próprios, fora do ciclo de vida das requisições HTTP. Um semáforo
+    global limita quantos itens são analisados ao mesmo tempo e outro quantos
+    jobs rodam ao mesmo tempo. Advisory locks usam conexões dedicadas, fora do
+    pool, para que jobs em espera não consumam as conexões dos que executam.
+    O resultado de cada item e os contadores do job são gravados em lotes, e
+    jobs interrompidos são retomados no próximo start a partir dos itens ainda
+    pendentes.
+    """
+
+    def __init__(self, concurrency=BATCH_JOB_CONCURRENCY, max_running=BATCH_JOB_MAX_RUNNING):
+        self.concurrency = concurrency
+        self.max_running = max_running
+        self._handler = None
+        self._before_flush = None
+        self._page_context = None
+        self._loop = None
+        self._thread = None
+        self._pool = None
+        self._semaphore = None
+        self._job_semaphore = None
+        self._bootstrap_error = None
+        self._bootstrap_at = 0.0
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._progress = {}
+        self._finished_at = {}
+        self._cancelled = set()
+        self._periodic_tasks = []
+        self.stats = {
+            'jobs_started': 0,
+            'jobs_completed': 0,
+            'items_succeeded': 0,
+            'items_failed': 0,
+            'flushes': 0
+        }
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def set_handler(self, handler, before_flush=None, page_context=None):
+        """
+        Definir a função que processa um item
+
+        Assinatura: async handler(pool, content_id, analysis_types, context) ->
+        dict com analysis_id e summary. Exceções marcam o item como falho.
+        before_flush (async, recebe o pool e os analysis_ids a confirmar) é
+        chamado antes de gravar o progresso, para que escritas bufferizadas pelo
+        handler fiquem duráveis antes dos itens serem marcados como concluídos;
+        retorna {analysis_id: erro} das gravações que falharam, e esses itens
+        são marcados como falhos. page_context (async, recebe o pool
+        e os content_ids da página) produz o context compartilhado pelos itens
+        da página, usado para pré-carregar dados em lote.
+        """
+        self._handler = handler
+        self._before_flush = before_flush
+        self._page_context = page_context
+
+    def add_periodic_task(self, task, interval):
+        """
+        Executar async task(pool, run_items) a cada interval segundos no loop do runner
+
+        Permite que outros componentes (ex.: o scheduler de análises) usem o
+        pool, o handler e o semáforo do runner, dividindo o mesmo orçamento de
+        analisadores com os jobs em lote.
+        """
+        with self._start_lock:
+            self._periodic_tasks.append((task, interval))
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._spawn_periodic_task, task, interval)
+
+    # ---------------------------------------------
+    # Ciclo de vida da thread
+    # ---------------------------------------------
+
+    def start(self, wait=True):
+        """
+        Iniciar a thread do runner (idempotente)
+
+        Se o bootstrap anterior falhou (banco indisponível), uma nova tentativa
+        é agendada (sem espera, no máximo a cada BOOTSTRAP_RETRY_SECONDS).
+        Retorna True quando o pool de conexões está pronto.
+        """
+        if self._pool is not None:
+            return True
+
+        with self._start_lock:
+            if self._thread is None:
+                self._ready.clear()
+                self._loop = asyncio.new_event_loop()
+                for task, interval in self._periodic_tasks:
+                    self._loop.call_soon(self._spawn_periodic_task, task, interval)
+                self._thread = threading.Thread(target=self._run_loop, name='batch-job-runner', daemon=True)
+                self._thread.start()
+            elif (self._pool is None and self._ready.is_set()
+                    and (wait or time.monotonic() - self._bootstrap_at >= BOOTSTRAP_RETRY_SECONDS)):
+                self._ready.clear()
+                self._loop.call_soon_threadsafe(self._loop.create_task, self._bootstrap())
+
+        if wait:
+            self._ready.wait(timeout=BOOTSTRAP_TIMEOUT_SECONDS)
+        return self._pool is not None
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.create_task(self._bootstrap())
+        self._loop.run_forever()
+
+    def _reset_after_fork(self):
+        # A thread, o event loop e o pool do processo pai não existem (ou não
+        # podem ser compartilhados) no filho; o próximo start() recria tudo
+        self._loop = None
+        self._thread = None
+        self._pool = None
+        self._semaphore = None
+        self._job_semaphore = None
+        self._bootstrap_error = None
+        self._bootstrap_at = 0.0
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._condition = threading.Condition()
+
+    def _connect_kwargs(self):
+        return {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'port': int(os.getenv('DB_PORT', 5432)),
+            'user': os.getenv('DB_USER', 'viral_user'),
+            'password': os.getenv('DB_PASSWORD', 'viral_password'),
+            'database': os.getenv('DB_NAME', 'viral_content_db')
+        }
+
+    async def _bootstrap(self):
+        self._bootstrap_at = time.monotonic()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._job_semaphore = asyncio.Semaphore(self.max_running)
+
+        pool = None
+        try:
+            # Uma conexão por item em análise, uma por job em execução (páginas
+            # e flush) e folga para as tarefas periódicas
+            pool = await asyncpg.create_pool(
+                **self._connect_kwargs(),
+                min_size=1,
+                max_size=self.concurrency + self.max_running + 2
+            )
+
+            # Retomar jobs interrompidos
+            async with pool.acquire() as conn:
+                pending_jobs = await conn.fetch("""
+                    SELECT id FROM analysis_jobs
+                    WHERE status IN ('queued', 'running')
+                    ORDER BY created_at
+                """)
+
+            self._pool = pool
+            self._bootstrap_error = None
+            for row in pending_jobs:
+                self._loop.create_task(self._run_job(row['id']))
+
+            logger.info(f"Batch job runner iniciado ({len(pending_jobs)} jobs retomados)")
+
+        except Exception as e:
+            self._bootstrap_error = str(e) or e.__class__.__name__
+            logger.error(f"Erro ao iniciar batch job runner: {e}")
+            if pool is not None:
+                await pool.close()
+        finally:
+            self._ready.set()
+
+    @asynccontextmanager
+    async def advisory_lock(self, key):
+        """
+        Tentar um advisory lock de sessão em uma conexão dedicada (fora do pool)
+
+        Produz True se o lock foi obtido; fechar a conexão libera o lock.
+        """
+        conn = await asyncpg.connect(**self._connect_kwargs())
+        try:
+            yield await conn.fetchval(
+                "SELECT pg_try_advisory_lock(hashtextextended($1::text, 0))", key
+            )
+        finally:
+            await conn.close()
+
+    def _spawn_periodic_task(self, task, interval):
+        self._loop.create_task(self._run_periodic_task(task, interval))
+
+    async def _run_periodic_task(self, task, interval):
+        while True:
+            # Aguardar o bootstrap (ou nova tentativa, se o pool não subiu)
+            if self._pool is not None:
+                try:
+                    await task(self._pool, self.run_items)
+                except Exception as e:
+                    logger.error(f"Erro na tarefa periódica {getattr(task, '__qualname__', task)}: {e}")
+            await asyncio.sleep(interval)
+
+    def _call(self, coro):
+        if not self.start():
+            coro.close()
+            raise RuntimeError(
+                f"Batch job runner indisponível: {self._bootstrap_error or 'pool de conexões não iniciado'}"
+            )
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ---------------------------------------------
+    # API usada pelas rotas
+    # ---------------------------------------------
+
+    async def create_job(self, conn, content_ids, analysis_types, created_by=None):
+        """Persistir job e itens (executado na conexão da requisição)"""
+        job_id = uuid.uuid4()
+        async with conn.transaction():
+            await conn.execute("""
+                INSERT INTO analysis_jobs (id, status, analysis_types, total_items, concurrency, created_by)
+                VALUES ($1, 'queued', $2, $3, $4, $5)
+            """, job_id, analysis_types, len(content_ids), self.concurrency, created_by)
+
+            await conn.copy_records_to_table(
+                'analysis_job_items',
+                records=[(job_id, content_id) for content_id in content_ids],
+                columns=['job_id', 'content_id']
+            )
+        return job_id
+
+    def enqueue(self, job_id):
+        """Agendar execução do job na thread do runner"""
+        self._call(self._run_job(job_id))
+
+    def cancel(self, job_id, timeout=10):
+        """Cancelar job; itens em andamento terminam, os pendentes não são iniciados"""
+        self._cancelled.add(str(job_id))
+        return self._call(self._mark_cancelled(job_id)).result(timeout)
+
+    def get_snapshot(self, job_id, timeout=10):
+        """Snapshot do job (memória do runner ou banco)"""
+        with self._condition:
+            snapshot = self._progress.get(str(job_id))
+        if snapshot is not None:
+            return snapshot
+        return self._call(self._load_snapshot(job_id)).result(timeout)
+
+    def wait_for_update(self, job_id, last_version, timeout=15):
+        """
+        Aguardar uma versão de progresso mais nova que last_version
+
+        Retorna o snapshot novo ou None se nada mudou dentro do timeout. Jobs
+        executados por outro processo são acompanhados consultando o banco.
+        """
+        job_key = str(job_id)
+        with self._condition:
+            snapshot = self._progress.get(job_key)
+            if snapshot is not None:
+                if snapshot['version'] <= last_version and snapshot['status'] not in TERMINAL_STATUSES:
+                    self._condition.wait(timeout)
+                    snapshot = self._progress.get(job_key)
+                return snapshot if snapshot and snapshot['version'] > last_version else None
+
+        snapshot = self.get_snapshot(job_id)
+        if snapshot['version'] > last_version:
+            return snapshot
+        time.sleep(min(timeout, PROGRESS_FLUSH_SECONDS))
+        return None
+
+    # ---------------------------------------------
+    # Execução
+    # ---------------------------------------------
+
+    def _publish(self, row):
+        snapshot = job_snapshot(row)
+        now = time.monotonic()
+        with self._condition:
+            self._progress[snapshot['job_id']] = snapshot
+            if snapshot['status'] in TERMINAL_STATUSES:
+                self._finished_at[snapshot['job_id']] = now
+
+            for job_key, finished_at in list(self._finished_at.items()):
+                if now - finished_at > PROGRESS_RETENTION_SECONDS:
+                    self._progress.pop(job_key, None)
+                    self._finished_at.pop(job_key, None)
+                    self._cancelled.discard(job_key)
+
+            self._condition.notify_all()
+        return snapshot
+
+    async def _load_snapshot(self, job_id):
+        async with self._pool.acquire() as conn:
+            row = await conn.fetchrow(f"SELECT {JOB_COLUMNS} FROM analysis_jobs WHERE id = $1", job_id)
+        if not row:
+            raise JobNotFoundError(str(job_id))
+        return job_snapshot(row)
+
+    async def _mark_cancelled(self, job_id):
+        async with self._pool.acquire() as conn:
+            row = await conn.fetchrow(f"""
+                UPDATE analysis_jobs
+                SET status = 'cancelled', finished_at = NOW(), updated_at = NOW()
+                WHERE id = $1 AND status IN ('queued', 'running')
+                RETURNING {JOB_COLUMNS}
+            """, job_id)
+            if not row:
+                row = await conn.fetchrow(f"SELECT {JOB_COLUMNS} FROM analysis_jobs WHERE id = $1", job_id)
+        if not row:
+            raise JobNotFoundError(str(job_id))
+        return self._publish(row)
+
+    async def _run_job(self, job_id):
+        job_key = str(job_id)
+
+        # Jobs além de max_running aguardam aqui, sem conexão, como 'queued'
+        async with self._job_semaphore:
+            try:
+                # Advisory lock garante um único executor por job entre processos
+                async with self.advisory_lock(job_key) as locked:
+                    if locked:
+                        await self._process_job(job_id, job_key)
+            except Exception as e:
+                logger.error(f"Erro no job de análise {job_key}: {e}")
+                async with self._pool.acquire() as conn:
+                    row = await conn.fetchrow(f"""
+                        UPDATE analysis_jobs
+                        SET status = 'failed', error = $2, finished_at = NOW(), updated_at = NOW()
+                        WHERE id = $1
+                        RETURNING {JOB_COLUMNS}
+                    """, job_id, str(e))
+                if row:
+                    self._publish(row)
+
+    async def _process_job(self, job_id, job_key):
+        async with self._pool.acquire() as conn:
+            job = await conn.fetchrow(f"""
+                UPDATE analysis_jobs
+                SET status = 'running', started_at = COALESCE(started_at, NOW()), updated_at = NOW()
+                WHERE id = $1 AND status IN ('queued', 'running')
+                RETURNING {JOB_COLUMNS}
+            """, job_id)
+        if not job:
+            return
+
+        self.stats['jobs_started'] += 1
+        self._publish(job)
+
+        analysis_types = list(job['analysis_types'])
+        buffer = []
+        flush_state = {'last_flush': time.monotonic()}
+        after_content_id = None
+
+        while job_key not in self._cancelled:
+            # Keyset sobre content_id: itens em andamento ainda não gravados
+            # não são relidos na página seguinte
+            async with self._pool.acquire() as conn:
+                # Cancelamento pode ter sido feito por outro processo
+                status = await conn.fetchval("SELECT status FROM analysis_jobs WHERE id = $1", job_id)
+                if status == 'cancelled':
+                    self._cancelled.add(job_key)
+                    break
+
+                rows = await conn.fetch("""
+                    SELECT content_id FROM analysis_job_items
+                    WHERE job_id = $1 AND status = 'pending'
+                    AND ($2::uuid IS NULL OR content_id > $2)
+                    ORDER BY content_id
+                    LIMIT $3
+                """, job_id, after_content_id, JOB_PAGE_SIZE)
+
+            if not rows:
+                break
+
+            after_content_id = rows[-1]['content_id']
+            page_ids = [row['content_id'] for row in rows]
+            context = await self._page_context(self._pool, page_ids) if self._page_context else None
+
+            await asyncio.gather(*(
+                self._process_item(job_id, job_key, content_id, analysis_types, context, buffer, flush_state)
+                for content_id in page_ids
+            ))
+
+        await self._flush(job_id, buffer)
+
+        if job_key in self._cancelled:
+            return
+
+        async with self._pool.acquire() as conn:
+            row = await conn.fetchrow(f"""
+                UPDATE analysis_jobs
+                SET status = 'completed', finished_at = NOW(), updated_at = NOW()
+                WHERE id = $1 AND status = 'running'
+                RETURNING {JOB_COLUMNS}
+            """, job_id)
+        if row:
+            self.stats['jobs_completed'] += 1
+            self._publish(row)
+
+    async def run_items(self, content_ids, analysis_types):
+        """
+        Processar itens avulsos (fora de um job) com o handler e o semáforo do runner
+
+        Retorna um resultado (ou exceção) por item, na ordem de content_ids.
+        Escritas bufferizadas são persistidas (before_flush) antes do retorno.
+        """
+        context = await self._page_context(self._pool, content_ids) if self._page_context else None
+
+        async def run_item(content_id):
+            async with self._semaphore:
+                return await self._handler(self._pool, content_id, analysis_types, context)
+
+        outcomes = await asyncio.gather(*(run_item(content_id) for content_id in content_ids), return_exceptions=True)
+
+        if self._before_flush is not None:
+            analysis_ids = [
+                outcome.get('analysis_id') for outcome in outcomes
+                if not isinstance(outcome, BaseException) and outcome.get('analysis_id')
+            ]
+            failures = await self._before_flush(self._pool, analysis_ids)
+            outcomes = [
+                RuntimeError(f"Falha ao gravar análise: {failures[outcome['analysis_id']]}")
+                if not isinstance(outcome, BaseException) and outcome.get('analysis_id') in failures
+                else outcome
+                for outcome in outcomes
+            ]
+
+        return outcomes
+
+    async def _process_item(self, job_id, job_key, content_id, analysis_types, context, buffer, flush_state):
+        async with self._semaphore:
+            if job_key in self._cancelled:
+                return
+
+            try:
+                result = await self._handler(self._pool, content_id, analysis_types, context)
+                buffer.append(('succeeded', content_id, result.get('analysis_id'), result.get('summary'), None))
+                self.stats['items_succeeded'] += 1
+            except Exception as e:
+                buffer.append(('failed', content_id, None, None, str(e)))
+                self.stats['items_failed'] += 1
+
+        if len(buffer) >= PROGRESS_FLUSH_SIZE or time.monotonic() - flush_state['last_flush'] >= PROGRESS_FLUSH_SECONDS:
+            flush_state['last_flush'] = time.monotonic()
+            await self._flush(job_id, buffer)
+
+    async def _flush(self, job_id, buffer):
+        """Gravar resultados acumulados dos itens e atualizar contadores do job"""
+        if not buffer:
+            return
+
+        # Copiar e esvaziar sem await intermediário: o event loop é single-thread
+        outcomes = list(buffer)
+        buffer.clear()
+
+        if self._before_flush is not None:
+            failures = await self._before_flush(self._pool, [
+                analysis_id for status, _, analysis_id, _, _ in outcomes
+                if status == 'succeeded' and analysis_id
+            ])
+            if failures:
+                # Análise não gravada: o item não pode apontar para ela
+                outcomes = [
+                    ('failed', content_id, None, None, f"Falha ao gravar análise: {failures[analysis_id]}")
+                    if status == 'succeeded' and analysis_id in failures
+                    else (status, content_id, analysis_id, summary, error)
+                    for status, content_id, analysis_id, summary, error in outcomes
+                ]
+                self.stats['items_succeeded'] -= len(failures)
+                self.stats['items_failed'] += len(failures)
+
+        succeeded = sum(1 for outcome in outcomes if outcome[0] == 'succeeded')
+        failed = len(outcomes) - succeeded
+
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany("""
+                    UPDATE analysis_job_items
+                    SET status = $3, analysis_id = $4, summary = $5, error = $6, processed_at = NOW()
+                    WHERE job_id = $1 AND content_id = $2 AND status = 'pending'
+                """, [
+                    (
+                        job_id, content_id, status,
+                        uuid.UUID(str(analysis_id)) if analysis_id else None,
+                        json.dumps(summary, default=str) if summary else None,
+                        error
+                    )
+                    for status, content_id, analysis_id, summary, error in outcomes
+                ])
+
+                row = await conn.fetchrow(f"""
+                    UPDATE analysis_jobs
+                    SET processed_items = processed_items + $2,
+                        succeeded_items = succeeded_items + $3,
+                        failed_items = failed_items + $4,
+                        updated_at = NOW()
+                    WHERE id = $1
+                    RETURNING {JOB_COLUMNS}
+                """, job_id, len(outcomes), succeeded, failed)
+
+        self.stats['flushes'] += 1
+        if row:
+            self._publish(row)
+
+    def get_stats(self):
+        """Obter estatísticas do runner"""
+        with self._condition:
+            active_jobs = sum(
+                1 for snapshot in self._progress.values()
+                if snapshot['status'] not in TERMINAL_STATUSES
+            )
+        return {
+            **self.stats,
+            'running': self._thread is not None,
+            'ready': self._pool is not None,
+            'bootstrap_error': self._bootstrap_error,
+            'concurrency': self.concurrency,
+            'max_running_jobs': self.max_running,
+            'active_jobs': active_jobs
+        }
+
+# Instância global do runner de jobs
+batch_job_runner = BatchJobRunner()
@@ -0,0 +1,127 @@
+"""
+COMPARISON UTILITIES
+Estatísticas vetorizadas para comparação de coortes de conteúdo
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import numpy as np
+
+PERCENTILES = (25, 50, 75, 90)
+
+def to_matrix(rows, metrics):
+    """
+    Converter linhas em matriz colunar (conteúdos x métricas)
+
+    Valores ausentes viram NaN e são ignorados pelas estatísticas.
+    """
+    matrix = np.full((len(rows), len(metrics)), np.nan)
+    for i, row in enumerate(rows):
+        for j, metric in enumerate(metrics):
+            value = row[metric]
+            if value is not None:
+                matrix[i, j] = float(value)
+    return matrix
+
+def average_ranks(matrix):
+    """
+    Ranks por coluna (1 = menor valor), com média nos empates e NaN preservado
+    """
+    n_rows, n_cols = matrix.shape
+    ranks = np.full(matrix.shape, np.nan)
+    # argsort coloca NaN no fim de cada coluna
+    order = np.argsort(matrix, axis=0, kind='mergesort')
+    sorted_values = np.take_along_axis(matrix, order, axis=0)
+    valid_counts = np.sum(~np.isnan(matrix), axis=0)
+
+    for j in range(n_cols):
+        count = valid_counts[j]
+        if count == 0:
+            continue
+        values = sorted_values[:count, j]
+        # Início de cada grupo de valores iguais
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        ends = np.r_[starts[1:], count]
+        group_ranks = (starts + ends + 1) / 2.0
+        ranks[order[:count, j], j] = np.repeat(group_ranks, ends - starts)
+
+    return ranks
+
+def rank_correlations(matrix):
+    """
+    Correlação de Spearman entre todas as métricas
+
+    Usa os conteúdos com todas as métricas preenchidas; retorna None quando não
+    há ao menos 3 linhas completas. Pares sem variância ficam NaN.
+    """
+    complete = matrix[~np.isnan(matrix).any(axis=1)]
+    if complete.shape[0] < 3 or complete.shape[1] < 2:
+        return None
+
+    ranks = average_ranks(complete)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.corrcoef(ranks, rowvar=False)
+
+def summarize_columns(matrix):
+    """
+    Estatísticas de todas as métricas em uma única passada
+
+    Retorna dicionário de arrays (um valor por coluna) mais z-scores e ranks
+    por conteúdo. Colunas sem valores têm count 0 e estatísticas NaN.
+    """
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    has_values = counts > 0
+
+    # Colunas vazias recebem zeros só para evitar avisos; são mascaradas depois
+    safe = np.where(has_values[None, :], matrix, 0.0)
+    with np.errstate(invalid='ignore'):
+        mins = np.where(has_values, np.nanmin(safe, axis=0), np.nan)
+        maxs = np.where(has_values, np.nanmax(safe, axis=0), np.nan)
+        means = np.where(has_values, np.nanmean(safe, axis=0), np.nan)
+        stds = np.where(has_values, np.nanstd(safe, axis=0), np.nan)
+        percentiles = np.where(
+            has_values[None, :],
+            np.nanpercentile(safe, PERCENTILES, axis=0),
+            np.nan
+        )
+
+    # argmax/argmin ignorando NaN (NaN substituído pelo extremo oposto)
+    best = np.argmax(np.where(valid, matrix, -np.inf), axis=0)
+    worst = np.argmin(np.where(valid, matrix, np.inf), axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_scores = np.where(stds > 0, (matrix - means) / stds, 0.0)
+    z_scores[~valid] = np.nan
+
+    return {
+        'count': counts,
+        'min': mins,
+        'max': maxs,
+        'mean': means,
+        'std': stds,
+        'percentiles': percentiles,
+        'best_index': best,
+        'worst_index': worst,
+        'has_values': has_values,
+        'z_scores': z_scores,
+        'ranks': average_ranks(matrix)
+    }
+
+def group_means(groups, values):
+    """Média de values por grupo (ignorando NaN), vetorizada com bincount"""
+    labels, inverse = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)
+    valid = ~np.isnan(values)
+    sums = np.bincount(inverse[valid], weights=values[valid], minlength=len(labels))
+    counts = np.bincount(inverse[valid], minlength=len(labels))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+    return {str(label): float(mean) for label, mean, count in zip(labels, means, counts) if count > 0}
+
+def to_python(value):
+    """Converter escalar NumPy para JSON (NaN vira None)"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
@@ -0,0 +1,120 @@
+"""
+CONTENT LOADER
+Carregamento em lote de conteúdos com métricas mais recentes (estilo DataLoader)
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import uuid
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Máximo de ids por consulta ANY
+MAX_BATCH_SIZE = 1000
+
+# Apenas as colunas de métricas usadas pelos analisadores: cm.* traria também
+# cm.id, que colidiria com sc.id no registro retornado
+CONTENT_WITH_METRICS_SQL = """
+    SELECT sc.*,
+           cm.likes_count, cm.comments_count, cm.shares_count,
+           cm.views_count, cm.engagement_rate
+    FROM scraped_content sc
+    LEFT JOIN LATERAL (
+        SELECT * FROM content_metrics
+        WHERE content_id = sc.id
+        ORDER BY collected_at DESC
+        LIMIT 1
+    ) cm ON true
+    WHERE sc.id = ANY($1::uuid[]) AND sc.is_active = true
+"""
+
+async def fetch_content_rows(conn, content_ids):
+    """Buscar conteúdos ativos + métricas mais recentes em uma única consulta"""
+    return await conn.fetch(CONTENT_WITH_METRICS_SQL, list(content_ids))
+
+class ContentLoader:
+    """
+    Loader de conteúdos com batching e memo por instância
+
+    Chamadas a load() feitas no mesmo ciclo do event loop são agrupadas em uma
+    única consulta ANY($1); cada id é buscado no máximo uma vez por instância.
+    Deve ser criado por requisição (ou por página de job) para que o memo não
+    sirva dados desatualizados.
+    """
+
+    def __init__(self, pool, max_batch_size=MAX_BATCH_SIZE):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self._cache = {}
+        self._queue = []
+        self._dispatch_scheduled = False
+        self.stats = {
+            'keys_requested': 0,
+            'queries': 0,
+            'rows_loaded': 0
+        }
+
+    @staticmethod
+    def _key(content_id):
+        return content_id if isinstance(content_id, uuid.UUID) else uuid.UUID(str(content_id))
+
+    def load(self, content_id):
+        """Agendar carregamento; retorna future com a linha (None se inexistente/inativo)"""
+        key = self._key(content_id)
+        self.stats['keys_requested'] += 1
+
+        future = self._cache.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.append(key)
+
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(lambda: loop.create_task(self._dispatch()))
+
+        return future
+
+    async def load_many(self, content_ids):
+        """Carregar vários conteúdos; a ordem do resultado segue a da entrada"""
+        return await asyncio.gather(*(self.load(content_id) for content_id in content_ids))
+
+    def prime(self, content_id, row):
+        """Inserir no memo uma linha já obtida por outra consulta"""
+        key = self._key(content_id)
+        if key not in self._cache:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(row)
+            self._cache[key] = future
+
+    async def _dispatch(self):
+        keys = self._queue
+        self._queue = []
+        self._dispatch_scheduled = False
+
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            try:
+                async with self.pool.acquire() as conn:
+                    rows = await fetch_content_rows(conn, chunk)
+            except Exception as e:
+                for key in chunk:
+                    future = self._cache.pop(key)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats['queries'] += 1
+            self.stats['rows_loaded'] += len(rows)
+
+            rows_by_id = {row['id']: row for row in rows}
+            for key in chunk:
+                future = self._cache[key]
+                if not future.done():
+                    future.set_result(rows_by_id.get(key))
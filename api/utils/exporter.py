@@ -0,0 +1,373 @@
+"""
+EXPORTER
+Exportação de dados em streaming (CSV, NDJSON, JSON) e jobs de exportação em disco
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import io
+import os
+import csv
+import json
+import zlib
+import uuid
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Formatos colunares opcionais (gerados apenas por jobs em disco)
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+try:
+    import openpyxl
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', '/home/ubuntu/viral_content_scraper/storage/exports')
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+EXPORT_TTL_HOURS = int(os.getenv('EXPORT_TTL_HOURS', 24))
+
+# Acima deste número de linhas a exportação vira job em disco
+EXPORT_ASYNC_THRESHOLD = int(os.getenv('EXPORT_ASYNC_THRESHOLD', 50000))
+
+# Linhas acumuladas antes de emitir um bloco do stream
+STREAM_FLUSH_ROWS = 500
+PARQUET_BATCH_ROWS = 10000
+
+# formato: (mimetype, extensão, disponível em streaming)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', True),
+    'ndjson': ('application/x-ndjson', 'ndjson', True),
+    'json': ('application/json', 'json', True),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', False),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx', False)
+}
+
+def available_formats():
+    """Formatos suportados neste ambiente"""
+    return [
+        export_format for export_format in EXPORT_FORMATS
+        if (export_format != 'parquet' or PARQUET_AVAILABLE)
+        and (export_format != 'xlsx' or XLSX_AVAILABLE)
+    ]
+
+def is_streamable(export_format):
+    return EXPORT_FORMATS[export_format][2]
+
+def flatten_record(record, prefix=''):
+    """Achatar dicionários aninhados em chaves pontuadas ('metadata.confidence')"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, f"{name}."))
+        elif isinstance(value, (list, tuple)):
+            flat[name] = json.dumps(value, ensure_ascii=False, default=str)
+        else:
+            flat[name] = value
+    return flat
+
+def iter_csv(rows, columns):
+    """Blocos de CSV com quoting do módulo csv; colunas ausentes ficam vazias"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= STREAM_FLUSH_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_ndjson(rows):
+    """Um objeto JSON por linha"""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(chunk) >= STREAM_FLUSH_ROWS:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+def iter_json_array(rows):
+    """Array JSON emitido incrementalmente"""
+    yield '['
+    first = True
+    for chunk in iter_ndjson(rows):
+        lines = chunk.rstrip('\n').split('\n')
+        yield ('' if first else ',') + ','.join(lines)
+        first = False
+    yield ']'
+
+def iter_export(rows, export_format, columns=None):
+    """Stream de texto do formato pedido"""
+    if export_format == 'csv':
+        return iter_csv(rows, columns)
+    if export_format == 'ndjson':
+        return iter_ndjson(rows)
+    if export_format == 'json':
+        return iter_json_array(rows)
+    raise ValueError(f"Formato sem suporte a streaming: {export_format}")
+
+def iter_encoded(chunks, compress=False):
+    """Codificar blocos em UTF-8, com gzip incremental opcional"""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+        return
+
+    # wbits=31: container gzip (cabeçalho e CRC) em vez de zlib puro
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_filename(prefix, export_format, compress=False):
+    extension = EXPORT_FORMATS[export_format][1]
+    suffix = '.gz' if compress and is_streamable(export_format) else ''
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}{suffix}"
+
+def export_mimetype(export_format, compress=False):
+    if compress and is_streamable(export_format):
+        return 'application/gzip'
+    return EXPORT_FORMATS[export_format][0]
+
+def _write_parquet(rows, path, columns):
+    writer = None
+    try:
+        batch = []
+        for row in rows:
+            batch.append({column: row.get(column) for column in columns})
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                table = pyarrow.Table.from_pylist(batch)
+                writer = writer or pyarrow.parquet.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                batch = []
+        if batch or writer is None:
+            table = pyarrow.Table.from_pylist(batch) if batch else pyarrow.table({column: [] for column in columns})
+            writer = writer or pyarrow.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _write_xlsx(rows, path, columns):
+    # write_only mantém apenas a linha corrente em memória
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('export')
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([row.get(column) for column in columns])
+    workbook.save(path)
+
+class _CountingRows:
+    """Iterador que conta as linhas consumidas pelo escritor"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rows)
+        self.count += 1
+        return row
+
+class ExportJobManager:
+    """
+    Jobs de exportação gravados em disco
+
+    Cada job roda em um pool de threads, grava em arquivo temporário e o
+    renomeia ao final; os metadados ficam em um JSON ao lado do arquivo para
+    que qualquer worker do servidor encontre o job. Arquivos expiram após
+    EXPORT_TTL_HOURS. O download é servido com suporte a Range (retomável).
+    """
+
+    def __init__(self, export_dir=EXPORT_DIR, max_workers=EXPORT_WORKERS):
+        self.export_dir = export_dir
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'jobs_submitted': 0,
+            'jobs_completed': 0,
+            'jobs_failed': 0,
+            'jobs_expired': 0,
+            'bytes_written': 0
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                os.makedirs(self.export_dir, exist_ok=True)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='export-job'
+                )
+            return self._executor
+
+    def _meta_path(self, job_id):
+        return os.path.join(self.export_dir, f"{job_id}.meta.json")
+
+    def _save(self, job):
+        with self._lock:
+            self._jobs[job['job_id']] = job
+        fd, tmp_path = tempfile.mkstemp(dir=self.export_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path(job['job_id']))
+
+    def submit(self, rows_factory, export_format, columns=None, compress=False,
+               filename_prefix='export', metadata=None):
+        """
+        Agendar exportação
+
+        rows_factory é chamado na thread do job e deve devolver um iterável de
+        dicionários; columns é obrigatório para csv, parquet e xlsx.
+        """
+        if export_format not in available_formats():
+            raise ValueError(f"Formato de exportação não suportado: {export_format}")
+
+        executor = self._get_executor()
+        self.cleanup_expired()
+
+        job_id = uuid.uuid4().hex
+        compress = compress and is_streamable(export_format)
+        now = datetime.utcnow()
+        job = {
+            'job_id': job_id,
+            'status': 'pending',
+            'format': export_format,
+            'compressed': compress,
+            'filename': export_filename(filename_prefix, export_format, compress),
+            'mimetype': export_mimetype(export_format, compress),
+            'rows': 0,
+            'size_bytes': 0,
+            'metadata': metadata or {},
+            'created_at': now.isoformat(),
+            'expires_at': (now + timedelta(hours=EXPORT_TTL_HOURS)).isoformat(),
+            'completed_at': None,
+            'error': None
+        }
+        self._save(job)
+        self.stats['jobs_submitted'] += 1
+
+        executor.submit(self._run, job, rows_factory, columns)
+        return dict(job)
+
+    def _run(self, job, rows_factory, columns):
+        job = dict(job, status='running')
+        self._save(job)
+
+        path = self.file_path(job['job_id'])
+        fd, tmp_path = tempfile.mkstemp(dir=self.export_dir, suffix='.tmp')
+        os.close(fd)
+
+        try:
+            rows = _CountingRows(rows_factory())
+            if job['format'] == 'parquet':
+                _write_parquet(rows, tmp_path, columns)
+            elif job['format'] == 'xlsx':
+                _write_xlsx(rows, tmp_path, columns)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    for data in iter_encoded(iter_export(rows, job['format'], columns), job['compressed']):
+                        f.write(data)
+            os.replace(tmp_path, path)
+
+            size = os.path.getsize(path)
+            self.stats['jobs_completed'] += 1
+            self.stats['bytes_written'] += size
+            job.update(
+                status='completed', rows=rows.count, size_bytes=size,
+                completed_at=datetime.utcnow().isoformat()
+            )
+        except Exception as e:
+            logger.error(f"Erro no job de exportação {job['job_id']}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.stats['jobs_failed'] += 1
+            job.update(status='failed', error=str(e), completed_at=datetime.utcnow().isoformat())
+
+        self._save(job)
+
+    def file_path(self, job_id):
+        return os.path.join(self.export_dir, f"{job_id}.export")
+
+    def get(self, job_id):
+        """Metadados do job (memória ou JSON em disco); None se não existir"""
+        if not job_id.isalnum():
+            return None
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+
+        try:
+            with open(self._meta_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def cleanup_expired(self):
+        """Remover jobs e arquivos expirados"""
+        now = datetime.utcnow().isoformat()
+        try:
+            entries = os.listdir(self.export_dir)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for name in entries:
+            if not name.endswith('.meta.json'):
+                continue
+            job = self.get(name[:-len('.meta.json')])
+            if job is None or job['expires_at'] > now or job['status'] in ('pending', 'running'):
+                continue
+
+            for path in (self.file_path(job['job_id']), self._meta_path(job['job_id'])):
+                if os.path.exists(path):
+                    os.remove(path)
+            with self._lock:
+                self._jobs.pop(job['job_id'], None)
+            removed += 1
+
+        self.stats['jobs_expired'] += removed
+        return removed
+
+    def get_stats(self):
+        """Obter estatísticas dos jobs de exportação"""
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job['status'] in ('pending', 'running'))
+        return {
+            **self.stats,
+            'active_jobs': active,
+            'formats': available_formats()
+        }
+
+# Instância global
+export_jobs = ExportJobManager()
@@ -0,0 +1,342 @@
+"""
+FORECASTING ENGINE
+Previsão vetorizada de séries diárias por plataforma
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre atualizações do rollup diário (segundos)
+ROLLUP_TICK_SECONDS = int(os.getenv('FORECAST_ROLLUP_TICK_SECONDS', 3600))
+
+# Dias de histórico carregados do rollup
+HISTORY_DAYS = 56
+
+# Maior horizonte suportado pelos endpoints; previsões menores são fatias deste
+MAX_HORIZON_DAYS = 30
+
+# Sazonalidade semanal para Holt-Winters
+SEASON_LENGTH = 7
+
+# Métricas previstas, na ordem do eixo de métricas da matriz
+FORECAST_METRICS = ('content_count', 'avg_viral_potential', 'avg_engagement_rate')
+
+FORECAST_METHODS = ('ewma', 'holt_winters', 'linear')
+
+# z para intervalo de confiança de 95%
+CONFIDENCE_Z = 1.96
+
+# =====================================================
+# MODELOS VETORIZADOS
+# =====================================================
+# Todas as funções recebem Y com shape (séries, dias) e retornam as previsões
+# para todas as séries de uma vez, junto com o desvio padrão dos resíduos de
+# previsão um passo à frente, usado nos intervalos de confiança.
+
+def _residual_sigma(residuals):
+    if residuals.shape[1] == 0:
+        return np.zeros(residuals.shape[0])
+    return np.sqrt(np.mean(residuals ** 2, axis=1))
+
+def ewma_forecast(Y, horizon, alpha=0.3):
+    """Suavização exponencial simples: previsão constante no último nível"""
+    level = Y[:, 0].copy()
+    residuals = np.empty((Y.shape[0], Y.shape[1] - 1))
+
+    for t in range(1, Y.shape[1]):
+        residuals[:, t - 1] = Y[:, t] - level
+        level = alpha * Y[:, t] + (1 - alpha) * level
+
+    forecast = np.repeat(level[:, None], horizon, axis=1)
+    sigma = _residual_sigma(residuals)
+    # Variância do erro cresce com o horizonte na suavização simples
+    steps = np.arange(1, horizon + 1)
+    spread = sigma[:, None] * np.sqrt(1 + (steps - 1) * alpha ** 2)[None, :]
+    return forecast, spread
+
+def linear_trend_forecast(Y, horizon):
+    """Regressão linear por mínimos quadrados sobre o índice do dia"""
+    n_days = Y.shape[1]
+    x = np.arange(n_days, dtype=float)
+    slope, intercept = np.polyfit(x, Y.T, 1)
+
+    fitted = intercept[:, None] + slope[:, None] * x[None, :]
+    residuals = Y - fitted
+    dof = max(n_days - 2, 1)
+    sigma = np.sqrt(np.sum(residuals ** 2, axis=1) / dof)
+
+    future_x = np.arange(n_days, n_days + horizon, dtype=float)
+    forecast = intercept[:, None] + slope[:, None] * future_x[None, :]
+
+    # Erro de previsão da regressão (aumenta ao se afastar da média de x)
+    x_mean = x.mean()
+    sxx = np.sum((x - x_mean) ** 2) or 1.0
+    leverage = np.sqrt(1 + 1 / n_days + (future_x - x_mean) ** 2 / sxx)
+    spread = sigma[:, None] * leverage[None, :]
+    return forecast, spread
+
+def holt_winters_forecast(Y, horizon, alpha=0.3, beta=0.1, gamma=0.2, season_length=SEASON_LENGTH):
+    """Holt-Winters aditivo (nível, tendência e sazonalidade semanal)"""
+    n_series, n_days = Y.shape
+    if n_days < 2 * season_length:
+        # Histórico insuficiente para inicializar a sazonalidade
+        return linear_trend_forecast(Y, horizon)
+
+    first_season = Y[:, :season_length]
+    second_season = Y[:, season_length:2 * season_length]
+    level = first_season.mean(axis=1)
+    trend = (second_season.mean(axis=1) - level) / season_length
+    seasonal = first_season - level[:, None]
+
+    residuals = np.empty((n_series, n_days - season_length))
+
+    for t in range(season_length, n_days):
+        s = t % season_length
+        y = Y[:, t]
+        residuals[:, t - season_length] = y - (level + trend + seasonal[:, s])
+
+        new_level = alpha * (y - seasonal[:, s]) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonal[:, s] = gamma * (y - new_level) + (1 - gamma) * seasonal[:, s]
+        level = new_level
+
+    steps = np.arange(1, horizon + 1)
+    season_idx = (n_days + steps - 1) % season_length
+    forecast = level[:, None] + trend[:, None] * steps[None, :] + seasonal[:, season_idx]
+
+    sigma = _residual_sigma(residuals)
+    spread = sigma[:, None] * np.sqrt(steps)[None, :]
+    return forecast, spread
+
+_MODELS = {
+    'ewma': ewma_forecast,
+    'holt_winters': holt_winters_forecast,
+    'linear': linear_trend_forecast
+}
+
+def forecast_batch(Y, horizon, method='holt_winters'):
+    """
+    Prever todas as séries de Y em uma única passada
+
+    Retorna dicionário com arrays (séries, horizonte): forecast, lower e upper.
+    """
+    if method not in _MODELS:
+        raise ValueError(f"Método de previsão inválido: {method}")
+
+    forecast, spread = _MODELS[method](Y, horizon)
+    margin = CONFIDENCE_Z * spread
+    return {
+        'forecast': forecast,
+        'lower': forecast - margin,
+        'upper': forecast + margin
+    }
+
+def fill_gaps(Y):
+    """Preencher dias sem amostra (NaN) com o último valor conhecido de cada série"""
+    mask = np.isnan(Y)
+    if not mask.any():
+        return Y
+
+    idx = np.where(~mask, np.arange(Y.shape[1])[None, :], 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = Y[np.arange(Y.shape[0])[:, None], idx]
+
+    # Séries que começam sem dados: usar a média da própria série (ou 0)
+    counts = (~mask).sum(axis=1)
+    series_mean = np.where(mask, 0.0, Y).sum(axis=1) / np.maximum(counts, 1)
+    leading = np.isnan(filled)
+    filled[leading] = np.broadcast_to(series_mean[:, None], filled.shape)[leading]
+    return filled
+
+# =====================================================
+# PREVISÕES POR PLATAFORMA
+# =====================================================
+
+class PlatformForecaster:
+    """
+    Previsões de atividade por plataforma a partir de platform_daily_rollup
+
+    O resultado de todos os métodos é calculado em lote (plataformas x métricas)
+    e mantido em memória até o próximo tick do rollup, de forma que as
+    requisições entre ticks não acessam o PostgreSQL. Um único refresh roda por
+    vez: as demais requisições servem o snapshot anterior ou, sem snapshot,
+    aguardam o refresh em andamento sem bloquear a thread (as views async do
+    Flask podem rodar em event loops diferentes, por isso um Future
+    thread-safe em vez de um lock do asyncio).
+    """
+
+    def __init__(self, tick_seconds=ROLLUP_TICK_SECONDS, history_days=HISTORY_DAYS):
+        self.tick_seconds = tick_seconds
+        self.history_days = history_days
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self._snapshot = None
+        self._valid_until = 0
+        self.stats = {
+            'hits': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'last_refresh_ms': 0.0
+        }
+
+    def _next_tick(self, now):
+        return (int(now // self.tick_seconds) + 1) * self.tick_seconds
+
+    async def _load_rollup(self, conn):
+        # Consolidar desde o último dia consolidado (inclui dias perdidos)
+        await conn.execute("SELECT refresh_platform_daily_rollup()")
+        return await conn.fetch("""
+            SELECT platform, date, content_count, avg_viral_potential, avg_engagement_rate
+            FROM platform_daily_rollup
+            WHERE date >= CURRENT_DATE - $1::int
+            ORDER BY platform, date
+        """, self.history_days - 1)
+
+    def _build_snapshot(self, rows, today):
+        platforms = sorted({row['platform'] for row in rows})
+        start_day = today - timedelta(days=self.history_days - 1)
+
+        # Matriz densa (plataformas, métricas, dias); dias ausentes ficam NaN
+        Y = np.full((len(platforms), len(FORECAST_METRICS), self.history_days), np.nan)
+        platform_index = {p: i for i, p in enumerate(platforms)}
+        for row in rows:
+            day = (row['date'] - start_day).days
+            if 0 <= day < self.history_days:
+                for m, metric in enumerate(FORECAST_METRICS):
+                    value = row[metric]
+                    if value is not None:
+                        Y[platform_index[row['platform']], m, day] = float(value)
+
+        # Sem conteúdo coletado no dia significa contagem zero, não ausência
+        Y[:, 0, :] = np.nan_to_num(Y[:, 0, :])
+
+        flat = fill_gaps(Y.reshape(-1, self.history_days))
+        results = {
+            method: forecast_batch(flat, MAX_HORIZON_DAYS, method)
+            for method in FORECAST_METHODS
+        }
+
+        return {
+            'platforms': platforms,
+            'history': flat.reshape(Y.shape),
+            'results': results,
+            'generated_at': today.isoformat()
+        }
+
+    async def get_snapshot(self, pool):
+        """Obter snapshot das previsões, recalculando apenas após o tick do rollup"""
+        now = time.time()
+        if self._snapshot is not None and now < self._valid_until:
+            self.stats['hits'] += 1
+            return self._snapshot
+
+        # O lock protege apenas a troca de _refreshing (sem await dentro)
+        with self._lock:
+            refreshing = self._refreshing
+            owner = refreshing is None
+            if owner:
+                refreshing = self._refreshing = concurrent.futures.Future()
+
+        if not owner:
+            self.stats['hits'] += 1
+            if self._snapshot is not None:
+                # Outra requisição já está recalculando: servir o snapshot anterior
+                return self._snapshot
+            return await asyncio.wrap_future(refreshing)
+
+        try:
+            if self._snapshot is not None and time.time() < self._valid_until:
+                refreshing.set_result(self._snapshot)
+                return self._snapshot
+
+            start_time = time.perf_counter()
+            async with pool.acquire() as conn:
+                rows = await self._load_rollup(conn)
+
+            self._snapshot = self._build_snapshot(rows, date.today())
+            self._valid_until = self._next_tick(time.time())
+            self.stats['refreshes'] += 1
+            self.stats['last_refresh_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+            refreshing.set_result(self._snapshot)
+            return self._snapshot
+
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.error(f"Erro ao atualizar previsões de plataforma: {e}")
+            if self._snapshot is None:
+                refreshing.set_exception(e)
+                raise
+            refreshing.set_result(self._snapshot)
+            return self._snapshot
+
+        finally:
+            if not refreshing.done():
+                # Cancelamento da requisição dona do refresh
+                refreshing.cancel()
+            with self._lock:
+                self._refreshing = None
+
+    async def get_platform_forecasts(self, pool, horizon_days, method='holt_winters'):
+        """
+        Previsões por plataforma para o horizonte solicitado
+
+        Para cada plataforma e métrica retorna a média prevista no horizonte, o
+        intervalo de confiança e a taxa de crescimento em relação aos últimos 7 dias.
+        """
+        snapshot = await self.get_snapshot(pool)
+        horizon_days = max(1, min(horizon_days, MAX_HORIZON_DAYS))
+        result = snapshot['results'][method]
+
+        n_platforms = len(snapshot['platforms'])
+        n_metrics = len(FORECAST_METRICS)
+        shape = (n_platforms, n_metrics, MAX_HORIZON_DAYS)
+
+        forecast = result['forecast'].reshape(shape)[:, :, :horizon_days].mean(axis=2)
+        lower = result['lower'].reshape(shape)[:, :, :horizon_days].mean(axis=2)
+        upper = result['upper'].reshape(shape)[:, :, :horizon_days].mean(axis=2)
+        recent = snapshot['history'][:, :, -7:].mean(axis=2)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(recent > 0, (forecast - recent) / recent, 0.0)
+            # Confiança: quanto mais estreito o intervalo relativo à previsão, maior
+            relative_width = np.where(np.abs(forecast) > 0, (upper - lower) / (2 * np.abs(forecast)), 1.0)
+        confidence = np.clip(1 - relative_width, 0, 1)
+
+        forecasts = []
+        for p, platform in enumerate(snapshot['platforms']):
+            metrics = {}
+            for m, metric in enumerate(FORECAST_METRICS):
+                metrics[metric] = {
+                    'recent_avg': float(recent[p, m]),
+                    'forecast': float(forecast[p, m]),
+                    'lower': float(lower[p, m]),
+                    'upper': float(upper[p, m]),
+                    'growth_rate': float(growth[p, m]),
+                    'confidence': float(confidence[p, m])
+                }
+            forecasts.append({'platform': platform, 'metrics': metrics})
+
+        return forecasts
+
+    def get_stats(self):
+        """Obter estatísticas do motor de previsão"""
+        return {
+            **self.stats,
+            'platforms': len(self._snapshot['platforms']) if self._snapshot else 0,
+            'valid_until': self._valid_until
+        }
+
+# Instância global do motor de previsão
+platform_forecaster = PlatformForecaster()
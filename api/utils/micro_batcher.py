@@ -0,0 +1,195 @@
+"""
+MICRO BATCHER
+Agrupamento de chamadas pequenas em lotes processados de uma só vez
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+# Limites do lote de sentimento: o que ocorrer primeiro
+SENTIMENT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', 32))
+SENTIMENT_BATCH_WAIT_MS = float(os.getenv('SENTIMENT_BATCH_WAIT_MS', 5))
+
+class MicroBatcher:
+    """
+    Micro-batcher com event loop próprio
+
+    As views async do Flask rodam cada requisição em um event loop separado,
+    então os itens são entregues a uma thread dedicada que acumula o lote por
+    até max_wait_ms ou até max_batch_size itens, chama o handler uma única vez
+    e devolve a cada requisição o seu resultado (ou exceção).
+    """
+
+    def __init__(self, name, max_batch_size, max_wait_ms):
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._handler = None
+        self._loop = None
+        self._thread = None
+        self._pending = []
+        self._timer = None
+        self._start_lock = threading.Lock()
+        self.stats = {
+            'items': 0,
+            'batches': 0,
+            'size_flushes': 0,
+            'timeout_flushes': 0,
+            'largest_batch': 0,
+            'failed_batches': 0,
+            'batch_time_ms': 0.0
+        }
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def set_handler(self, handler):
+        """
+        Definir a função que processa um lote
+
+        Assinatura: async handler(items) -> lista de resultados na mesma ordem.
+        Um resultado que seja instância de Exception é entregue como exceção
+        apenas ao item correspondente.
+        """
+        self._handler = handler
+
+    # ---------------------------------------------
+    # Ciclo de vida da thread
+    # ---------------------------------------------
+
+    def start(self):
+        """Iniciar a thread do batcher (idempotente)"""
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=self._run_loop, name=f'{self.name}-batcher', daemon=True)
+            thread.start()
+            self._thread = thread
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _reset_after_fork(self):
+        # A thread do processo pai não existe no filho
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pending = []
+        self._timer = None
+
+    # ---------------------------------------------
+    # API usada pelas rotas
+    # ---------------------------------------------
+
+    def submit_many(self, items):
+        """Enfileirar itens; retorna um concurrent.futures.Future por item"""
+        if self._handler is None:
+            raise RuntimeError(f"Handler do batcher {self.name} não definido")
+
+        self.start()
+        entries = [(item, concurrent.futures.Future()) for item in items]
+        self._loop.call_soon_threadsafe(self._enqueue, entries)
+        return [future for _, future in entries]
+
+    def submit(self, item):
+        """Enfileirar um item; retorna concurrent.futures.Future"""
+        return self.submit_many([item])[0]
+
+    async def run(self, item):
+        """Processar um item no próximo lote (aguardável de qualquer event loop)"""
+        return await asyncio.wrap_future(self.submit(item))
+
+    async def run_many(self, items):
+        """Processar vários itens; exceções são retornadas na posição do item"""
+        futures = [asyncio.wrap_future(future) for future in self.submit_many(items)]
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    # ---------------------------------------------
+    # Execução no event loop do batcher
+    # ---------------------------------------------
+
+    def _enqueue(self, entries):
+        self._pending.extend(entries)
+
+        while len(self._pending) >= self.max_batch_size:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            self.stats['size_flushes'] += 1
+            self._loop.create_task(self._dispatch(batch))
+
+        if not self._pending:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.max_wait_ms / 1000, self._flush_timeout)
+
+    def _flush_timeout(self):
+        self._timer = None
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = []
+        self.stats['timeout_flushes'] += 1
+        self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        # Descartar itens cujas requisições já desistiram
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        self.stats['batches'] += 1
+        self.stats['items'] += len(batch)
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+        start_time = time.perf_counter()
+        try:
+            results = await self._handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Handler retornou {len(results)} resultados para {len(batch)} itens")
+        except (Exception, asyncio.CancelledError) as e:
+            # CancelledError não herda de Exception: sem isso os futures ficariam pendentes
+            self.stats['failed_batches'] += 1
+            logger.error(f"Erro no lote do batcher {self.name}: {e}")
+            results = [e] * len(batch)
+        finally:
+            self.stats['batch_time_ms'] += (time.perf_counter() - start_time) * 1000
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def get_stats(self):
+        """Obter estatísticas do batcher"""
+        batches = self.stats['batches']
+        return {
+            **{key: value for key, value in self.stats.items() if key != 'batch_time_ms'},
+            'running': self._thread is not None,
+            'pending': len(self._pending),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'avg_batch_size': round(self.stats['items'] / batches, 2) if batches else 0,
+            'avg_batch_time_ms': round(self.stats['batch_time_ms'] / batches, 2) if batches else 0
+        }
+
+# Instância global do micro-batcher de sentimento
+sentiment_batcher = MicroBatcher('sentiment', SENTIMENT_BATCH_SIZE, SENTIMENT_BATCH_WAIT_MS)
@@ -0,0 +1,84 @@
+"""
+PAGINATION UTILITIES
+Paginação por cursor (keyset) para listagens da API
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+
+# Colunas ordenáveis e a expressão SQL usada na ordenação. Colunas anuláveis
+# usam COALESCE para que a comparação por tupla nunca encontre NULL; os índices
+# compostos da migration V1.1.0 usam exatamente as mesmas expressões.
+CONTENT_SORT_COLUMNS = {
+    'scraped_at': {'expression': 'sc.scraped_at', 'type': 'timestamptz'},
+    'published_at': {'expression': "COALESCE(sc.published_at, '-infinity'::timestamptz)", 'type': 'timestamptz'},
+    'last_updated': {'expression': "COALESCE(sc.last_updated, '-infinity'::timestamptz)", 'type': 'timestamptz'},
+    'author_followers_count': {'expression': 'COALESCE(sc.author_followers_count, -1)', 'type': 'bigint'}
+}
+
+CURSOR_VERSION = 1
+
+class CursorError(ValueError):
+    """Exceção para cursores inválidos ou incompatíveis com a consulta"""
+    pass
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'t': 'dt', 'v': value.isoformat()}
+    return {'t': 'raw', 'v': value}
+
+def _decode_value(payload):
+    if payload.get('t') == 'dt':
+        return datetime.fromisoformat(payload['v'])
+    return payload.get('v')
+
+def encode_cursor(sort_by, sort_order, last_value, last_id):
+    """Gerar token opaco com a última tupla (valor de ordenação, id) da página"""
+    payload = {
+        'v': CURSOR_VERSION,
+        's': sort_by,
+        'o': sort_order,
+        'k': _encode_value(last_value),
+        'id': str(last_id)
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort_by, sort_order):
+    """
+    Decodificar token de cursor
+
+    Retorna a tupla (valor de ordenação, id como UUID). O cursor precisa ter
+    sido gerado para a mesma ordenação, caso contrário a página seguinte seria
+    inconsistente; valores com tipo incompatível com a coluna são rejeitados.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise CursorError('Cursor inválido')
+
+    if not isinstance(payload, dict) or payload.get('v') != CURSOR_VERSION:
+        raise CursorError('Versão de cursor não suportada')
+
+    if payload.get('s') != sort_by or payload.get('o') != sort_order:
+        raise CursorError('Cursor gerado para outra ordenação')
+
+    try:
+        value = _decode_value(payload['k'])
+        last_id = uuid.UUID(payload['id'])
+    except (KeyError, ValueError, TypeError, AttributeError):
+        raise CursorError('Cursor inválido')
+
+    column_type = CONTENT_SORT_COLUMNS.get(sort_by, {}).get('type')
+    if column_type == 'timestamptz' and not isinstance(value, datetime):
+        raise CursorError('Cursor inválido')
+    if column_type == 'bigint' and (isinstance(value, bool) or not isinstance(value, int)):
+        raise CursorError('Cursor inválido')
+
+    return value, last_id
@@ -0,0 +1,252 @@
+"""
+PATTERN INDEX
+Índice em memória dos padrões evolutivos
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre consultas incrementais ao banco (segundos)
+PATTERN_REFRESH_SECONDS = int(os.getenv('PATTERN_INDEX_REFRESH_SECONDS', 30))
+
+# Reconstrução completa periódica (captura padrões removidos fisicamente)
+PATTERN_FULL_REBUILD_SECONDS = int(os.getenv('PATTERN_INDEX_FULL_REBUILD_SECONDS', 3600))
+
+# Janela relida antes do watermark: updated_at é o instante da escrita
+# (clock_timestamp(), migração V1.4.0), mas a linha só fica visível no commit.
+# Deve cobrir a transação mais longa esperada sobre evolutionary_patterns.
+PATTERN_WATERMARK_LAG_SECONDS = int(os.getenv('PATTERN_INDEX_WATERMARK_LAG_SECONDS', 300))
+
+# Categorias derivadas de pattern_type, na ordem de precedência da classificação
+PATTERN_CATEGORIES = ('viral', 'hashtag', 'creator', 'sentiment')
+
+# Chave de plataforma para padrões sem plataforma definida (valem para todas)
+ANY_PLATFORM = '*'
+
+# Número de faixas de confiança (0.0-0.1, 0.1-0.2, ..., 1.0)
+CONFIDENCE_BUCKETS = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def classify_pattern_type(pattern_type):
+    """Classificar pattern_type em uma categoria (ou None)"""
+    pattern_type = (pattern_type or '').lower()
+    for category in PATTERN_CATEGORIES:
+        if category in pattern_type:
+            return category
+    return None
+
+def confidence_bucket(confidence):
+    """Faixa de confiança usada como chave do índice"""
+    return max(0, min(int(math.floor(confidence * CONFIDENCE_BUCKETS)), CONFIDENCE_BUCKETS))
+
+class PatternIndex:
+    """
+    Índice de padrões evolutivos por categoria, plataforma e faixa de confiança
+
+    Construído a partir da tabela evolutionary_patterns e atualizado de forma
+    incremental pelo watermark de updated_at: cada atualização busca as linhas
+    alteradas desde a anterior, relendo uma janela de watermark_lag antes do
+    watermark para pegar linhas de transações que commitaram depois. As consultas de predição filtram o índice
+    em memória, sem reconsultar nem reclassificar o conjunto completo.
+    """
+
+    def __init__(self, refresh_seconds=PATTERN_REFRESH_SECONDS,
+                 full_rebuild_seconds=PATTERN_FULL_REBUILD_SECONDS,
+                 watermark_lag_seconds=PATTERN_WATERMARK_LAG_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self.watermark_lag = timedelta(seconds=watermark_lag_seconds)
+        self._lock = threading.Lock()
+        # (padrões por id, índice), trocados juntos a cada atualização para que
+        # leituras concorrentes nunca vejam um estado parcial.
+        # Índice: (categoria, plataforma) -> faixa de confiança -> ids
+        self._state = ({}, {})
+        self._watermark = EPOCH
+        self._last_refresh = 0
+        self._last_full_rebuild = 0
+        self.stats = {
+            'queries': 0,
+            'refreshes': 0,
+            'full_rebuilds': 0,
+            'rows_applied': 0,
+            'refresh_errors': 0
+        }
+
+    # ---------------------------------------------
+    # Manutenção do índice
+    # ---------------------------------------------
+
+    def _index_keys(self, pattern):
+        platforms = pattern['platforms'] or [ANY_PLATFORM]
+        bucket = confidence_bucket(pattern['confidence_score'])
+        return [((pattern['category'], platform), bucket) for platform in platforms]
+
+    def _remove(self, patterns, index, pattern_id):
+        pattern = patterns.pop(pattern_id, None)
+        if pattern is None:
+            return
+        for key, bucket in self._index_keys(pattern):
+            ids = index.get(key, {}).get(bucket)
+            if ids is not None:
+                ids.discard(pattern_id)
+
+    def _apply(self, patterns, index, row):
+        pattern_id = str(row['id'])
+        self._remove(patterns, index, pattern_id)
+
+        if row['updated_at'] and row['updated_at'] > self._watermark:
+            self._watermark = row['updated_at']
+
+        category = classify_pattern_type(row['pattern_type'])
+        if not row['is_active'] or category is None:
+            return
+
+        pattern_data = row['pattern_data']
+        if isinstance(pattern_data, str):
+            pattern_data = json.loads(pattern_data)
+
+        pattern = {
+            'id': pattern_id,
+            'pattern_type': row['pattern_type'],
+            'category': category,
+            'pattern_data': pattern_data or {},
+            'platforms': list(row['platforms'] or []),
+            'niches': list(row['niches'] or []),
+            'confidence_score': float(row['confidence_score'] or 0),
+            'success_rate': float(row['success_rate'] or 0),
+            'updated_at': row['updated_at']
+        }
+        patterns[pattern_id] = pattern
+        for key, bucket in self._index_keys(pattern):
+            index.setdefault(key, {}).setdefault(bucket, set()).add(pattern_id)
+
+    async def _refresh(self, pool):
+        now = time.time()
+        full_rebuild = now - self._last_full_rebuild >= self.full_rebuild_seconds
+
+        async with pool.acquire() as conn:
+            if full_rebuild:
+                rows = await conn.fetch("""
+                    SELECT id, pattern_type, pattern_data, platforms, niches,
+                           confidence_score, success_rate, updated_at, is_active
+                    FROM evolutionary_patterns
+                    WHERE is_active = true
+                """)
+            else:
+                # A janela antes do watermark pega linhas escritas antes dele por
+                # transações que só commitaram depois da última leitura;
+                # reaplicar uma linha já indexada é idempotente.
+                since = self._watermark - self.watermark_lag if self._watermark != EPOCH else EPOCH
+                rows = await conn.fetch("""
+                    SELECT id, pattern_type, pattern_data, platforms, niches,
+                           confidence_score, success_rate, updated_at, is_active
+                    FROM evolutionary_patterns
+                    WHERE updated_at >= $1
+                    ORDER BY updated_at
+                """, since)
+
+        if full_rebuild:
+            patterns, index = {}, {}
+            self._watermark = EPOCH
+            self._last_full_rebuild = now
+            self.stats['full_rebuilds'] += 1
+        else:
+            current_patterns, current_index = self._state
+            patterns = dict(current_patterns)
+            index = {
+                key: {bucket: set(ids) for bucket, ids in buckets.items()}
+                for key, buckets in current_index.items()
+            }
+
+        for row in rows:
+            self._apply(patterns, index, row)
+
+        self._state = (patterns, index)
+
+        self._last_refresh = now
+        self.stats['refreshes'] += 1
+        self.stats['rows_applied'] += len(rows)
+
+    async def ensure_fresh(self, pool):
+        """Aplicar alterações pendentes do banco, no máximo uma vez por intervalo"""
+        if time.time() - self._last_refresh < self.refresh_seconds:
+            return
+
+        first_load = self._last_full_rebuild == 0
+        if not self._lock.acquire(blocking=first_load):
+            # Outra requisição já está atualizando: usar o índice atual
+            return
+
+        try:
+            if time.time() - self._last_refresh >= self.refresh_seconds:
+                await self._refresh(pool)
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.error(f"Erro ao atualizar índice de padrões: {e}")
+            if first_load:
+                raise
+        finally:
+            self._lock.release()
+
+    # ---------------------------------------------
+    # Consultas
+    # ---------------------------------------------
+
+    def find(self, categories=None, platform=None, min_confidence=0.0):
+        """
+        Filtrar padrões indexados
+
+        Com plataforma informada, retorna os padrões dessa plataforma e os padrões
+        sem plataforma definida. Resultado ordenado por confiança decrescente.
+        """
+        self.stats['queries'] += 1
+        categories = categories or PATTERN_CATEGORIES
+        platforms = [platform, ANY_PLATFORM] if platform else None
+        min_bucket = confidence_bucket(min_confidence)
+
+        patterns_by_id, index = self._state
+        matched = set()
+        for (category, key_platform), buckets in index.items():
+            if category not in categories:
+                continue
+            if platforms is not None and key_platform not in platforms:
+                continue
+            for bucket, ids in buckets.items():
+                if bucket >= min_bucket:
+                    matched.update(ids)
+
+        patterns = [
+            patterns_by_id[pattern_id] for pattern_id in matched
+            if patterns_by_id[pattern_id]['confidence_score'] >= min_confidence
+        ]
+        patterns.sort(key=lambda p: p['confidence_score'], reverse=True)
+        return patterns
+
+    async def get_patterns(self, pool, categories=None, platform=None, min_confidence=0.0):
+        """Atualizar o índice (se necessário) e filtrar padrões"""
+        await self.ensure_fresh(pool)
+        return self.find(categories, platform, min_confidence)
+
+    def get_stats(self):
+        """Obter estatísticas do índice de padrões"""
+        patterns, index = self._state
+        return {
+            **self.stats,
+            'patterns': len(patterns),
+            'index_keys': len(index),
+            'watermark': self._watermark.isoformat() if self._watermark != EPOCH else None
+        }
+
+# Instância global do índice de padrões
+pattern_index = PatternIndex()
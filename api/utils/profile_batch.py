@@ -0,0 +1,372 @@
+"""
+PROFILE BATCH
+Execução concorrente de lotes de análise de perfis com orçamento por plataforma
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import asyncio
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Limites aceitos nas batch_options e lotes mantidos para consulta
+PROFILE_BATCH_MAX_CONCURRENT = int(os.getenv('PROFILE_BATCH_MAX_CONCURRENT', 10))
+PROFILE_BATCH_MAX_PROFILES = int(os.getenv('PROFILE_BATCH_MAX_PROFILES', 1000))
+PROFILE_BATCH_RETAINED_JOBS = int(os.getenv('PROFILE_BATCH_RETAINED_JOBS', 200))
+
+# Estado dos lotes em disco, para que qualquer worker do servidor responda a
+# consulta; lotes finalizados expiram após PROFILE_BATCH_TTL_HOURS
+PROFILE_BATCH_DIR = os.getenv('PROFILE_BATCH_DIR', '/home/ubuntu/viral_content_scraper/storage/profile_batches')
+PROFILE_BATCH_TTL_HOURS = int(os.getenv('PROFILE_BATCH_TTL_HOURS', 24))
+
+# Intervalo mínimo entre gravações do progresso de um lote em execução
+PROFILE_BATCH_SAVE_SECONDS = 1.0
+
+DEFAULT_MAX_CONCURRENT = 3
+DEFAULT_DELAY_MS = 5000
+
+class TokenBucket:
+    """
+    Token bucket assíncrono
+
+    Reabastece `rate` tokens por segundo até `capacity`. acquire() espera
+    pelo próximo token; a espera é serializada para que os pedidos sejam
+    atendidos em ordem de chegada.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Consumir um token; retorna o tempo esperado em segundos"""
+        async with self._lock:
+            waited = 0.0
+            self._refill()
+            while self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= 1
+            return waited
+
+class ProfileBatchRunner:
+    """
+    Lotes de análise de perfis em um event loop próprio
+
+    Cada lote limita a concorrência por plataforma com um semáforo
+    (max_concurrent) e cadencia os inícios de análise por plataforma com um
+    token bucket: delay_between_analyses define a taxa sustentada e
+    max_concurrent a rajada. O estado do lote é gravado em um JSON por lote
+    em batch_dir (na criação, periodicamente durante a execução e ao final)
+    e pode ser consultado pelo batch_id de qualquer worker.
+    """
+
+    def __init__(self, batch_dir=PROFILE_BATCH_DIR, name='profile-batch'):
+        self.batch_dir = batch_dir
+        self.name = name
+        self._analyzer = None
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._saved_at = {}
+        self.stats = {
+            'batches': 0,
+            'profiles_completed': 0,
+            'profiles_failed': 0,
+            'rate_wait_ms': 0.0,
+            'batches_expired': 0,
+            'save_errors': 0
+        }
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def set_analyzer(self, analyzer):
+        """
+        Definir a função que analisa um perfil
+
+        Assinatura: async analyzer(profile, analysis_depth, options) -> dict,
+        onde profile tem url, platform e username.
+        """
+        self._analyzer = analyzer
+
+    # ---------------------------------------------
+    # Ciclo de vida da thread
+    # ---------------------------------------------
+
+    def start(self):
+        """Iniciar a thread do executor (idempotente)"""
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=self._run_loop, name=self.name, daemon=True)
+            thread.start()
+            self._thread = thread
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _reset_after_fork(self):
+        # A thread do processo pai não existe no filho
+        self._start_lock = threading.Lock()
+        self._jobs_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    # ---------------------------------------------
+    # Persistência
+    # ---------------------------------------------
+
+    def _batch_path(self, batch_id):
+        return os.path.join(self.batch_dir, f"{batch_id}.json")
+
+    @staticmethod
+    def _valid_batch_id(batch_id):
+        return batch_id.startswith('batch_') and batch_id[len('batch_'):].isalnum()
+
+    def _snapshot(self, job):
+        snapshot = dict(job, summary=dict(job['summary']))
+        snapshot['results'] = [result for result in job['results'] if result is not None]
+        return snapshot
+
+    def _save(self, job):
+        """Gravar o snapshot do lote (troca atômica do arquivo)"""
+        with self._jobs_lock:
+            snapshot = self._snapshot(job)
+        self._saved_at[job['batch_id']] = time.monotonic()
+
+        try:
+            os.makedirs(self.batch_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.batch_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self._batch_path(job['batch_id']))
+        except Exception as e:
+            self.stats['save_errors'] += 1
+            logger.error(f"Erro ao gravar estado do lote {job['batch_id']}: {e}")
+
+    def cleanup_expired(self):
+        """Remover arquivos de lotes finalizados há mais de PROFILE_BATCH_TTL_HOURS"""
+        cutoff = (datetime.now() - timedelta(hours=PROFILE_BATCH_TTL_HOURS)).isoformat()
+        try:
+            entries = os.listdir(self.batch_dir)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for name in entries:
+            if not name.endswith('.json'):
+                continue
+            batch = self.get(name[:-len('.json')])
+            if batch is None or not batch.get('finished_at') or batch['finished_at'] > cutoff:
+                continue
+            try:
+                os.remove(self._batch_path(batch['batch_id']))
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+        self.stats['batches_expired'] += removed
+        return removed
+
+    # ---------------------------------------------
+    # API usada pelas rotas
+    # ---------------------------------------------
+
+    @staticmethod
+    def parse_options(batch_options):
+        """
+        Validar batch_options; retorna (opções normalizadas, max_concurrent, delay_ms)
+
+        Levanta ValueError para valores não numéricos ou fora do domínio.
+        """
+        if not isinstance(batch_options, dict):
+            raise ValueError("batch_options deve ser um objeto")
+
+        try:
+            max_concurrent = int(batch_options.get('max_concurrent', DEFAULT_MAX_CONCURRENT))
+        except (TypeError, ValueError):
+            raise ValueError("batch_options.max_concurrent deve ser um número inteiro")
+
+        try:
+            delay_ms = float(batch_options.get('delay_between_analyses', DEFAULT_DELAY_MS))
+        except (TypeError, ValueError):
+            raise ValueError("batch_options.delay_between_analyses deve ser um número (ms)")
+        if not math.isfinite(delay_ms) or delay_ms < 0:
+            raise ValueError("batch_options.delay_between_analyses deve ser um número finito >= 0")
+
+        max_concurrent = max(1, min(max_concurrent, PROFILE_BATCH_MAX_CONCURRENT))
+        options = {**batch_options, 'max_concurrent': max_concurrent, 'delay_between_analyses': delay_ms}
+        return options, max_concurrent, delay_ms
+
+    def submit(self, profiles, analysis_depth='standard', batch_options=None):
+        """Agendar lote; retorna o snapshot inicial com batch_id"""
+        if self._analyzer is None:
+            raise RuntimeError("Analisador de perfis do lote não definido")
+
+        batch_options, max_concurrent, delay_ms = self.parse_options(
+            batch_options if batch_options is not None else {}
+        )
+        self.cleanup_expired()
+
+        job = {
+            'batch_id': f"batch_{uuid.uuid4().hex}",
+            'status': 'pending',
+            'total_profiles': len(profiles),
+            'analysis_depth': analysis_depth,
+            'batch_options': batch_options,
+            'results': [None] * len(profiles),
+            'summary': {
+                'successful': 0,
+                'failed': 0,
+                'pending': len(profiles),
+                'total_processing_time': 0
+            },
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None
+        }
+
+        with self._jobs_lock:
+            self._jobs[job['batch_id']] = job
+            while len(self._jobs) > PROFILE_BATCH_RETAINED_JOBS:
+                self._jobs.popitem(last=False)
+        self._save(job)
+
+        self.stats['batches'] += 1
+        self.start()
+        asyncio.run_coroutine_threadsafe(
+            self._run_batch(job, profiles, max_concurrent, delay_ms), self._loop
+        )
+        return self.get(job['batch_id'])
+
+    def get(self, batch_id):
+        """Snapshot do lote (memória deste processo ou JSON em disco); None se desconhecido"""
+        if not self._valid_batch_id(batch_id):
+            return None
+
+        with self._jobs_lock:
+            job = self._jobs.get(batch_id)
+            if job is not None:
+                return self._snapshot(job)
+
+        try:
+            with open(self._batch_path(batch_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    # ---------------------------------------------
+    # Execução no event loop do executor
+    # ---------------------------------------------
+
+    async def _run_batch(self, job, profiles, max_concurrent, delay_ms):
+        job['status'] = 'running'
+        job['started_at'] = datetime.now().isoformat()
+        self._save(job)
+        started = time.monotonic()
+
+        semaphores = {}
+        buckets = {}
+        for profile in profiles:
+            platform = profile['platform']
+            if platform not in semaphores:
+                semaphores[platform] = asyncio.Semaphore(max_concurrent)
+                if delay_ms > 0:
+                    buckets[platform] = TokenBucket(1000.0 / delay_ms, max_concurrent)
+
+        await asyncio.gather(*(
+            self._run_profile(job, index, profile, semaphores[profile['platform']], buckets.get(profile['platform']))
+            for index, profile in enumerate(profiles)
+        ))
+
+        summary = job['summary']
+        if summary['successful'] > 0:
+            summary['avg_processing_time'] = int(summary['total_processing_time'] / summary['successful'])
+        summary['success_rate'] = round((summary['successful'] / len(profiles)) * 100, 2) if profiles else 0
+        summary['wall_time_ms'] = int((time.monotonic() - started) * 1000)
+        job['status'] = 'completed'
+        job['finished_at'] = datetime.now().isoformat()
+        self._save(job)
+        self._saved_at.pop(job['batch_id'], None)
+
+    async def _run_profile(self, job, index, profile, semaphore, bucket):
+        async with semaphore:
+            if bucket is not None:
+                self.stats['rate_wait_ms'] += await bucket.acquire() * 1000
+
+            started = time.monotonic()
+            try:
+                result = await self._analyzer(profile, job['analysis_depth'], job['batch_options'])
+                processing_time = int((time.monotonic() - started) * 1000)
+                result = {
+                    'username': profile['username'],
+                    'platform': profile['platform'],
+                    'url': profile['url'],
+                    'status': 'completed',
+                    'processing_time_ms': processing_time,
+                    **result
+                }
+                job['summary']['successful'] += 1
+                job['summary']['total_processing_time'] += processing_time
+                self.stats['profiles_completed'] += 1
+            except Exception as e:
+                logger.error(f"Erro ao analisar perfil {profile['username']} no lote {job['batch_id']}: {e}")
+                result = {
+                    'username': profile['username'],
+                    'platform': profile['platform'],
+                    'url': profile['url'],
+                    'status': 'failed',
+                    'error': str(e)
+                }
+                job['summary']['failed'] += 1
+                self.stats['profiles_failed'] += 1
+
+            with self._jobs_lock:
+                job['results'][index] = result
+                job['summary']['pending'] -= 1
+
+            if time.monotonic() - self._saved_at.get(job['batch_id'], 0) >= PROFILE_BATCH_SAVE_SECONDS:
+                self._save(job)
+
+    def get_stats(self):
+        """Obter estatísticas do executor de lotes"""
+        with self._jobs_lock:
+            running = sum(1 for job in self._jobs.values() if job['status'] in ('pending', 'running'))
+        return {
+            **self.stats,
+            'running_batches': running,
+            'retained_batches': len(self._jobs)
+        }
+
+# Instância global
+profile_batch_runner = ProfileBatchRunner()
@@ -0,0 +1,159 @@
+"""
+PROFILE CACHE
+Política de frescor das análises de perfis salvas (TTL, stale-while-revalidate)
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Profundidades em ordem crescente: uma análise serve pedidos de profundidade
+# igual ou menor
+ANALYSIS_DEPTHS = {'basic': 0, 'standard': 1, 'deep': 2}
+
+# Validade (segundos) por profundidade; análises profundas custam mais e
+# valem por mais tempo
+PROFILE_CACHE_TTL = {
+    'basic': int(os.getenv('PROFILE_CACHE_TTL_BASIC', 6 * 3600)),
+    'standard': int(os.getenv('PROFILE_CACHE_TTL_STANDARD', 24 * 3600)),
+    'deep': int(os.getenv('PROFILE_CACHE_TTL_DEEP', 72 * 3600))
+}
+
+# Depois do TTL a análise ainda é servida (com refresh em segundo plano) até
+# TTL * PROFILE_CACHE_STALE_FACTOR; além disso é considerada expirada
+PROFILE_CACHE_STALE_FACTOR = float(os.getenv('PROFILE_CACHE_STALE_FACTOR', 2))
+
+# Variação relativa de seguidores abaixo da qual o perfil é considerado inalterado
+PROFILE_FOLLOWER_CHANGE_RATIO = float(os.getenv('PROFILE_FOLLOWER_CHANGE_RATIO', 0.01))
+
+PROFILE_REFRESH_WORKERS = int(os.getenv('PROFILE_REFRESH_WORKERS', 2))
+
+def depth_level(analysis_depth):
+    return ANALYSIS_DEPTHS.get(analysis_depth, ANALYSIS_DEPTHS['standard'])
+
+def profile_changed(analysis, snapshot):
+    """Comparar a análise salva com um snapshot barato do perfil"""
+    profile_info = analysis.get('profile_info', {})
+    if snapshot.get('posts_count') != profile_info.get('posts_count'):
+        return True
+
+    previous = profile_info.get('followers') or 0
+    current = snapshot.get('followers') or 0
+    if not previous:
+        return current != previous
+    return abs(current - previous) / previous > PROFILE_FOLLOWER_CHANGE_RATIO
+
+class ProfileFreshnessCache:
+    """
+    Frescor das análises salvas
+
+    Classifica a análise mais recente que atende à profundidade pedida em
+    'fresh' (dentro do TTL), 'stale' (servida enquanto um refresh roda em
+    segundo plano) ou 'expired'. Refreshes do mesmo perfil são deduplicados.
+    """
+
+    def __init__(self, max_workers=PROFILE_REFRESH_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self.stats = {
+            'fresh_hits': 0,
+            'stale_hits': 0,
+            'expired': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'revalidated': 0,
+            'recomputed': 0,
+            'refresh_errors': 0
+        }
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # As threads do pool do processo pai não existem no filho
+        self._executor = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def classify(self, entries, analysis_depth, now=None):
+        """
+        Primeira entrada (mais recente primeiro) com profundidade suficiente
+
+        Retorna (entry, estado) ou (None, 'miss'). O TTL é o da profundidade
+        pedida e a idade conta a partir da última revalidação.
+        """
+        level = depth_level(analysis_depth)
+        for entry in entries:
+            if depth_level(entry.get('analysis_depth')) < level:
+                continue
+
+            now = now or datetime.now()
+            checked_at = entry.get('revalidated_at') or entry.get('analyzed_at')
+            try:
+                age = (now - datetime.fromisoformat(checked_at)).total_seconds()
+            except (TypeError, ValueError):
+                continue
+
+            ttl = PROFILE_CACHE_TTL.get(analysis_depth, PROFILE_CACHE_TTL['standard'])
+            if age <= ttl:
+                self.stats['fresh_hits'] += 1
+                return entry, 'fresh'
+            if age <= ttl * PROFILE_CACHE_STALE_FACTOR:
+                self.stats['stale_hits'] += 1
+                return entry, 'stale'
+            self.stats['expired'] += 1
+            return entry, 'expired'
+
+        self.stats['misses'] += 1
+        return None, 'miss'
+
+    def schedule_refresh(self, key, refresh):
+        """Executar refresh() em segundo plano, no máximo um por chave"""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='profile-refresh'
+                )
+            executor = self._executor
+
+        self.stats['refreshes'] += 1
+        executor.submit(self._run_refresh, key, refresh)
+        return True
+
+    def _run_refresh(self, key, refresh):
+        try:
+            refresh()
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.error(f"Erro ao atualizar análise de perfil {key}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def record_outcome(self, revalidated):
+        self.stats['revalidated' if revalidated else 'recomputed'] += 1
+
+    def get_stats(self):
+        """Obter estatísticas do cache de frescor"""
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            **self.stats,
+            'refreshes_in_flight': in_flight,
+            'ttl_seconds': PROFILE_CACHE_TTL
+        }
+
+# Instância global
+profile_cache = ProfileFreshnessCache()
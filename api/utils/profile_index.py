@@ -0,0 +1,283 @@
+"""
+PROFILE INDEX
+Índice em memória das análises de perfis salvas em disco
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from datetime import datetime
+from collections import defaultdict
+
+from .profile_summary import ProfileSummaryTable, summarize_analysis
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre verificações do diretório (mtime) e entre varreduras
+# completas por stat, que detectam arquivos editados no lugar
+PROFILE_INDEX_CHECK_SECONDS = float(os.getenv('PROFILE_INDEX_CHECK_SECONDS', 2))
+PROFILE_INDEX_RESCAN_SECONDS = float(os.getenv('PROFILE_INDEX_RESCAN_SECONDS', 30))
+
+ANALYSIS_FILE_MARKER = '_analysis_'
+
+def username_from_filename(filename):
+    """'<username>_analysis_<timestamp>[_<plataforma>_<sufixo>].json' -> username"""
+    if not filename.endswith('.json') or ANALYSIS_FILE_MARKER not in filename:
+        return None
+    return filename[:-len('.json')].rsplit(ANALYSIS_FILE_MARKER, 1)[0]
+
+class ProfileAnalysisIndex:
+    """
+    Índice das análises de perfis por username, plataforma e recência
+
+    Cada arquivo é lido uma única vez; o índice guarda apenas metadados
+    (username, plataforma, analyzed_at) e o nome do arquivo. Por username os
+    arquivos ficam em lista ordenada pelo nome (o timestamp do nome define a
+    análise mais recente) e a recência global e por plataforma em listas
+    ordenadas por analyzed_at. A análise mais recente de cada perfil
+    (username, plataforma) alimenta a tabela de resumos em `summaries`.
+    Alterações externas no diretório são detectadas pelo mtime do diretório e
+    por uma varredura periódica de stat.
+    """
+
+    def __init__(self, analyses_dir):
+        self.analyses_dir = analyses_dir
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._files = {}
+        self._by_username = defaultdict(list)
+        self._recent = []
+        self._recent_by_platform = defaultdict(list)
+        self.summaries = ProfileSummaryTable()
+        self._loaded = False
+        self._dir_mtime = None
+        self._last_check = 0.0
+        self._last_rescan = 0.0
+        self.stats = {
+            'scans': 0,
+            'files_loaded': 0,
+            'files_removed': 0,
+            'load_errors': 0
+        }
+
+    # ---------------------------------------------
+    # Índices
+    # ---------------------------------------------
+
+    def _index(self, filename, analysis, ctime):
+        username = username_from_filename(filename)
+        entry = {
+            'filename': filename,
+            'username': username,
+            'platform': analysis.get('profile_info', {}).get('platform'),
+            'analyzed_at': analysis.get('analysis_metadata', {}).get('analyzed_at', '') or '',
+            'analysis_depth': analysis.get('analysis_metadata', {}).get('analysis_depth'),
+            'revalidated_at': analysis.get('analysis_metadata', {}).get('revalidated_at'),
+            'file_created': ctime,
+            'summary': dict(summarize_analysis(analysis), username=username)
+        }
+        self._entries[filename] = entry
+        bisect.insort(self._by_username[username], filename)
+        recency = (entry['analyzed_at'], filename)
+        bisect.insort(self._recent, recency)
+        bisect.insort(self._recent_by_platform[entry['platform']], recency)
+        self._update_summary(username, entry['platform'])
+
+    def _unindex(self, filename):
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return None
+
+        self._remove_sorted(self._by_username, entry['username'], filename)
+        recency = (entry['analyzed_at'], filename)
+        position = bisect.bisect_left(self._recent, recency)
+        if position < len(self._recent) and self._recent[position] == recency:
+            del self._recent[position]
+        self._remove_sorted(self._recent_by_platform, entry['platform'], recency)
+        self._update_summary(entry['username'], entry['platform'])
+        return entry
+
+    @staticmethod
+    def profile_key(username, platform):
+        return (username or '', platform or '')
+
+    def _update_summary(self, username, platform):
+        """Apontar o resumo do perfil para a sua análise mais recente"""
+        key = self.profile_key(username, platform)
+        for filename in reversed(self._by_username.get(username, [])):
+            entry = self._entries[filename]
+            if entry['platform'] == platform:
+                self.summaries.upsert(key, dict(entry['summary'], filename=filename))
+                return
+        self.summaries.remove(key)
+
+    @staticmethod
+    def _remove_sorted(index, key, item):
+        items = index.get(key)
+        if items is None:
+            return
+        position = bisect.bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
+        if not items:
+            del index[key]
+
+    # ---------------------------------------------
+    # Sincronização com o diretório
+    # ---------------------------------------------
+
+    def refresh(self, force=False):
+        """Sincronizar com o diretório se o intervalo de verificação expirou"""
+        now = time.monotonic()
+        if self._loaded and not force and now - self._last_check < PROFILE_INDEX_CHECK_SECONDS:
+            return
+
+        with self._lock:
+            self._last_check = now
+            try:
+                dir_mtime = os.stat(self.analyses_dir).st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime = None
+
+            if (self._loaded and not force and dir_mtime == self._dir_mtime
+                    and now - self._last_rescan < PROFILE_INDEX_RESCAN_SECONDS):
+                return
+
+            self._scan()
+            self._dir_mtime = dir_mtime
+            self._last_rescan = now
+            self._loaded = True
+
+    def _scan(self):
+        self.stats['scans'] += 1
+        seen = set()
+
+        try:
+            entries = list(os.scandir(self.analyses_dir))
+        except FileNotFoundError:
+            entries = []
+
+        for entry in entries:
+            if username_from_filename(entry.name) is None or not entry.is_file():
+                continue
+            seen.add(entry.name)
+
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._files.get(entry.name) == signature:
+                continue
+
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    analysis = json.load(f)
+            except Exception as e:
+                self.stats['load_errors'] += 1
+                logger.error(f"Erro ao carregar análise {entry.name}: {e}")
+                continue
+
+            self._unindex(entry.name)
+            self._index(entry.name, analysis, datetime.fromtimestamp(stat.st_ctime).isoformat())
+            self._files[entry.name] = signature
+            self.stats['files_loaded'] += 1
+
+        for filename in list(self._files.keys()):
+            if filename not in seen:
+                del self._files[filename]
+                self._unindex(filename)
+                self.stats['files_removed'] += 1
+
+    def add(self, filename, analysis):
+        """Registrar arquivo recém-gravado sem esperar a próxima varredura"""
+        filepath = os.path.join(self.analyses_dir, filename)
+        stat = os.stat(filepath)
+        with self._lock:
+            self._unindex(filename)
+            self._index(filename, analysis, datetime.fromtimestamp(stat.st_ctime).isoformat())
+            self._files[filename] = (stat.st_mtime_ns, stat.st_size)
+
+    # ---------------------------------------------
+    # Consultas
+    # ---------------------------------------------
+
+    def latest(self, username, platform=None):
+        """
+        Arquivo da análise mais recente do username
+
+        Com platform, prefere a análise mais recente daquela plataforma e, se
+        não houver, devolve a mais recente do username (comportamento anterior
+        da busca por prefixo).
+        """
+        self.refresh()
+        with self._lock:
+            filenames = self._by_username.get(username)
+            if not filenames:
+                return None
+
+            if platform:
+                for filename in reversed(filenames):
+                    if self._entries[filename]['platform'] == platform:
+                        return self._entries[filename]
+            return self._entries[filenames[-1]]
+
+    def history(self, username, platform=None):
+        """Entradas do username da mais recente para a mais antiga"""
+        self.refresh()
+        with self._lock:
+            filenames = list(self._by_username.get(username, []))
+            entries = [self._entries[filename] for filename in reversed(filenames)]
+        return [entry for entry in entries if not platform or entry['platform'] == platform]
+
+    def recent(self, platform=None, limit=50):
+        """Entradas mais recentes por analyzed_at, opcionalmente de uma plataforma"""
+        self.refresh()
+        with self._lock:
+            ordered = self._recent_by_platform.get(platform, []) if platform else self._recent
+            return [self._entries[filename] for _, filename in ordered[:-limit - 1:-1]] if limit > 0 else []
+
+    def trending(self, platform=None, min_followers=0, min_viral_rate=0.0, limit=20):
+        """Resumos ordenados por trending_score: (resumos, total encontrado)"""
+        self.refresh()
+        return self.summaries.trending(platform, min_followers, min_viral_rate, limit)
+
+    def summary_stats(self, platform=None, top_limit=5):
+        """
+        Estatísticas agregadas dos perfis e arquivos dos top performers
+
+        Retorna (agregados, {métrica: [arquivos]}) ou (None, {}) sem perfis.
+        """
+        self.refresh()
+        with self._lock:
+            aggregates = self.summaries.aggregate(platform)
+            if aggregates is None:
+                return None, {}
+
+            top_files = {}
+            for metric, column in (('by_followers', 'followers'),
+                                   ('by_engagement', 'engagement_rate'),
+                                   ('by_viral_rate', 'viral_rate')):
+                top_files[metric] = [
+                    self.summaries.get(key)['filename']
+                    for key in self.summaries.top_keys(column, top_limit, platform)
+                ]
+            return aggregates, top_files
+
+    def count(self, platform=None):
+        self.refresh()
+        with self._lock:
+            return len(self._recent_by_platform.get(platform, [])) if platform else len(self._entries)
+
+    def get_stats(self):
+        """Obter estatísticas do índice"""
+        return {
+            **self.stats,
+            'analyses': len(self._entries),
+            'usernames': len(self._by_username),
+            'platforms': len(self._recent_by_platform),
+            'summaries': self.summaries.get_stats()
+        }
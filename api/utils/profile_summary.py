@@ -0,0 +1,262 @@
+"""
+PROFILE SUMMARY
+Tabela colunar de resumos por perfil para estatísticas e ranking de trending
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import bisect
+import threading
+
+import numpy as np
+
+# Faixas usadas por /profiles/stats: (rótulos, limites inferiores)
+FOLLOWER_RANGES = (['0-1K', '1K-10K', '10K-100K', '100K-1M', '1M+'], [0, 1000, 10000, 100000, 1000000])
+ENGAGEMENT_RANGES = (['0-2%', '2-5%', '5-10%', '10-20%', '20%+'], [0, 2, 5, 10, 20])
+VIRAL_RATE_RANGES = (['0-10%', '10-25%', '25-50%', '50-75%', '75%+'], [0, 10, 25, 50, 75])
+
+NUMERIC_COLUMNS = ('followers', 'engagement_rate', 'viral_rate', 'posts_analyzed', 'trending_score')
+
+def parse_rate(value):
+    """'46.0%' ou 46.0 -> 46.0"""
+    if isinstance(value, str):
+        value = value.replace('%', '').strip() or 0
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def calculate_trending_score(analysis):
+    """Calcular score de trending baseado em múltiplos fatores"""
+    score = 50  # Base
+
+    profile_info = analysis.get('profile_info', {})
+    content_analysis = analysis.get('content_analysis', {})
+
+    # Fator de engajamento
+    engagement_rate = parse_rate(content_analysis.get('avg_engagement_rate', 0))
+    if engagement_rate > 10:
+        score += 25
+    elif engagement_rate > 5:
+        score += 15
+    elif engagement_rate > 3:
+        score += 10
+
+    # Fator de viralização
+    viral_rate = parse_rate(content_analysis.get('viral_rate', '0%'))
+    if viral_rate > 40:
+        score += 20
+    elif viral_rate > 25:
+        score += 15
+    elif viral_rate > 15:
+        score += 10
+
+    # Fator de verificação
+    if profile_info.get('is_verified'):
+        score += 10
+
+    # Fator de crescimento
+    growth_indicators = profile_info.get('growth_indicators', [])
+    score += len(growth_indicators) * 5
+
+    return min(score, 100)
+
+def summarize_analysis(analysis):
+    """Resumo compacto de uma análise (o que stats e trending precisam)"""
+    profile_info = analysis.get('profile_info', {})
+    content_analysis = analysis.get('content_analysis', {})
+    return {
+        'username': profile_info.get('username'),
+        'platform': profile_info.get('platform'),
+        'account_type': profile_info.get('account_type', 'unknown'),
+        'followers': profile_info.get('followers', 0) or 0,
+        'engagement_rate': parse_rate(content_analysis.get('avg_engagement_rate', 0)),
+        'viral_rate': parse_rate(content_analysis.get('viral_rate', '0%')),
+        'posts_analyzed': content_analysis.get('total_posts', 0) or 0,
+        'growth_indicators': profile_info.get('growth_indicators', []),
+        'trending_score': calculate_trending_score(analysis),
+        'last_analyzed': analysis.get('analysis_metadata', {}).get('analyzed_at')
+    }
+
+def _range_counts(values, ranges):
+    labels, bounds = ranges
+    # Valores negativos (dados inválidos) caem na primeira faixa
+    positions = np.clip(np.searchsorted(bounds, values, side='right') - 1, 0, None)
+    counts = np.bincount(positions, minlength=len(labels))
+    return {label: int(count) for label, count in zip(labels, counts)}
+
+class ProfileSummaryTable:
+    """
+    Um resumo por perfil (username, plataforma) em colunas numpy
+
+    Linhas são reaproveitadas após remoções; plataforma e tipo de conta são
+    guardados como códigos inteiros para filtros e contagens vetorizados.
+    Uma lista ordenada por trending_score atende o ranking sem ordenar a
+    tabela a cada consulta.
+    """
+
+    def __init__(self, capacity=64):
+        self._columns = {name: np.zeros(capacity, dtype=np.float64) for name in NUMERIC_COLUMNS}
+        self._platform_codes = np.full(capacity, -1, dtype=np.int32)
+        self._account_codes = np.full(capacity, -1, dtype=np.int32)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._rows = {}
+        self._row_keys = [None] * capacity
+        self._summaries = [None] * capacity
+        self._free_rows = []
+        self._next_row = 0
+        self._platforms = {}
+        self._account_types = {}
+        self._by_trending = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @staticmethod
+    def _code(codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def _allocate_row(self):
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        capacity = len(self._valid)
+        if self._next_row == capacity:
+            for name, column in self._columns.items():
+                self._columns[name] = np.concatenate([column, np.zeros(capacity, dtype=np.float64)])
+            self._platform_codes = np.concatenate([self._platform_codes, np.full(capacity, -1, dtype=np.int32)])
+            self._account_codes = np.concatenate([self._account_codes, np.full(capacity, -1, dtype=np.int32)])
+            self._valid = np.concatenate([self._valid, np.zeros(capacity, dtype=bool)])
+            self._row_keys.extend([None] * capacity)
+            self._summaries.extend([None] * capacity)
+
+        row = self._next_row
+        self._next_row += 1
+        return row
+
+    def upsert(self, key, summary):
+        """Inserir ou substituir o resumo do perfil"""
+        with self._lock:
+            self.remove(key)
+            row = self._allocate_row()
+            for name in NUMERIC_COLUMNS:
+                self._columns[name][row] = summary[name]
+            self._platform_codes[row] = self._code(self._platforms, summary['platform'])
+            self._account_codes[row] = self._code(self._account_types, summary['account_type'])
+            self._valid[row] = True
+            self._rows[key] = row
+            self._row_keys[row] = key
+            self._summaries[row] = summary
+            bisect.insort(self._by_trending, (-summary['trending_score'], key))
+
+    def remove(self, key):
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            entry = (-self._summaries[row]['trending_score'], key)
+            position = bisect.bisect_left(self._by_trending, entry)
+            if position < len(self._by_trending) and self._by_trending[position] == entry:
+                del self._by_trending[position]
+            self._valid[row] = False
+            self._row_keys[row] = None
+            self._summaries[row] = None
+            self._free_rows.append(row)
+
+    def get(self, key):
+        with self._lock:
+            row = self._rows.get(key)
+            return None if row is None else self._summaries[row]
+
+    def _mask(self, platform=None):
+        mask = self._valid[:self._next_row].copy()
+        if platform:
+            code = self._platforms.get(platform)
+            if code is None:
+                return np.zeros_like(mask)
+            mask &= self._platform_codes[:self._next_row] == code
+        return mask
+
+    def trending(self, platform=None, min_followers=0, min_viral_rate=0.0, limit=20):
+        """
+        Perfis acima dos pisos ordenados por trending_score
+
+        Retorna (resumos, total que passa nos filtros).
+        """
+        with self._lock:
+            mask = self._mask(platform)
+            mask &= self._columns['followers'][:self._next_row] >= min_followers
+            mask &= self._columns['viral_rate'][:self._next_row] >= min_viral_rate
+            total = int(mask.sum())
+
+            results = []
+            if total:
+                for _, key in self._by_trending:
+                    if mask[self._rows[key]]:
+                        results.append(self._summaries[self._rows[key]])
+                        if len(results) >= limit:
+                            break
+            return results, total
+
+    def top_keys(self, column, count, platform=None):
+        """Chaves dos `count` perfis com maior valor na coluna"""
+        with self._lock:
+            rows = np.flatnonzero(self._mask(platform))
+            if not len(rows):
+                return []
+            values = self._columns[column][rows]
+            count = min(count, len(rows))
+            top = np.argpartition(-values, count - 1)[:count]
+            top = top[np.argsort(-values[top], kind='stable')]
+            return [self._row_keys[rows[index]] for index in top]
+
+    def aggregate(self, platform=None):
+        """Contagens, faixas e médias em uma única passada vetorizada"""
+        with self._lock:
+            rows = np.flatnonzero(self._mask(platform))
+            total = len(rows)
+            if not total:
+                return None
+
+            followers = self._columns['followers'][rows]
+            engagement = self._columns['engagement_rate'][rows]
+            viral_rate = self._columns['viral_rate'][rows]
+            posts = self._columns['posts_analyzed'][rows]
+
+            platform_names = {code: name for name, code in self._platforms.items()}
+            account_names = {code: name for name, code in self._account_types.items()}
+            platform_counts = np.bincount(self._platform_codes[rows], minlength=len(platform_names))
+            account_counts = np.bincount(self._account_codes[rows], minlength=len(account_names))
+
+            return {
+                'total_profiles': total,
+                'platforms': {
+                    platform_names[code] or 'unknown': int(count)
+                    for code, count in enumerate(platform_counts) if count
+                },
+                'account_types': {
+                    account_names[code] or 'unknown': int(count)
+                    for code, count in enumerate(account_counts) if count
+                },
+                'follower_ranges': _range_counts(followers, FOLLOWER_RANGES),
+                'engagement_ranges': _range_counts(engagement, ENGAGEMENT_RANGES),
+                'viral_rate_ranges': _range_counts(viral_rate, VIRAL_RATE_RANGES),
+                'averages': {
+                    'followers': int(followers.mean()),
+                    'engagement_rate': round(float(engagement.mean()), 2),
+                    'viral_rate': round(float(viral_rate.mean()), 2),
+                    'posts_analyzed': int(posts.mean())
+                }
+            }
+
+    def get_stats(self):
+        return {
+            'profiles': len(self._rows),
+            'capacity': len(self._valid),
+            'platforms': len(self._platforms)
+        }
@@ -0,0 +1,175 @@
+"""
+QUERY BUILDER
+Statements SQL canônicos e cache de prepared statements por conexão
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import re
+import time
+import weakref
+import logging
+from collections import OrderedDict
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros nomeados no formato :nome (ignora casts do tipo ::text)
+PARAM_PATTERN = re.compile(r'(?<!:):([a-z_][a-z0-9_]*)')
+
+DEFAULT_MAX_STATEMENTS_PER_CONNECTION = 128
+
+class CanonicalQuery:
+    """
+    Statement com texto SQL fixo e ordem de parâmetros fixa
+
+    O template usa parâmetros nomeados (:platform) que são convertidos uma única
+    vez para placeholders posicionais ($1, $2...). Filtros opcionais devem ser
+    escritos com guardas do tipo (:platform::text IS NULL OR sc.platform = :platform),
+    de forma que todas as combinações de filtros compartilhem o mesmo texto e,
+    portanto, o mesmo prepared statement.
+    """
+
+    def __init__(self, name, template):
+        self.name = name
+        self.param_names = []
+        positions = {}
+
+        def _replace(match):
+            param = match.group(1)
+            if param not in positions:
+                self.param_names.append(param)
+                positions[param] = len(self.param_names)
+            return f"${positions[param]}"
+
+        self.sql = PARAM_PATTERN.sub(_replace, template)
+
+    def bind(self, **values):
+        """Converter valores nomeados para a lista posicional do statement"""
+        missing = [name for name in self.param_names if name not in values]
+        if missing:
+            raise KeyError(f"Parâmetros ausentes para {self.name}: {', '.join(missing)}")
+        return [values[name] for name in self.param_names]
+
+    def __repr__(self):
+        return f"<CanonicalQuery {self.name} params={self.param_names}>"
+
+def eq_guard(column, param, cast='text'):
+    """Filtro opcional de igualdade que mantém o texto SQL constante"""
+    return f"(:{param}::{cast} IS NULL OR {column} = :{param})"
+
+class StatementCache:
+    """
+    Cache de prepared statements por conexão física
+
+    Cada statement canônico é preparado uma vez por conexão e reutilizado pelas
+    requisições seguintes, evitando o parse/plan repetido de textos quase
+    idênticos. Mantém estatísticas de acerto para monitoramento.
+    """
+
+    def __init__(self, max_per_connection=DEFAULT_MAX_STATEMENTS_PER_CONNECTION):
+        self.max_per_connection = max_per_connection
+        self._statements = weakref.WeakKeyDictionary()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'prepare_time_ms': 0.0
+        }
+        self.query_stats = {}
+
+    @staticmethod
+    def _raw_connection(conn):
+        # pool.acquire() devolve um PoolConnectionProxy novo a cada uso;
+        # o cache precisa ser indexado pela conexão física subjacente.
+        return getattr(conn, '_con', None) or conn
+
+    def _record(self, query, hit):
+        entry = self.query_stats.setdefault(query.name, {'hits': 0, 'misses': 0})
+        entry['hits' if hit else 'misses'] += 1
+        self.stats['hits' if hit else 'misses'] += 1
+
+    async def prepare(self, conn, query):
+        """Obter prepared statement da conexão, preparando-o se necessário"""
+        raw_conn = self._raw_connection(conn)
+        statements = self._statements.get(raw_conn)
+        if statements is None:
+            statements = OrderedDict()
+            self._statements[raw_conn] = statements
+
+        statement = statements.get(query.sql)
+        if statement is not None:
+            statements.move_to_end(query.sql)
+            self._record(query, hit=True)
+            return statement
+
+        self._record(query, hit=False)
+        start_time = time.perf_counter()
+        statement = await conn.prepare(query.sql)
+        self.stats['prepare_time_ms'] += (time.perf_counter() - start_time) * 1000
+
+        statements[query.sql] = statement
+        if len(statements) > self.max_per_connection:
+            statements.popitem(last=False)
+            self.stats['evictions'] += 1
+
+        return statement
+
+    def _invalidate(self, conn, query):
+        statements = self._statements.get(self._raw_connection(conn))
+        if statements is not None:
+            statements.pop(query.sql, None)
+        self.stats['invalidations'] += 1
+
+    async def _execute(self, method, conn, query, params):
+        args = query.bind(**params)
+        statement = await self.prepare(conn, query)
+        try:
+            return await getattr(statement, method)(*args)
+        except asyncpg.exceptions.InvalidCachedStatementError:
+            # Schema alterado (ex.: migration): preparar novamente uma vez
+            logger.warning(f"Statement {query.name} invalidado, preparando novamente")
+            self._invalidate(conn, query)
+            statement = await self.prepare(conn, query)
+            return await getattr(statement, method)(*args)
+
+    async def fetch(self, conn, query, **params):
+        return await self._execute('fetch', conn, query, params)
+
+    async def fetchrow(self, conn, query, **params):
+        return await self._execute('fetchrow', conn, query, params)
+
+    async def fetchval(self, conn, query, **params):
+        return await self._execute('fetchval', conn, query, params)
+
+    def get_stats(self):
+        """Obter estatísticas do cache de statements"""
+        total = self.stats['hits'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] / total) * 100 if total > 0 else 0
+
+        per_query = {}
+        for name, entry in self.query_stats.items():
+            query_total = entry['hits'] + entry['misses']
+            per_query[name] = {
+                'hits': entry['hits'],
+                'misses': entry['misses'],
+                'hit_rate': round((entry['hits'] / query_total) * 100, 2) if query_total > 0 else 0
+            }
+
+        return {
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'evictions': self.stats['evictions'],
+            'invalidations': self.stats['invalidations'],
+            'prepare_time_ms': round(self.stats['prepare_time_ms'], 2),
+            'hit_rate': round(hit_rate, 2),
+            'connections': len(self._statements),
+            'statements': sum(len(s) for s in self._statements.values()),
+            'queries': per_query
+        }
+
+# Instância global do cache de statements
+statement_cache = StatementCache()
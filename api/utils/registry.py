@@ -0,0 +1,146 @@
+"""
+LAZY REGISTRY
+Construção sob demanda de componentes pesados (analisadores, coordenadores)
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Registries criados no processo, para estatísticas agregadas
+_registries = []
+
+class LazyRegistry:
+    """
+    Registro de fábricas com instanciação no primeiro uso
+
+    Cada componente é construído apenas quando solicitado pela primeira vez no
+    processo (worker). Após um fork as instâncias herdadas do processo pai são
+    descartadas, evitando compartilhar threads, sockets ou locks entre workers.
+    O tempo de construção de cada componente é registrado.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._factories = {}
+        self._instances = {}
+        self._errors = {}
+        self._lock = threading.RLock()
+        self.construction_times_ms = {}
+        self._prewarm_started = False
+        _registries.append(self)
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def register(self, key, factory):
+        """Registrar fábrica (callable sem argumentos) para a chave"""
+        self._factories[key] = factory
+
+    def get(self, key):
+        """Obter instância, construindo-a no primeiro uso"""
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                return instance
+
+            if key not in self._factories:
+                raise KeyError(f"Componente não registrado em {self.name}: {key}")
+
+            start_time = time.perf_counter()
+            try:
+                instance = self._factories[key]()
+            except Exception as e:
+                self._errors[key] = str(e)
+                logger.error(f"Erro ao inicializar {self.name}.{key}: {e}")
+                raise
+
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            self.construction_times_ms[key] = round(elapsed_ms, 2)
+            self._errors.pop(key, None)
+            self._instances[key] = instance
+            logger.info(f"{self.name}.{key} inicializado em {elapsed_ms:.1f}ms")
+            return instance
+
+    def is_initialized(self, key):
+        return key in self._instances
+
+    def prewarm(self, keys=None):
+        """
+        Construir antecipadamente os componentes indicados (todos por padrão)
+
+        Falhas são registradas e não interrompem os demais componentes.
+        """
+        for key in keys or list(self._factories.keys()):
+            try:
+                self.get(key)
+            except Exception:
+                continue
+        return dict(self.construction_times_ms)
+
+    def prewarm_in_background(self, keys=None):
+        """Pre-warm em uma thread daemon, sem bloquear a inicialização do worker"""
+        thread = threading.Thread(
+            target=self.prewarm, args=(keys,), name=f"{self.name}-prewarm", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def prewarm_once(self, keys=None):
+        """
+        Pre-warm em segundo plano, uma vez por processo
+
+        Chamar a partir do worker (ex.: antes da primeira requisição), nunca
+        no import: com gunicorn --preload o import acontece no processo mestre
+        e as instâncias herdadas são descartadas no fork.
+        """
+        if self._prewarm_started:
+            return None
+        with self._lock:
+            if self._prewarm_started:
+                return None
+            self._prewarm_started = True
+        return self.prewarm_in_background(keys)
+
+    def _reset_after_fork(self):
+        self._lock = threading.RLock()
+        self._prewarm_started = False
+        self._instances = {}
+        self._errors = {}
+        self.construction_times_ms = {}
+
+    def get_stats(self):
+        """Obter estado e tempos de construção dos componentes"""
+        return {
+            'registered': sorted(self._factories.keys()),
+            'initialized': sorted(self._instances.keys()),
+            'construction_times_ms': dict(self.construction_times_ms),
+            'errors': dict(self._errors)
+        }
+
+def prewarm_keys_from_env(variable):
+    """
+    Ler lista de componentes para pre-warm de uma variável de ambiente
+
+    'all' retorna None (todos os componentes); vazio retorna lista vazia.
+    """
+    value = os.getenv(variable, '').strip()
+    if not value:
+        return []
+    if value == 'all':
+        return None
+    return [key.strip() for key in value.split(',') if key.strip()]
+
+def get_registry_stats():
+    """Estatísticas de todos os registries do processo"""
+    return {registry.name: registry.get_stats() for registry in _registries}
@@ -0,0 +1,432 @@
+"""
+TEMPLATE CATALOG
+Catálogo em memória dos templates com índices secundários
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+from .text_index import InvertedIndex
+from .vector_index import HashingVectorizer, VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre verificações de alterações no store
+TEMPLATE_CATALOG_CHECK_SECONDS = float(os.getenv('TEMPLATE_CATALOG_CHECK_SECONDS', 2))
+
+def viral_score_of(template):
+    return template.get('viral_score') or 0
+
+def template_platform(template):
+    return template.get('extraction_metadata', {}).get('source_platform')
+
+TEMPLATE_SORT_KEYS = {
+    'viral_score': viral_score_of,
+    'created_at': lambda template: template.get('extraction_metadata', {}).get('extracted_at', ''),
+    'template_quality_score': lambda template: template.get('template_quality_score', 0)
+}
+
+# Similaridade de cosseno a partir da qual um template é considerado duplicado
+TEMPLATE_DUPLICATE_THRESHOLD = float(os.getenv('TEMPLATE_DUPLICATE_THRESHOLD', 0.95))
+
+# Campos indexados para busca textual e seus pesos
+SEARCH_FIELD_WEIGHTS = {
+    'template_name': 3,
+    'search_tags': 2,
+    'content_type': 1,
+    'structure': 1
+}
+
+# Blocos do template cujo texto descreve sua estrutura
+STRUCTURE_KEYS = ('visual_structure', 'content_formula', 'adapted_structure')
+
+def _text_leaves(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _text_leaves(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _text_leaves(item)
+    elif isinstance(value, str) and not value.startswith('#'):
+        # Cores hexadecimais e afins não são texto pesquisável
+        yield value
+
+def template_search_fields(template):
+    """Campos (texto, peso) usados pelo índice invertido"""
+    structure = ' '.join(
+        text for key in STRUCTURE_KEYS for text in _text_leaves(template.get(key))
+    )
+    return [
+        (template.get('template_name') or '', SEARCH_FIELD_WEIGHTS['template_name']),
+        (' '.join(template.get('search_tags', []) or []), SEARCH_FIELD_WEIGHTS['search_tags']),
+        (template.get('content_type') or '', SEARCH_FIELD_WEIGHTS['content_type']),
+        (structure, SEARCH_FIELD_WEIGHTS['structure'])
+    ]
+
+# Rótulo usado nas estatísticas para templates sem tipo ou plataforma
+UNKNOWN_GROUP = 'unknown'
+
+class ScoreAggregate:
+    """
+    Contagem, soma, mínimo e máximo de viral_score de um grupo
+
+    Os scores ficam em lista ordenada para que remoções mantenham mínimo e
+    máximo exatos sem recalcular o grupo.
+    """
+
+    __slots__ = ('count', 'total', '_scores')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._scores = []
+
+    def add(self, score):
+        self.count += 1
+        self.total += score
+        bisect.insort(self._scores, score)
+
+    def remove(self, score):
+        position = bisect.bisect_left(self._scores, score)
+        if position < len(self._scores) and self._scores[position] == score:
+            del self._scores[position]
+            self.count -= 1
+            self.total -= score
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_viral_score': round(self.total / self.count, 2) if self.count else 0,
+            'min_viral_score': self._scores[0] if self._scores else None,
+            'max_viral_score': self._scores[-1] if self._scores else None
+        }
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, (list, tuple, set)) else [value]
+
+class TemplateCatalog:
+    """
+    Catálogo de templates carregado uma única vez
+
+    Mantém os templates em memória com índices por content_type, plataforma de
+    origem e search_tags, além de uma lista ordenada por viral_score. Escritas
+    feitas pelo catálogo vão para o store (diretório ou SQLite, ver
+    template_store) e atualizam os índices diretamente; alterações externas
+    são obtidas do store de forma incremental.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._templates = {}
+        self._by_content_type = defaultdict(set)
+        self._by_platform = defaultdict(set)
+        self._by_tag = defaultdict(set)
+        self._viral = []
+        self._viral_total = 0.0
+        self._content_type_stats = defaultdict(ScoreAggregate)
+        self._platform_stats = defaultdict(ScoreAggregate)
+        self.text_index = InvertedIndex()
+        self.vectorizer = HashingVectorizer()
+        self.vector_index = VectorIndex()
+        self._loaded = False
+        self._last_check = 0.0
+        self.stats = {
+            'scans': 0,
+            'files_loaded': 0,
+            'files_removed': 0,
+            'load_errors': 0
+        }
+
+    # ---------------------------------------------
+    # Índices
+    # ---------------------------------------------
+
+    def _index(self, template_id, template):
+        self._templates[template_id] = template
+        self._by_content_type[template.get('content_type')].add(template_id)
+        self._by_platform[template_platform(template)].add(template_id)
+        for tag in template.get('search_tags', []) or []:
+            self._by_tag[tag].add(template_id)
+        score = viral_score_of(template)
+        bisect.insort(self._viral, (score, template_id))
+        self._viral_total += score
+        self._content_type_stats[template.get('content_type') or UNKNOWN_GROUP].add(score)
+        self._platform_stats[template_platform(template) or UNKNOWN_GROUP].add(score)
+        fields = template_search_fields(template)
+        self.text_index.add(template_id, fields)
+        self.vector_index.add(template_id, self.vectorizer.transform(fields))
+
+    def _unindex(self, template_id):
+        template = self._templates.pop(template_id, None)
+        if template is None:
+            return None
+
+        self.text_index.remove(template_id)
+        self.vector_index.remove(template_id)
+        self._discard(self._by_content_type, template.get('content_type'), template_id)
+        self._discard(self._by_platform, template_platform(template), template_id)
+        for tag in template.get('search_tags', []) or []:
+            self._discard(self._by_tag, tag, template_id)
+
+        score = viral_score_of(template)
+        entry = (score, template_id)
+        position = bisect.bisect_left(self._viral, entry)
+        if position < len(self._viral) and self._viral[position] == entry:
+            del self._viral[position]
+            self._viral_total -= score
+        self._discard_score(self._content_type_stats, template.get('content_type') or UNKNOWN_GROUP, score)
+        self._discard_score(self._platform_stats, template_platform(template) or UNKNOWN_GROUP, score)
+        return template
+
+    @staticmethod
+    def _discard_score(groups, key, score):
+        aggregate = groups.get(key)
+        if aggregate is not None:
+            aggregate.remove(score)
+            if not aggregate.count:
+                del groups[key]
+
+    @staticmethod
+    def _discard(index, key, template_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(template_id)
+            if not ids:
+                del index[key]
+
+    # ---------------------------------------------
+    # Sincronização com o store
+    # ---------------------------------------------
+
+    def refresh(self, force=False):
+        """Sincronizar com o store se o intervalo de verificação expirou"""
+        now = time.monotonic()
+        if self._loaded and not force and now - self._last_check < TEMPLATE_CATALOG_CHECK_SECONDS:
+            return
+
+        with self._lock:
+            self._last_check = now
+            if self._loaded and not force and not self.store.has_changes():
+                return
+
+            self._sync()
+            self._loaded = True
+
+    def _sync(self):
+        self.stats['scans'] += 1
+        changed, removed = self.store.load_changes()
+
+        for template_id, template in changed:
+            self._unindex(template_id)
+            self._index(template_id, template)
+            self.stats['files_loaded'] += 1
+
+        for template_id in removed:
+            if self._unindex(template_id) is not None:
+                self.stats['files_removed'] += 1
+
+    # ---------------------------------------------
+    # Leitura e escrita
+    # ---------------------------------------------
+
+    def get(self, template_id):
+        self.refresh()
+        return self._templates.get(template_id)
+
+    def put(self, template_id, template):
+        """Gravar template (escrita atômica no store) e atualizar os índices"""
+        self.refresh()
+        with self._lock:
+            self.store.put(template_id, template)
+            self._unindex(template_id)
+            self._index(template_id, template)
+
+    def delete(self, template_id):
+        """Remover template; retorna False se não existir"""
+        self.refresh()
+        with self._lock:
+            if not self.store.delete(template_id):
+                return False
+            self._unindex(template_id)
+            return True
+
+    def __len__(self):
+        self.refresh()
+        return len(self._templates)
+
+    # ---------------------------------------------
+    # Consultas
+    # ---------------------------------------------
+
+    def _union(self, index, keys):
+        ids = set()
+        for key in keys:
+            ids |= index.get(key, set())
+        return ids
+
+    def candidate_ids(self, filters=None):
+        """
+        Ids que satisfazem os filtros (None quando não há filtro de índice)
+
+        Aceita as chaves usadas pelas rotas: content_type/content_types,
+        platform/platforms e search_tags/niches (qualquer tag). Listas são
+        combinadas por união e filtros diferentes por interseção.
+        """
+        filters = filters or {}
+        candidates = None
+
+        for keys, index in (
+            (_as_list(filters.get('content_type')) + _as_list(filters.get('content_types')), self._by_content_type),
+            (_as_list(filters.get('platform')) + _as_list(filters.get('platforms')), self._by_platform),
+            (_as_list(filters.get('search_tags')) + _as_list(filters.get('niches')), self._by_tag)
+        ):
+            if not keys:
+                continue
+            ids = self._union(index, keys)
+            candidates = ids if candidates is None else candidates & ids
+
+        return candidates
+
+    def query(self, filters=None, sort_by=None, sort_order='desc'):
+        """Templates que satisfazem os filtros, opcionalmente ordenados"""
+        self.refresh()
+        filters = filters or {}
+        min_viral_score = filters.get('min_viral_score')
+        reverse = sort_order == 'desc'
+
+        with self._lock:
+            candidates = self.candidate_ids(filters)
+
+            # Poucos candidatos: ordená-los sai mais barato que percorrer a lista
+            few_candidates = candidates is not None and len(candidates) * 8 < len(self._viral)
+
+            if not few_candidates and (sort_by == 'viral_score' or (min_viral_score and candidates is None)):
+                # A lista ordenada resolve o piso de viral_score por bisect
+                start = bisect.bisect_left(self._viral, (min_viral_score,)) if min_viral_score else 0
+                ordered = self._viral[start:]
+                if reverse and sort_by == 'viral_score':
+                    ordered = reversed(ordered)
+                ids = [template_id for _, template_id in ordered
+                       if candidates is None or template_id in candidates]
+            elif candidates is None:
+                ids = list(self._templates.keys())
+            else:
+                ids = [template_id for template_id in candidates
+                       if not min_viral_score or viral_score_of(self._templates[template_id]) >= min_viral_score]
+                if sort_by == 'viral_score':
+                    ids.sort(key=lambda template_id: viral_score_of(self._templates[template_id]), reverse=reverse)
+
+            templates = [self._templates[template_id] for template_id in ids]
+
+        if sort_by in TEMPLATE_SORT_KEYS and sort_by != 'viral_score':
+            templates.sort(key=TEMPLATE_SORT_KEYS[sort_by], reverse=reverse)
+
+        return templates
+
+    def search(self, query, filters=None, limit=None):
+        """
+        Busca textual ranqueada por BM25 dentro dos filtros
+
+        Retorna ([(template, score)] por relevância, total encontrado).
+        """
+        self.refresh()
+        filters = filters or {}
+        min_viral_score = filters.get('min_viral_score')
+
+        with self._lock:
+            candidates = self.candidate_ids(filters)
+
+            def accept(template_id):
+                if candidates is not None and template_id not in candidates:
+                    return False
+                return not min_viral_score or viral_score_of(self._templates[template_id]) >= min_viral_score
+
+            ranked, total = self.text_index.search(
+                query, accept if candidates is not None or min_viral_score else None, limit
+            )
+            return [(self._templates[template_id], score) for template_id, score in ranked], total
+
+    def similar(self, template_id, limit=10, min_similarity=0.0):
+        """Templates mais parecidos com o informado: [(template, similaridade)]"""
+        self.refresh()
+        with self._lock:
+            vector = self.vector_index.get_vector(template_id)
+            if vector is None:
+                return None
+            hits = self.vector_index.search(vector, limit, exclude=template_id)
+            return [
+                (self._templates[hit_id], similarity)
+                for hit_id, similarity in hits if similarity >= min_similarity
+            ]
+
+    def find_duplicate(self, template, threshold=TEMPLATE_DUPLICATE_THRESHOLD, exclude_id=None):
+        """Template já catalogado quase idêntico ao informado: (id, similaridade) ou None"""
+        self.refresh()
+        vector = self.vectorizer.transform(template_search_fields(template))
+        with self._lock:
+            for hit_id, similarity in self.vector_index.search(vector, 1, exclude=exclude_id, exact=True):
+                if similarity >= threshold:
+                    return hit_id, similarity
+        return None
+
+    def summary(self, top_limit=5, high_performance_threshold=80):
+        """
+        Estatísticas de viral_score mantidas incrementalmente
+
+        Totais e grupos vêm dos agregados atualizados em cada inserção e
+        remoção; mínimo, máximo, top performers e contagem de alta
+        performance vêm da lista ordenada por viral_score.
+        """
+        self.refresh()
+        with self._lock:
+            total = len(self._viral)
+            if not total:
+                return None
+
+            high_performance = total - bisect.bisect_left(self._viral, (high_performance_threshold,))
+            return {
+                'total_templates': total,
+                'viral_score_stats': {
+                    'average': round(self._viral_total / total, 2),
+                    'maximum': self._viral[-1][0],
+                    'minimum': self._viral[0][0],
+                    'high_performance_count': high_performance,
+                    'high_performance_rate': round((high_performance / total) * 100, 2)
+                },
+                'content_type_breakdown': {
+                    content_type: aggregate.to_dict()
+                    for content_type, aggregate in self._content_type_stats.items()
+                },
+                'platform_breakdown': {
+                    platform: aggregate.count for platform, aggregate in self._platform_stats.items()
+                },
+                'platform_score_breakdown': {
+                    platform: aggregate.to_dict() for platform, aggregate in self._platform_stats.items()
+                },
+                'top_performers': [
+                    self._templates[template_id] for _, template_id in self._viral[:-top_limit - 1:-1]
+                ]
+            }
+
+    def get_stats(self):
+        """Obter estatísticas do catálogo"""
+        return {
+            **self.stats,
+            'backend': self.store.backend,
+            'templates': len(self._templates),
+            'content_types': len(self._by_content_type),
+            'platforms': len(self._by_platform),
+            'tags': len(self._by_tag),
+            'search_index': self.text_index.get_stats(),
+            'vector_index': self.vector_index.get_stats()
+        }
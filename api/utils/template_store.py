@@ -0,0 +1,401 @@
+"""
+TEMPLATE STORE
+Backends de armazenamento de templates (diretório JSON ou SQLite/JSON1)
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Backend usado pelo TemplateManager: 'directory' (um JSON por template) ou 'sqlite'
+TEMPLATE_STORE_BACKEND = os.getenv('TEMPLATE_STORE_BACKEND', 'directory')
+TEMPLATE_STORE_PATH = os.getenv('TEMPLATE_STORE_PATH')
+
+# Varredura completa por stat no backend de diretório, que detecta arquivos
+# editados no lugar (o mtime do diretório só muda ao criar/remover arquivos)
+DIRECTORY_RESCAN_SECONDS = float(os.getenv('TEMPLATE_CATALOG_RESCAN_SECONDS', 30))
+
+MIGRATION_BATCH_SIZE = 500
+
+class DirectoryTemplateStore:
+    """
+    Um arquivo JSON por template em um diretório
+
+    Alterações externas são detectadas pelo mtime do diretório e por uma
+    varredura periódica de stat; apenas arquivos com mtime/tamanho diferentes
+    são relidos.
+    """
+
+    backend = 'directory'
+
+    def __init__(self, templates_dir):
+        self.templates_dir = templates_dir
+        self._files = {}
+        self._dir_mtime = None
+        self._last_rescan = 0.0
+        os.makedirs(templates_dir, exist_ok=True)
+
+    def _filepath(self, template_id):
+        return os.path.join(self.templates_dir, f"{template_id}.json")
+
+    def _current_dir_mtime(self):
+        try:
+            return os.stat(self.templates_dir).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def has_changes(self):
+        return (self._current_dir_mtime() != self._dir_mtime
+                or time.monotonic() - self._last_rescan >= DIRECTORY_RESCAN_SECONDS)
+
+    def load_changes(self):
+        """Templates alterados e ids removidos desde a última chamada"""
+        self._dir_mtime = self._current_dir_mtime()
+        self._last_rescan = time.monotonic()
+        changed = []
+        seen = set()
+
+        try:
+            entries = list(os.scandir(self.templates_dir))
+        except FileNotFoundError:
+            entries = []
+
+        for entry in entries:
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            seen.add(entry.name)
+
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._files.get(entry.name) == signature:
+                continue
+
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    template = json.load(f)
+            except Exception as e:
+                logger.error(f"Erro ao carregar template {entry.name}: {e}")
+                continue
+
+            self._files[entry.name] = signature
+            changed.append((entry.name[:-len('.json')], template))
+
+        removed = []
+        for filename in list(self._files.keys()):
+            if filename not in seen:
+                del self._files[filename]
+                removed.append(filename[:-len('.json')])
+
+        return changed, removed
+
+    def scan(self):
+        """Iterar (template_id, template) de todos os arquivos"""
+        for entry in os.scandir(self.templates_dir):
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    yield entry.name[:-len('.json')], json.load(f)
+            except Exception as e:
+                logger.error(f"Erro ao carregar template {entry.name}: {e}")
+
+    def get(self, template_id):
+        filepath = self._filepath(template_id)
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def put(self, template_id, template):
+        """Gravação atômica (arquivo temporário + rename)"""
+        filepath = self._filepath(template_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.templates_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(template, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        stat = os.stat(filepath)
+        self._files[f"{template_id}.json"] = (stat.st_mtime_ns, stat.st_size)
+
+    def delete(self, template_id):
+        filepath = self._filepath(template_id)
+        if not os.path.exists(filepath):
+            return False
+        os.remove(filepath)
+        self._files.pop(f"{template_id}.json", None)
+        return True
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS templates (
+        template_id TEXT PRIMARY KEY,
+        document TEXT NOT NULL CHECK (json_valid(document)),
+        revision INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_templates_revision ON templates (revision);
+    CREATE INDEX IF NOT EXISTS idx_templates_content_type
+        ON templates (json_extract(document, '$.content_type'));
+    CREATE INDEX IF NOT EXISTS idx_templates_viral_score
+        ON templates (json_extract(document, '$.viral_score'));
+    CREATE TABLE IF NOT EXISTS template_deletions (
+        template_id TEXT PRIMARY KEY,
+        revision INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS template_store_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO template_store_meta (key, value) VALUES ('revision', 0);
+"""
+
+class SQLiteTemplateStore:
+    """
+    Templates em um único arquivo SQLite (JSON1)
+
+    Cada gravação é uma transação (WAL) que incrementa uma revisão global;
+    remoções deixam um tombstone com a revisão. Outros processos sincronizam
+    lendo apenas as linhas com revisão maior que a última vista, e
+    PRAGMA data_version indica sem custo se houve commit de outra conexão.
+    A conexão é aberta no primeiro uso e reaberta em cada processo: conexões
+    SQLite não podem ser compartilhadas entre processos após um fork.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._rlock = threading.RLock()
+        self._connection = None
+        self._pid = os.getpid()
+        self._revision = 0
+        self._data_version = None
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            # Processo filho: conexão e lock herdados do pai são descartados
+            # sem fechar (fechar afetaria a conexão do pai)
+            self._rlock = threading.RLock()
+            self._connection = None
+            self._pid = os.getpid()
+
+    @property
+    def _lock(self):
+        self._check_process()
+        return self._rlock
+
+    @property
+    def _conn(self):
+        self._check_process()
+        if self._connection is None:
+            with self._rlock:
+                if self._connection is None:
+                    conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute('PRAGMA synchronous=NORMAL')
+                    conn.executescript(SQLITE_SCHEMA)
+                    # data_version é por conexão: a próxima verificação relê a
+                    # partir da última revisão vista
+                    self._data_version = None
+                    self._connection = conn
+        return self._connection
+
+    @staticmethod
+    def _encode(template):
+        return json.dumps(template, ensure_ascii=False, separators=(',', ':'))
+
+    def _next_revision(self, count=1):
+        current = self._conn.execute(
+            "SELECT value FROM template_store_meta WHERE key = 'revision'"
+        ).fetchone()[0]
+        self._conn.execute(
+            "UPDATE template_store_meta SET value = ? WHERE key = 'revision'", (current + count,)
+        )
+        return current + 1
+
+    def _advance(self, first_revision, count=1):
+        # Sem commits de terceiros no intervalo a própria escrita não precisa
+        # ser relida no próximo load_changes
+        if self._revision == first_revision - 1:
+            self._revision = first_revision + count - 1
+
+    def has_changes(self):
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0] != self._data_version
+
+    def load_changes(self):
+        """Templates alterados e ids removidos desde a última revisão vista"""
+        with self._lock:
+            self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT template_id, document, revision FROM templates WHERE revision > ?",
+                (self._revision,)
+            ).fetchall()
+            deletions = self._conn.execute(
+                "SELECT template_id, revision FROM template_deletions WHERE revision > ?",
+                (self._revision,)
+            ).fetchall()
+
+        changed = [(template_id, json.loads(document)) for template_id, document, _ in rows]
+        removed = [template_id for template_id, _ in deletions]
+        self._revision = max(
+            [self._revision] + [row[2] for row in rows] + [row[1] for row in deletions]
+        )
+        return changed, removed
+
+    def scan(self):
+        """Iterar (template_id, template) de todos os templates"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT template_id, document FROM templates ORDER BY template_id"
+            ).fetchall()
+        for template_id, document in rows:
+            yield template_id, json.loads(document)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+
+    def get(self, template_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT document FROM templates WHERE template_id = ?", (template_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, template_id, template):
+        self.put_many([(template_id, template)])
+
+    def put_many(self, items):
+        """Gravar vários templates em uma única transação"""
+        items = list(items)
+        if not items:
+            return 0
+
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                first_revision = self._next_revision(len(items))
+                now = datetime.now().isoformat()
+                self._conn.executemany("""
+                    INSERT INTO templates (template_id, document, revision, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (template_id) DO UPDATE SET
+                        document = excluded.document,
+                        revision = excluded.revision,
+                        updated_at = excluded.updated_at
+                """, [
+                    (template_id, self._encode(template), first_revision + offset, now)
+                    for offset, (template_id, template) in enumerate(items)
+                ])
+                self._conn.executemany(
+                    "DELETE FROM template_deletions WHERE template_id = ?",
+                    [(template_id,) for template_id, _ in items]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+            self._advance(first_revision, len(items))
+        return len(items)
+
+    def delete(self, template_id):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                deleted = self._conn.execute(
+                    "DELETE FROM templates WHERE template_id = ?", (template_id,)
+                ).rowcount
+                if not deleted:
+                    self._conn.execute('ROLLBACK')
+                    return False
+
+                revision = self._next_revision()
+                self._conn.execute("""
+                    INSERT INTO template_deletions (template_id, revision) VALUES (?, ?)
+                    ON CONFLICT (template_id) DO UPDATE SET revision = excluded.revision
+                """, (template_id, revision))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+            self._advance(revision)
+        return True
+
+def create_template_store(templates_dir, backend=None, path=None):
+    """Criar o backend configurado (TEMPLATE_STORE_BACKEND / TEMPLATE_STORE_PATH)"""
+    backend = backend or TEMPLATE_STORE_BACKEND
+    if backend == 'sqlite':
+        db_path = path or TEMPLATE_STORE_PATH or os.path.join(os.path.dirname(templates_dir), 'templates.db')
+        return SQLiteTemplateStore(db_path)
+    if backend == 'directory':
+        return DirectoryTemplateStore(path or templates_dir)
+    raise ValueError(f"Backend de templates desconhecido: {backend}")
+
+def migrate_directory_to_sqlite(templates_dir, db_path, batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Copiar os templates de um diretório JSON para um store SQLite
+
+    Idempotente: templates já existentes são sobrescritos. O diretório de
+    origem não é alterado.
+    """
+    source = DirectoryTemplateStore(templates_dir)
+    target = SQLiteTemplateStore(db_path)
+
+    migrated = 0
+    batch = []
+    for template_id, template in source.scan():
+        batch.append((template_id, template))
+        if len(batch) >= batch_size:
+            migrated += target.put_many(batch)
+            batch = []
+    migrated += target.put_many(batch)
+
+    source_count = sum(1 for name in os.listdir(templates_dir) if name.endswith('.json'))
+    target_count = target.count()
+
+    return {
+        'migrated': migrated,
+        'source_files': source_count,
+        'target_templates': target_count,
+        'errors': source_count - migrated
+    }
+
+# CLI para migrar o armazenamento de templates
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Armazenamento de Templates')
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--source', required=True, help='Diretório com um JSON por template')
+    parser.add_argument('--target', required=True, help='Arquivo SQLite de destino')
+    parser.add_argument('--batch-size', type=int, default=MIGRATION_BATCH_SIZE)
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        result = migrate_directory_to_sqlite(args.source, args.target, args.batch_size)
+        print(f"Templates migrados: {result['migrated']}/{result['source_files']}")
+        print(f"Templates no destino: {result['target_templates']}")
+        if result['errors']:
+            print(f"Arquivos com erro: {result['errors']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+TEXT INDEX
+Índice invertido com ranking BM25, prefixos e normalização de acentos
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import re
+import math
+import heapq
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Palavras muito frequentes em português que não ajudam a ranquear
+STOPWORDS = frozenset({
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na',
+    'nos', 'nas', 'um', 'uma', 'para', 'por', 'com', 'que', 'se', 'ao', 'aos'
+})
+
+# Expansão de prefixo: tamanho mínimo do termo, limite de termos expandidos e
+# peso relativo de um termo expandido frente ao termo exato
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_EXPANSIONS = 50
+PREFIX_MATCH_WEIGHT = 0.5
+
+def fold_text(text):
+    """Minúsculas e sem acentos ('Ação' -> 'acao')"""
+    normalized = unicodedata.normalize('NFKD', str(text))
+    return ''.join(char for char in normalized if not unicodedata.combining(char)).lower()
+
+def tokenize(text, keep_stopwords=False):
+    """Tokens normalizados, sem stopwords (a menos que keep_stopwords)"""
+    tokens = TOKEN_PATTERN.findall(fold_text(text))
+    if keep_stopwords:
+        return tokens
+    return [token for token in tokens if token not in STOPWORDS]
+
+class InvertedIndex:
+    """
+    Índice invertido incremental com ranking BM25
+
+    Documentos são indexados por campos com pesos (a frequência do termo é
+    somada com o peso do campo). A consulta exige que todos os termos casem,
+    cada um pelo termo exato ou por termos do vocabulário que começam com ele,
+    e ordena pelo BM25. Stopwords também são indexadas (sem contar no tamanho
+    do documento) para que consultas formadas só por stopwords ainda casem.
+    Inserções e remoções atualizam apenas os postings do documento.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._total_length = 0.0
+        self._vocabulary = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_id, fields):
+        """Indexar documento; fields é uma lista de (texto, peso)"""
+        terms = Counter()
+        length = 0
+        for text, weight in fields:
+            for token in tokenize(text, keep_stopwords=True):
+                terms[token] += weight
+                if token not in STOPWORDS:
+                    length += weight
+
+        with self._lock:
+            self.remove(doc_id)
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._vocabulary, term)
+                postings[doc_id] = frequency
+
+            self._doc_terms[doc_id] = list(terms.keys())
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+
+    def remove(self, doc_id):
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+
+            self._total_length -= self._doc_lengths.pop(doc_id)
+            for term in terms:
+                postings = self._postings[term]
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+                    position = bisect.bisect_left(self._vocabulary, term)
+                    del self._vocabulary[position]
+
+    def _expand(self, token):
+        """Termo exato (peso 1) e termos com o prefixo (peso reduzido)"""
+        matches = []
+        if token in self._postings:
+            matches.append((token, 1.0))
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._vocabulary, token)
+            for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    matches.append((term, PREFIX_MATCH_WEIGHT))
+
+        return matches
+
+    def search(self, query, accept=None, limit=None):
+        """
+        Buscar documentos que casam todos os termos da consulta
+
+        accept (callable opcional) descarta documentos antes do ranking.
+        Retorna ([(doc_id, score)] em ordem decrescente, total de documentos
+        encontrados).
+        """
+        # Sem stopwords; se nada restar (ex.: 'de', 'a'), usar a consulta inteira
+        tokens = list(dict.fromkeys(tokenize(query) or tokenize(query, keep_stopwords=True)))
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return [], 0
+            # Documentos só com stopwords têm tamanho 0
+            avg_length = self._total_length / doc_count or 1.0
+
+            scores = None
+            for token in tokens:
+                token_scores = {}
+                for term, match_weight in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, frequency in postings.items():
+                        if scores is not None and doc_id not in scores:
+                            continue
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                        score = match_weight * idf * frequency * (self.k1 + 1) / (frequency + norm)
+                        # Entre expansões do mesmo token vale a de maior score
+                        if score > token_scores.get(doc_id, 0):
+                            token_scores[doc_id] = score
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {doc_id: scores[doc_id] + score for doc_id, score in token_scores.items()}
+
+                if not scores:
+                    return [], 0
+
+        if accept is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if accept(doc_id)}
+
+        total = len(scores)
+        if limit is not None:
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        else:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked, total
+
+    def get_stats(self):
+        return {
+            'documents': len(self._doc_lengths),
+            'terms': len(self._vocabulary)
+        }
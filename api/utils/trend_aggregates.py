@@ -0,0 +1,120 @@
+"""
+TREND AGGREGATES
+Leitura e combinação do estado agregado diário de content_analyses
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import json
+from datetime import datetime, timezone
+
+# Mantido pelo trigger accumulate_analysis_trends (migração V1.6.0)
+TREND_STATES_SQL = """
+    SELECT period_start, platform, metrics
+    FROM analytics_aggregates
+    WHERE aggregate_type = 'analysis_trends'
+    AND time_period = 'day'
+    AND analysis_type = $1
+    AND period_start >= $2
+    AND ($3::text IS NULL OR platform = $3)
+    ORDER BY period_start DESC
+"""
+
+TOP_EMOTIONS_LIMIT = 10
+
+def merge_states(target, state):
+    """Somar estado a target (in-place): folhas numéricas somadas, objetos combinados"""
+    for key, value in state.items():
+        if isinstance(value, dict):
+            merge_states(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + float(value)
+    return target
+
+def _avg(total, count):
+    return total / count if count else 0
+
+def period_start_for(interval, now=None):
+    """Início (dia UTC) do período: o dia parcial mais antigo entra inteiro"""
+    now = now or datetime.now(timezone.utc)
+    return (now - interval).replace(hour=0, minute=0, second=0, microsecond=0)
+
+async def fetch_trend_states(conn, analysis_type, since, platform=None):
+    """
+    Estados diários combinados entre plataformas
+
+    Retorna (estado por dia 'YYYY-MM-DD' em ordem decrescente, estado total).
+    """
+    rows = await conn.fetch(TREND_STATES_SQL, analysis_type, since, platform)
+
+    by_day = {}
+    total = {}
+    for row in rows:
+        state = row['metrics']
+        # Sem codec JSONB registrado no pool o asyncpg devolve texto
+        if isinstance(state, str):
+            state = json.loads(state)
+        date_str = row['period_start'].astimezone(timezone.utc).strftime('%Y-%m-%d')
+        merge_states(by_day.setdefault(date_str, {}), state)
+        merge_states(total, state)
+
+    return by_day, total
+
+def build_trend_report(by_day, total):
+    """Montar os blocos de /analysis/trends a partir dos estados combinados"""
+    sentiment_by_date = {}
+    viral_by_date = {}
+
+    for date_str, state in by_day.items():
+        polarities = state.get('sentiment', {})
+        if polarities:
+            sentiment_by_date[date_str] = {
+                polarity: {
+                    'count': int(values.get('count', 0)),
+                    'avg_sentiment_score': _avg(values.get('sum_score', 0), values.get('n_score', 0)),
+                    'avg_emotional_intensity': _avg(values.get('sum_intensity', 0), values.get('n_intensity', 0))
+                }
+                for polarity, values in sorted(polarities.items(), key=lambda item: -item[1].get('count', 0))
+            }
+
+        viral = state.get('viral', {})
+        viral_count = int(viral.get('count', 0))
+        if viral_count:
+            viral_by_date[date_str] = {
+                'total_content': viral_count,
+                'high_viral_potential': int(viral.get('high', 0)),
+                'medium_viral_potential': int(viral.get('medium', 0)),
+                'avg_viral_potential': _avg(viral.get('sum', 0), viral_count),
+                'avg_overall_score': _avg(viral.get('sum_overall', 0), viral.get('n_overall', 0)),
+                'viral_rate': viral.get('high', 0) / viral_count
+            }
+
+    emotions = sorted(
+        total.get('emotions', {}).items(), key=lambda item: -item[1].get('count', 0)
+    )[:TOP_EMOTIONS_LIMIT]
+    emotions_data = [
+        {
+            'emotion': emotion,
+            'count': int(values.get('count', 0)),
+            'avg_intensity': _avg(values.get('sum_intensity', 0), values.get('n_intensity', 0)),
+            'avg_performance': _avg(values.get('sum_overall', 0), values.get('n_overall', 0))
+        }
+        for emotion, values in emotions
+    ]
+
+    total_analyses = int(total.get('count', 0))
+    n_processing = total.get('n_processing_ms', 0)
+
+    return {
+        'sentiment_trends': sentiment_by_date,
+        'viral_trends': viral_by_date,
+        'top_emotions': emotions_data,
+        'general_stats': {
+            'total_analyses': total_analyses,
+            'avg_overall_score': _avg(total.get('sum_overall', 0), total.get('n_overall', 0)),
+            'avg_confidence': _avg(total.get('sum_confidence', 0), total.get('n_confidence', 0)),
+            'avg_processing_time_ms': total.get('sum_processing_ms', 0) / n_processing if n_processing else None,
+            'high_potential_rate': total.get('high_potential', 0) / total_analyses if total_analyses else 0
+        }
+    }
@@ -0,0 +1,220 @@
+"""
+VECTOR INDEX
+Vetorização local por hashing e índice IVF para vizinhos aproximados
+
+Autor: Manus AI
+Data: 27 de Janeiro de 2025
+"""
+
+import zlib
+import math
+import threading
+from collections import Counter
+
+import numpy as np
+
+from .text_index import tokenize
+
+# Dimensão dos vetores de hashing
+VECTOR_DIMENSIONS = 1024
+
+# Abaixo deste tamanho a busca exata é barata o bastante para dispensar o IVF
+IVF_MIN_SIZE = 2000
+
+# Listas visitadas por consulta: no mínimo IVF_PROBES e, como o número de
+# listas cresce com sqrt(n), uma fração fixa delas para manter o recall
+IVF_PROBES = 8
+IVF_PROBE_FRACTION = 0.35
+
+# Iterações do k-means de treino
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 20000
+
+class HashingVectorizer:
+    """
+    Vetorizador sem vocabulário nem rede
+
+    Tokens e bigramas de cada campo são mapeados por CRC32 para uma de
+    `dimensions` posições com sinal (reduz colisões construtivas), com
+    frequência sublinear ponderada pelo campo e normalização L2.
+    """
+
+    def __init__(self, dimensions=VECTOR_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        yield from tokens
+        for first, second in zip(tokens, tokens[1:]):
+            yield f"{first} {second}"
+
+    def transform(self, fields):
+        """Vetor float32 normalizado para uma lista de (texto, peso)"""
+        counts = Counter()
+        for text, weight in fields:
+            for feature in self._features(text):
+                counts[feature] += weight
+
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in counts.items():
+            hashed = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            vector[hashed % self.dimensions] += sign * (1 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+class VectorIndex:
+    """
+    Índice de similaridade por cosseno com IVF (inverted file)
+
+    Os vetores ficam em uma matriz contígua. A partir de IVF_MIN_SIZE itens um
+    k-means esférico divide o espaço em ~sqrt(n) listas; a consulta compara o
+    vetor apenas com os itens das listas de centróides mais próximos
+    (max(probes, IVF_PROBE_FRACTION das listas)), ou com todos quando
+    exact=True. O treino é refeito quando o índice dobra de tamanho; até lá
+    novos itens entram na lista do centróide mais próximo.
+    """
+
+    def __init__(self, dimensions=VECTOR_DIMENSIONS, probes=IVF_PROBES):
+        self.dimensions = dimensions
+        self.probes = probes
+        self._vectors = np.zeros((64, dimensions), dtype=np.float32)
+        self._row_ids = [None] * 64
+        self._rows = {}
+        self._free_rows = []
+        self._next_row = 0
+        self._centroids = None
+        self._lists = []
+        self._row_list = {}
+        self._trained_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def _allocate_row(self):
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        if self._next_row == len(self._vectors):
+            grown = np.zeros((len(self._vectors) * 2, self.dimensions), dtype=np.float32)
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+            self._row_ids.extend([None] * (len(grown) - len(self._row_ids)))
+
+        row = self._next_row
+        self._next_row += 1
+        return row
+
+    def add(self, item_id, vector):
+        with self._lock:
+            self.remove(item_id)
+            row = self._allocate_row()
+            self._vectors[row] = vector
+            self._row_ids[row] = item_id
+            self._rows[item_id] = row
+
+            if self._centroids is not None:
+                list_index = int(np.argmax(self._centroids @ vector))
+                self._lists[list_index].add(row)
+                self._row_list[row] = list_index
+
+            if len(self._rows) >= IVF_MIN_SIZE and len(self._rows) >= 2 * self._trained_size:
+                self._train()
+
+    def remove(self, item_id):
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            self._vectors[row] = 0
+            self._row_ids[row] = None
+            self._free_rows.append(row)
+            list_index = self._row_list.pop(row, None)
+            if list_index is not None:
+                self._lists[list_index].discard(row)
+
+    def get_vector(self, item_id):
+        row = self._rows.get(item_id)
+        return None if row is None else self._vectors[row].copy()
+
+    def _train(self):
+        rows = np.fromiter(self._rows.values(), dtype=np.int64)
+        data = self._vectors[rows]
+        list_count = max(1, int(math.sqrt(len(rows))))
+
+        rng = np.random.default_rng(0)
+        sample = data[rng.choice(len(data), min(len(data), KMEANS_SAMPLE_SIZE), replace=False)]
+        centroids = sample[rng.choice(len(sample), list_count, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Centróides sem membros mantêm a posição anterior
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [set() for _ in range(list_count)]
+        self._row_list = {}
+        for row, list_index in zip(rows.tolist(), assignment.tolist()):
+            self._lists[list_index].add(row)
+            self._row_list[row] = list_index
+        self._trained_size = len(rows)
+
+    def probe_count(self):
+        """Listas visitadas por consulta aproximada com o treino atual"""
+        if self._centroids is None:
+            return 0
+        list_count = len(self._centroids)
+        return min(list_count, max(self.probes, math.ceil(list_count * IVF_PROBE_FRACTION)))
+
+    def search(self, vector, limit=10, exclude=None, exact=False):
+        """
+        Itens mais similares: [(item_id, similaridade)] em ordem decrescente
+
+        exact=True compara com todos os itens (sem IVF), para usos em que um
+        vizinho perdido é um erro, como a detecção de duplicatas.
+        """
+        with self._lock:
+            if not self._rows or limit < 1:
+                return []
+
+            if exact or self._centroids is None:
+                rows = np.fromiter(self._rows.values(), dtype=np.int64)
+            else:
+                probes = self.probe_count()
+                nearest_lists = np.argpartition(-(self._centroids @ vector), probes - 1)[:probes]
+                rows = np.fromiter(
+                    (row for list_index in nearest_lists for row in self._lists[list_index]),
+                    dtype=np.int64
+                )
+                if not len(rows):
+                    return []
+
+            similarities = self._vectors[rows] @ vector
+            count = min(limit + (1 if exclude is not None else 0), len(rows))
+            top = np.argpartition(-similarities, count - 1)[:count]
+            top = top[np.argsort(-similarities[top])]
+
+            results = []
+            for index in top:
+                item_id = self._row_ids[rows[index]]
+                if item_id == exclude:
+                    continue
+                results.append((item_id, float(similarities[index])))
+            return results[:limit]
+
+    def get_stats(self):
+        return {
+            'items': len(self._rows),
+            'ivf_lists': len(self._lists),
+            'trained_size': self._trained_size,
+            'probes': self.probe_count()
+        }
@@ -0,0 +1,30 @@
+-- Migration: Content keyset pagination indexes
+-- Version: 1.1.0
+-- Created: 2025-01-27T00:00:00
+
+-- Forward migration
+-- Índices compostos (chave de ordenação, id) para a paginação por cursor de
+-- /api/v1/content. As expressões precisam ser idênticas às usadas em
+-- api/utils/pagination.py (CONTENT_SORT_COLUMNS) para que o planner use o índice
+-- tanto em ordem ascendente quanto descendente.
+CREATE INDEX IF NOT EXISTS idx_scraped_content_keyset_scraped
+    ON scraped_content (scraped_at, id)
+    WHERE is_active = true;
+
+CREATE INDEX IF NOT EXISTS idx_scraped_content_keyset_published
+    ON scraped_content ((COALESCE(published_at, '-infinity'::timestamptz)), id)
+    WHERE is_active = true;
+
+CREATE INDEX IF NOT EXISTS idx_scraped_content_keyset_updated
+    ON scraped_content ((COALESCE(last_updated, '-infinity'::timestamptz)), id)
+    WHERE is_active = true;
+
+CREATE INDEX IF NOT EXISTS idx_scraped_content_keyset_followers
+    ON scraped_content ((COALESCE(author_followers_count, -1)), id)
+    WHERE is_active = true;
+
+-- Rollback SQL
+-- DROP INDEX IF EXISTS idx_scraped_content_keyset_followers;
+-- DROP INDEX IF EXISTS idx_scraped_content_keyset_updated;
+-- DROP INDEX IF EXISTS idx_scraped_content_keyset_published;
+-- DROP INDEX IF EXISTS idx_scraped_content_keyset_scraped;
@@ -0,0 +1,29 @@
+-- Migration: Content search indexes
+-- Version: 1.2.0
+-- Created: 2025-01-27T00:00:00
+
+-- Forward migration
+-- Busca por autor com curinga à esquerda (ILIKE '%x%') não usa o índice btree
+-- idx_scraped_content_author; o índice GIN de trigramas cobre esse padrão.
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+CREATE INDEX IF NOT EXISTS idx_scraped_content_author_trgm
+    ON scraped_content USING GIN (author_username gin_trgm_ops);
+
+-- Vetor de busca full-text sobre título, descrição e texto do conteúdo.
+-- Coluna gerada: mantida pelo próprio PostgreSQL em INSERT/UPDATE.
+ALTER TABLE scraped_content
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('portuguese', COALESCE(description, '')), 'B') ||
+        setweight(to_tsvector('portuguese', COALESCE(content_text, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_scraped_content_search_vector
+    ON scraped_content USING GIN (search_vector);
+
+-- Rollback SQL
+-- DROP INDEX IF EXISTS idx_scraped_content_search_vector;
+-- ALTER TABLE scraped_content DROP COLUMN IF EXISTS search_vector;
+-- DROP INDEX IF EXISTS idx_scraped_content_author_trgm;
@@ -0,0 +1,91 @@
+-- Migration: Platform daily rollup
+-- Version: 1.3.0
+-- Created: 2025-01-27T00:00:00
+
+-- Forward migration
+-- Rollup diário por plataforma usado pelo motor de previsão de tendências
+-- (api/utils/forecasting.py). Evita reagregar scraped_content bruto a cada
+-- requisição de /api/v1/trends/predictions.
+CREATE TABLE IF NOT EXISTS platform_daily_rollup (
+    platform VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    content_count INTEGER NOT NULL DEFAULT 0,
+    avg_viral_potential DECIMAL(5,4),
+    avg_engagement_rate DECIMAL(8,6),
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (platform, date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_platform_daily_rollup_date
+    ON platform_daily_rollup (date DESC);
+
+-- Cada conteúdo contribui uma vez para as médias do dia: com a análise mais
+-- recente que tem viral_potential_score e o snapshot de métricas mais recente
+-- (um JOIN direto multiplicaria análises x snapshots e daria peso extra a
+-- conteúdos com mais linhas).
+--
+-- Sem p_days o refresh começa no último dia já consolidado (recalculado, pois
+-- pode ter ficado parcial), cobrindo os dias perdidos enquanto o job esteve
+-- parado; no mínimo os 2 últimos dias são sempre recalculados. Com p_days
+-- recalcula pelo menos os últimos p_days dias (inclusive o dia corrente).
+CREATE OR REPLACE FUNCTION refresh_platform_daily_rollup(p_days INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    affected_rows INTEGER := 0;
+    last_rolled_date DATE;
+    start_date DATE;
+BEGIN
+    SELECT MAX(date) INTO last_rolled_date FROM platform_daily_rollup;
+
+    start_date := LEAST(
+        COALESCE(last_rolled_date, CURRENT_DATE - 89),
+        CURRENT_DATE - (COALESCE(p_days, 2) - 1)
+    );
+
+    INSERT INTO platform_daily_rollup (
+        platform, date, content_count, avg_viral_potential, avg_engagement_rate, refreshed_at
+    )
+    SELECT
+        sc.platform,
+        DATE_TRUNC('day', sc.scraped_at)::date as date,
+        COUNT(*) as content_count,
+        AVG(ca.viral_potential_score) as avg_viral_potential,
+        AVG(cm.engagement_rate) as avg_engagement_rate,
+        NOW()
+    FROM scraped_content sc
+    LEFT JOIN LATERAL (
+        SELECT viral_potential_score
+        FROM content_analyses
+        WHERE content_id = sc.id
+        AND viral_potential_score IS NOT NULL
+        ORDER BY analyzed_at DESC
+        LIMIT 1
+    ) ca ON true
+    LEFT JOIN LATERAL (
+        SELECT engagement_rate
+        FROM content_metrics
+        WHERE content_id = sc.id
+        ORDER BY collected_at DESC
+        LIMIT 1
+    ) cm ON true
+    WHERE sc.scraped_at >= start_date
+    AND sc.is_active = true
+    GROUP BY sc.platform, DATE_TRUNC('day', sc.scraped_at)
+    ON CONFLICT (platform, date) DO UPDATE SET
+        content_count = EXCLUDED.content_count,
+        avg_viral_potential = EXCLUDED.avg_viral_potential,
+        avg_engagement_rate = EXCLUDED.avg_engagement_rate,
+        refreshed_at = EXCLUDED.refreshed_at;
+
+    GET DIAGNOSTICS affected_rows = ROW_COUNT;
+    RETURN affected_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Carga inicial com o histórico usado pelas previsões
+SELECT refresh_platform_daily_rollup(90);
+
+-- Rollback SQL
+-- DROP FUNCTION IF EXISTS refresh_platform_daily_rollup(INTEGER);
+-- DROP INDEX IF EXISTS idx_platform_daily_rollup_date;
+-- DROP TABLE IF EXISTS platform_daily_rollup;
@@ -0,0 +1,35 @@
+-- Migration: Evolutionary patterns watermark
+-- Version: 1.4.0
+-- Created: 2025-01-27T00:00:00
+
+-- Forward migration
+-- O índice de padrões em memória (api/utils/pattern_index.py) busca apenas as
+-- linhas alteradas desde o último watermark de updated_at. Para isso updated_at
+-- precisa ser mantido em todo INSERT e UPDATE e a busca por intervalo precisa
+-- de índice.
+--
+-- updated_at usa clock_timestamp() (instante da escrita) em vez de NOW()
+-- (início da transação): com NOW() uma transação longa gravaria linhas com
+-- updated_at bem anterior ao seu commit. Mesmo assim o commit acontece depois
+-- da escrita, e por isso o índice relê uma janela (PATTERN_INDEX_WATERMARK_LAG_SECONDS)
+-- antes do watermark.
+CREATE OR REPLACE FUNCTION update_evolutionary_patterns_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_evolutionary_patterns_updated_at ON evolutionary_patterns;
+CREATE TRIGGER update_evolutionary_patterns_updated_at 
+    BEFORE INSERT OR UPDATE ON evolutionary_patterns 
+    FOR EACH ROW EXECUTE FUNCTION update_evolutionary_patterns_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_evolutionary_patterns_updated
+    ON evolutionary_patterns (updated_at);
+
+-- Rollback SQL
+-- DROP INDEX IF EXISTS idx_evolutionary_patterns_updated;
+-- DROP TRIGGER IF EXISTS update_evolutionary_patterns_updated_at ON evolutionary_patterns;
+-- DROP FUNCTION IF EXISTS update_evolutionary_patterns_updated_at();
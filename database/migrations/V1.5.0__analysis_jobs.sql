@@ -0,0 +1,59 @@
+-- Migration: Analysis batch jobs
+-- Version: 1.5.0
+-- Created: 2025-01-27T00:00:00
+
+-- Forward migration
+-- Jobs de análise em lote (api/utils/batch_jobs.py). O progresso fica
+-- persistido por item, de forma que um job interrompido por restart do
+-- processo é retomado apenas com os itens ainda pendentes.
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    analysis_types TEXT[] NOT NULL,
+    total_items INTEGER NOT NULL,
+    processed_items INTEGER NOT NULL DEFAULT 0,
+    succeeded_items INTEGER NOT NULL DEFAULT 0,
+    failed_items INTEGER NOT NULL DEFAULT 0,
+    concurrency INTEGER NOT NULL,
+    created_by VARCHAR(255),
+    error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    
+    CONSTRAINT valid_job_status CHECK (
+        status IN ('queued', 'running', 'completed', 'failed', 'cancelled')
+    ),
+    CONSTRAINT job_counters_valid CHECK (
+        processed_items = succeeded_items + failed_items AND
+        processed_items <= total_items
+    )
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs (status, created_at);
+
+CREATE TABLE IF NOT EXISTS analysis_job_items (
+    job_id UUID NOT NULL REFERENCES analysis_jobs(id) ON DELETE CASCADE,
+    content_id UUID NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    analysis_id UUID,
+    summary JSONB,
+    error TEXT,
+    processed_at TIMESTAMPTZ,
+    
+    PRIMARY KEY (job_id, content_id),
+    CONSTRAINT valid_job_item_status CHECK (
+        status IN ('pending', 'succeeded', 'failed')
+    )
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_job_items_pending
+    ON analysis_job_items (job_id, content_id)
+    WHERE status = 'pending';
+
+-- Rollback SQL
+-- DROP INDEX IF EXISTS idx_analysis_job_items_pending;
+-- DROP TABLE IF EXISTS analysis_job_items;
+-- DROP INDEX IF EXISTS idx_analysis_jobs_status;
+-- DROP TABLE IF EXISTS analysis_jobs;
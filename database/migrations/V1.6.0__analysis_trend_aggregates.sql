@@ -0,0 +1,216 @@
+-- Migration: Incremental analysis trend aggregates
+-- Version: 1.6.0
+-- Created: 2025-01-27T00:00:00
+
+-- Forward migration
+-- Estado agregado por (dia, plataforma, analysis_type) mantido em
+-- analytics_aggregates a cada inserção em content_analyses, lido por
+-- /api/v1/analysis/trends (api/utils/trend_aggregates.py). O estado guarda
+-- somas e contagens (não médias), de modo que lotes novos são somados ao
+-- existente e vários dias/plataformas são combinados na consulta.
+ALTER TABLE analytics_aggregates DROP CONSTRAINT IF EXISTS valid_aggregate_type;
+ALTER TABLE analytics_aggregates ADD CONSTRAINT valid_aggregate_type
+    CHECK (aggregate_type IN ('engagement', 'viral_potential', 'sentiment', 'quality', 'analysis_trends'));
+
+ALTER TABLE analytics_aggregates ADD COLUMN IF NOT EXISTS analysis_type VARCHAR(50);
+ALTER TABLE analytics_aggregates ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_aggregates_analysis_trends
+    ON analytics_aggregates (aggregate_type, analysis_type, time_period, period_start, platform)
+    WHERE aggregate_type = 'analysis_trends';
+
+-- Soma recursiva de dois documentos de estado: folhas numéricas são somadas,
+-- objetos são combinados chave a chave
+CREATE OR REPLACE FUNCTION jsonb_sum_merge(a JSONB, b JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    merged JSONB := '{}'::jsonb;
+    merge_key TEXT;
+BEGIN
+    a := COALESCE(a, '{}'::jsonb);
+    b := COALESCE(b, '{}'::jsonb);
+
+    FOR merge_key IN
+        SELECT jsonb_object_keys(a) UNION SELECT jsonb_object_keys(b)
+    LOOP
+        IF jsonb_typeof(a -> merge_key) = 'object' OR jsonb_typeof(b -> merge_key) = 'object' THEN
+            merged := merged || jsonb_build_object(
+                merge_key, jsonb_sum_merge(a -> merge_key, b -> merge_key)
+            );
+        ELSE
+            merged := merged || jsonb_build_object(
+                merge_key, COALESCE((a ->> merge_key)::numeric, 0) + COALESCE((b ->> merge_key)::numeric, 0)
+            );
+        END IF;
+    END LOOP;
+
+    RETURN merged;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Somar ao estado diário as análises bem-sucedidas recebidas
+CREATE OR REPLACE FUNCTION merge_analysis_trend_rows(p_rows content_analyses[])
+RETURNS INTEGER AS $$
+DECLARE
+    affected_rows INTEGER := 0;
+BEGIN
+    WITH analyses AS (
+        SELECT
+            DATE_TRUNC('day', ca.analyzed_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS day,
+            sc.platform,
+            ca.*
+        FROM unnest(p_rows) ca
+        JOIN scraped_content sc ON sc.id = ca.content_id
+        WHERE ca.success = true
+    ),
+    base AS (
+        SELECT
+            day, platform, analysis_type,
+            COUNT(*) AS sample_size,
+            jsonb_build_object(
+                'count', COUNT(*),
+                'sum_overall', COALESCE(SUM(overall_score), 0),
+                'n_overall', COUNT(overall_score),
+                'sum_confidence', COALESCE(SUM(confidence_score), 0),
+                'n_confidence', COUNT(confidence_score),
+                'sum_processing_ms', COALESCE(SUM(processing_time_ms), 0),
+                'n_processing_ms', COUNT(processing_time_ms),
+                'high_potential', COUNT(*) FILTER (WHERE viral_potential_score > 0.7),
+                'viral', jsonb_build_object(
+                    'count', COUNT(viral_potential_score),
+                    'sum', COALESCE(SUM(viral_potential_score), 0),
+                    'high', COUNT(*) FILTER (WHERE viral_potential_score > 0.8),
+                    'medium', COUNT(*) FILTER (WHERE viral_potential_score > 0.6),
+                    'sum_overall', COALESCE(SUM(overall_score) FILTER (WHERE viral_potential_score IS NOT NULL), 0),
+                    'n_overall', COUNT(overall_score) FILTER (WHERE viral_potential_score IS NOT NULL)
+                )
+            ) AS state
+        FROM analyses
+        GROUP BY day, platform, analysis_type
+    ),
+    sentiment AS (
+        SELECT day, platform, analysis_type, jsonb_object_agg(sentiment_polarity, state) AS state
+        FROM (
+            SELECT
+                day, platform, analysis_type, sentiment_polarity,
+                jsonb_build_object(
+                    'count', COUNT(*),
+                    'sum_score', COALESCE(SUM(sentiment_score), 0),
+                    'n_score', COUNT(sentiment_score),
+                    'sum_intensity', COALESCE(SUM(emotional_intensity), 0),
+                    'n_intensity', COUNT(emotional_intensity)
+                ) AS state
+            FROM analyses
+            WHERE sentiment_polarity IS NOT NULL
+            GROUP BY day, platform, analysis_type, sentiment_polarity
+        ) polarity_states
+        GROUP BY day, platform, analysis_type
+    ),
+    emotions AS (
+        SELECT day, platform, analysis_type, jsonb_object_agg(dominant_emotion, state) AS state
+        FROM (
+            SELECT
+                day, platform, analysis_type, dominant_emotion,
+                jsonb_build_object(
+                    'count', COUNT(*),
+                    'sum_intensity', COALESCE(SUM(emotional_intensity), 0),
+                    'n_intensity', COUNT(emotional_intensity),
+                    'sum_overall', COALESCE(SUM(overall_score), 0),
+                    'n_overall', COUNT(overall_score)
+                ) AS state
+            FROM analyses
+            WHERE dominant_emotion IS NOT NULL
+            GROUP BY day, platform, analysis_type, dominant_emotion
+        ) emotion_states
+        GROUP BY day, platform, analysis_type
+    )
+    INSERT INTO analytics_aggregates (
+        aggregate_type, platform, analysis_type, time_period, period_start, period_end,
+        metrics, sample_size, updated_at
+    )
+    SELECT
+        'analysis_trends', base.platform, base.analysis_type, 'day', base.day, base.day + INTERVAL '1 day',
+        base.state || jsonb_build_object(
+            'sentiment', COALESCE(sentiment.state, '{}'::jsonb),
+            'emotions', COALESCE(emotions.state, '{}'::jsonb)
+        ),
+        base.sample_size,
+        NOW()
+    FROM base
+    LEFT JOIN sentiment USING (day, platform, analysis_type)
+    LEFT JOIN emotions USING (day, platform, analysis_type)
+    ON CONFLICT (aggregate_type, analysis_type, time_period, period_start, platform)
+        WHERE aggregate_type = 'analysis_trends'
+    DO UPDATE SET
+        metrics = jsonb_sum_merge(analytics_aggregates.metrics, EXCLUDED.metrics),
+        sample_size = analytics_aggregates.sample_size + EXCLUDED.sample_size,
+        updated_at = NOW();
+
+    GET DIAGNOSTICS affected_rows = ROW_COUNT;
+    RETURN affected_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger por statement: um INSERT multi-linha ou COPY do AnalysisWriter
+-- gera um único upsert por (dia, plataforma, analysis_type)
+CREATE OR REPLACE FUNCTION accumulate_analysis_trends()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM merge_analysis_trend_rows(ARRAY(SELECT n::content_analyses FROM new_rows n));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS accumulate_analysis_trends ON content_analyses;
+CREATE TRIGGER accumulate_analysis_trends
+    AFTER INSERT ON content_analyses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION accumulate_analysis_trends();
+
+-- Recalcula do zero os últimos p_days dias (carga inicial ou reparo após
+-- exclusões), um dia por vez para limitar a memória do array de linhas
+CREATE OR REPLACE FUNCTION refresh_analysis_trend_aggregates(p_days INTEGER DEFAULT 90)
+RETURNS INTEGER AS $$
+DECLARE
+    affected_rows INTEGER := 0;
+    day_start TIMESTAMPTZ;
+BEGIN
+    FOR day_start IN
+        SELECT generate_series(
+            DATE_TRUNC('day', NOW() AT TIME ZONE 'UTC') - make_interval(days => p_days - 1),
+            DATE_TRUNC('day', NOW() AT TIME ZONE 'UTC'),
+            INTERVAL '1 day'
+        ) AT TIME ZONE 'UTC'
+    LOOP
+        DELETE FROM analytics_aggregates
+        WHERE aggregate_type = 'analysis_trends'
+        AND time_period = 'day'
+        AND period_start = day_start;
+
+        affected_rows := affected_rows + merge_analysis_trend_rows(ARRAY(
+            SELECT ca FROM content_analyses ca
+            WHERE ca.analyzed_at >= day_start
+            AND ca.analyzed_at < day_start + INTERVAL '1 day'
+        ));
+    END LOOP;
+
+    RETURN affected_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Carga inicial com o maior período aceito por /analysis/trends
+SELECT refresh_analysis_trend_aggregates(90);
+
+-- Rollback SQL
+-- DROP TRIGGER IF EXISTS accumulate_analysis_trends ON content_analyses;
+-- DROP FUNCTION IF EXISTS accumulate_analysis_trends();
+-- DROP FUNCTION IF EXISTS refresh_analysis_trend_aggregates(INTEGER);
+-- DROP FUNCTION IF EXISTS merge_analysis_trend_rows(content_analyses[]);
+-- DROP FUNCTION IF EXISTS jsonb_sum_merge(JSONB, JSONB);
+-- DELETE FROM analytics_aggregates WHERE aggregate_type = 'analysis_trends';
+-- DROP INDEX IF EXISTS idx_analytics_aggregates_analysis_trends;
+-- ALTER TABLE analytics_aggregates DROP COLUMN IF EXISTS updated_at;
+-- ALTER TABLE analytics_aggregates DROP COLUMN IF EXISTS analysis_type;
+-- ALTER TABLE analytics_aggregates DROP CONSTRAINT IF EXISTS valid_aggregate_type;
+-- ALTER TABLE analytics_aggregates ADD CONSTRAINT valid_aggregate_type
+--     CHECK (aggregate_type IN ('engagement', 'viral_potential', 'sentiment', 'quality'));